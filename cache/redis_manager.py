@@ -2,12 +2,55 @@
 Redis cache manager for fast lookups
 """
 import redis
+import redis.asyncio
+import asyncio
 import json
 import os
-from typing import Optional, Any, Dict
+import time
+from typing import Optional, Any, Dict, List, Tuple
 from datetime import timedelta
 
 
+# KEYS[1] = bucket hash; ARGV = capacity, refill/sec, cost, now (seconds)
+# Returns {allowed (0/1), retry_after seconds as a string}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+# KEYS: set key. ARGV: member
+# Adds only to a set that exists with a TTL, so a write can never create a
+# set that outlives the scheduled rebuild.
+ADD_TO_EXPIRING_SET_SCRIPT = """
+if redis.call('TTL', KEYS[1]) > 0 then
+    redis.call('SADD', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
 class RedisCache:
     """Redis cache manager with automatic JSON serialization"""
     
@@ -34,14 +77,37 @@ class RedisCache:
             socket_keepalive=True,
             health_check_interval=30
         )
-        
-        # Test connection
-        try:
-            self.client.ping()
-            print(f"✓ Redis connected: {self.host}:{self.port}")
-        except redis.ConnectionError as e:
-            print(f"✗ Redis connection failed: {e}")
-            raise
+        # No round trip here: the client connects lazily on first command and
+        # the web app verifies the connection (with retry) in its lifespan hook
+        self._async_client = None
+
+    @property
+    def async_client(self) -> redis.asyncio.Redis:
+        """
+        asyncio client for long blocking reads (SSE), so a waiting connection
+        holds no threadpool thread. Created on first use in the serving event loop.
+        """
+        if self._async_client is None:
+            self._async_client = redis.asyncio.Redis(
+                host=self.host,
+                port=self.port,
+                db=self.db,
+                decode_responses=True,
+                socket_connect_timeout=5,
+                socket_keepalive=True,
+                health_check_interval=30
+            )
+        return self._async_client
+
+    def connect(self):
+        """
+        Verify the connection with a PING
+
+        Raises:
+            redis.ConnectionError if Redis is unreachable
+        """
+        self.client.ping()
+        print(f"✓ Redis connected: {self.host}:{self.port}")
     
     def set(self, key: str, value: Any, ttl: int = 900) -> bool:
         """
@@ -62,6 +128,19 @@ class RedisCache:
             print(f"Redis SET error for key '{key}': {e}")
             return False
     
+    def set_if_absent(self, key: str, value: Any, ttl: int) -> bool:
+        """
+        Set a value only if the key does not exist (SET NX EX)
+
+        Returns:
+            True if this call created the key
+        """
+        try:
+            return bool(self.client.set(key, json.dumps(value), nx=True, ex=ttl))
+        except Exception as e:
+            print(f"Redis SETNX error for key '{key}': {e}")
+            return False
+
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value from cache
@@ -224,7 +303,172 @@ class RedisCache:
         except Exception as e:
             print(f"Redis HGETALL error for hash '{hash_key}': {e}")
             return {}
-    
+
+    def replace_set(self, set_key: str, members, ttl: int = None) -> int:
+        """
+        Atomically replace the contents of a Redis set
+
+        The new members are written to a temporary key and renamed over
+        the live key, so readers never see a half-built set.
+
+        Args:
+            set_key: Set key
+            members: Iterable of string members
+            ttl: Optional TTL for the set
+
+        Returns:
+            Number of members stored
+        """
+        try:
+            members = list(members)
+            if not members:
+                self.client.delete(set_key)
+                return 0
+            tmp_key = f"{set_key}:tmp"
+            pipe = self.client.pipeline(transaction=True)
+            pipe.delete(tmp_key)
+            pipe.sadd(tmp_key, *members)
+            if ttl:
+                pipe.expire(tmp_key, ttl)
+            pipe.rename(tmp_key, set_key)
+            pipe.execute()
+            return len(members)
+        except Exception as e:
+            print(f"Redis SET REPLACE error for set '{set_key}': {e}")
+            return 0
+
+    def add_to_set(self, set_key: str, member: str) -> bool:
+        """
+        Add a member to an existing Redis set that has a TTL
+
+        Never creates the set: a missing or non-expiring key is left alone, so
+        the set only ever lives as long as its scheduled rebuild allows.
+
+        Args:
+            set_key: Set key
+            member: Member to add
+
+        Returns:
+            True if the member was added
+        """
+        try:
+            return bool(self.client.eval(ADD_TO_EXPIRING_SET_SCRIPT, 1, set_key, member))
+        except Exception as e:
+            print(f"Redis SADD error for set '{set_key}': {e}")
+            return False
+
+    def is_set_member(self, set_key: str, member: str) -> bool:
+        """
+        Check set membership (O(1))
+
+        Args:
+            set_key: Set key
+            member: Member to look for
+
+        Returns:
+            True if member is in the set, False if not or on error
+        """
+        try:
+            return bool(self.client.sismember(set_key, member))
+        except Exception as e:
+            print(f"Redis SISMEMBER error for set '{set_key}': {e}")
+            return False
+
+    def take_token(self, bucket_key: str, capacity: int, refill_per_second: float, cost: int = 1) -> Tuple[bool, float]:
+        """
+        Take tokens from a Redis token bucket (atomic across all workers)
+
+        Args:
+            bucket_key: Bucket key
+            capacity: Bucket size (burst)
+            refill_per_second: Tokens added back per second
+            cost: Tokens this call needs
+
+        Returns:
+            (allowed, seconds until enough tokens are available). Fails open
+            (allowed) when Redis is unavailable.
+        """
+        try:
+            allowed, retry_after = self.client.eval(
+                TOKEN_BUCKET_SCRIPT, 1, bucket_key,
+                capacity, refill_per_second, cost, time.time()
+            )
+            return bool(allowed), float(retry_after)
+        except Exception as e:
+            print(f"Redis token bucket error for key '{bucket_key}': {e}")
+            return True, 0.0
+
+    def stream_add(self, stream_key: str, event: Dict[str, Any], maxlen: int = 1000, ttl: int = None) -> Optional[str]:
+        """
+        Append an event to a capped Redis Stream
+
+        Args:
+            stream_key: Stream key
+            event: Event payload (stored JSON-serialized in a 'data' field)
+            maxlen: Approximate cap on stream length (oldest entries trimmed)
+            ttl: Optional TTL for the whole stream
+
+        Returns:
+            Entry ID, or None on error
+        """
+        try:
+            entry_id = self.client.xadd(stream_key, {'data': json.dumps(event)}, maxlen=maxlen, approximate=True)
+            if ttl:
+                self.client.expire(stream_key, ttl)
+            return entry_id
+        except Exception as e:
+            print(f"Redis XADD error for stream '{stream_key}': {e}")
+            return None
+
+    def stream_range(self, stream_key: str, start: str = '-', end: str = '+', count: int = None) -> List[Tuple[str, Any]]:
+        """
+        Read stream entries between two IDs (inclusive)
+
+        Returns:
+            List of (entry ID, event) tuples
+        """
+        try:
+            entries = self.client.xrange(stream_key, min=start, max=end, count=count)
+            return [(entry_id, json.loads(fields['data'])) for entry_id, fields in entries]
+        except Exception as e:
+            print(f"Redis XRANGE error for stream '{stream_key}': {e}")
+            return []
+
+    def stream_last_id(self, stream_key: str) -> Optional[str]:
+        """ID of the newest stream entry (None if the stream is empty)"""
+        try:
+            entries = self.client.xrevrange(stream_key, count=1)
+            return entries[0][0] if entries else None
+        except Exception as e:
+            print(f"Redis XREVRANGE error for stream '{stream_key}': {e}")
+            return None
+
+    async def stream_read(self, stream_key: str, last_id: str, block_ms: int = 5000, count: int = 100) -> List[Tuple[str, Any]]:
+        """
+        Wait (without blocking the event loop) until entries newer than last_id
+        arrive or block_ms passes
+
+        Args:
+            stream_key: Stream key
+            last_id: Return entries with an ID greater than this
+            block_ms: Max time to wait in milliseconds
+            count: Max entries to return
+
+        Returns:
+            List of (entry ID, event) tuples (empty on timeout)
+        """
+        try:
+            response = await self.async_client.xread({stream_key: last_id}, count=count, block=block_ms)
+            if not response:
+                return []
+            _, entries = response[0]
+            return [(entry_id, json.loads(fields['data'])) for entry_id, fields in entries]
+        except Exception as e:
+            print(f"Redis XREAD error for stream '{stream_key}': {e}")
+            # Don't let readers spin while Redis is unreachable
+            await asyncio.sleep(min(block_ms / 1000, 5))
+            return []
+
     def clear_all(self) -> bool:
         """
         Clear all keys in the current database (USE WITH CAUTION!)
@@ -277,6 +521,16 @@ class RedisCache:
         except Exception as e:
             print(f"Redis close error: {e}")
 
+    async def close_async(self):
+        """Close the asyncio client (call from the event loop that used it)"""
+        if self._async_client is None:
+            return
+        try:
+            await self._async_client.aclose()
+        except Exception as e:
+            print(f"Redis async close error: {e}")
+        self._async_client = None
+
 
 # Global Redis instance
 cache = RedisCache()
@@ -314,6 +568,76 @@ class CacheKeys:
     def sync_lock(sync_type: str) -> str:
         return f"sync:lock:{sync_type}"
 
+    @staticmethod
+    def rate_limit(scope: str, identity: str) -> str:
+        """Per-user token bucket for an expensive endpoint"""
+        return f"ratelimit:{scope}:{identity.lower()}"
+
+    @staticmethod
+    def inflight(key: str) -> str:
+        """Leader marker for a coalesced upstream call"""
+        return f"inflight:{key}"
+
+    @staticmethod
+    def inflight_result(key: str) -> str:
+        """Short-lived shared result of a coalesced upstream call"""
+        return f"inflight:result:{key}"
+
+    @staticmethod
+    def sync_events() -> str:
+        """Capped Redis Stream of sync progress events (served over SSE)"""
+        return "sync:events"
+
+    @staticmethod
+    def sync_stage_durations() -> str:
+        """Per-stage durations of the last completed sync (exported on /metrics)"""
+        return "sync:stage_durations"
+
+    @staticmethod
+    def sync_generation() -> str:
+        """Counter bumped after every completed sync (in-process indexes reload on change)"""
+        return "sync:generation"
+
+    @staticmethod
+    def mirror_generation() -> str:
+        """Counter bumped when a background IIQ refresh changes mirrored rows (part of the API ETags)"""
+        return "sync:mirror_generation"
+
+    # Background job queue keys (services/job_queue.py)
+    @staticmethod
+    def job(job_id: str) -> str:
+        return f"jobs:job:{job_id}"
+
+    @staticmethod
+    def job_active(job_type: str) -> str:
+        """ID of the queued/running job of a type that may only run once at a time"""
+        return f"jobs:active:{job_type}"
+
+    @staticmethod
+    def job_queue() -> str:
+        """Sorted set of ready job IDs, scored by priority then enqueue time"""
+        return "jobs:queue"
+
+    @staticmethod
+    def job_delayed() -> str:
+        """Sorted set of job IDs waiting out a retry backoff, scored by ready time"""
+        return "jobs:delayed"
+
+    @staticmethod
+    def job_processing() -> str:
+        """Sorted set of running job IDs, scored by heartbeat deadline"""
+        return "jobs:processing"
+
+    @staticmethod
+    def job_priorities() -> str:
+        return "jobs:priorities"
+
+    # Auth cache keys
+    @staticmethod
+    def allowed_group_members(group: str) -> str:
+        """Expanded (nested) membership of the login group, as a Redis set"""
+        return f"auth:group:{group.lower()}:members"
+
     # Report cache keys
     @staticmethod
     def report_summary() -> str:
@@ -359,6 +683,22 @@ class CacheKeys:
     def invalidate_all_reports() -> str:
         return "report:*"
 
+    # Meraki cache keys
+    @staticmethod
+    def meraki_ap_index(org_id: str) -> str:
+        """Org AP inventory: {ap mac: {name, model, networkId, ...}}"""
+        return f"meraki:ap_index:{org_id}"
+
+    @staticmethod
+    def meraki_ap_index_built_at(org_id: str) -> str:
+        """Build time of the AP inventory (checked instead of pulling the whole index)"""
+        return f"meraki:ap_index:{org_id}:built_at"
+
+    @staticmethod
+    def meraki_ap_index_lock(org_id: str) -> str:
+        """Held by the one worker rebuilding the AP inventory"""
+        return f"meraki:ap_index:{org_id}:lock"
+
     # IIQ (IncidentIQ) cache keys
     @staticmethod
     def iiq_asset_dump() -> str:
@@ -370,6 +710,11 @@ class CacheKeys:
         """Asset search query cache (5-minute dedup)"""
         return f"iiq:assets:search:{query.lower()}"
 
+    @staticmethod
+    def iiq_asset_refresh(serial: str) -> str:
+        """Background refresh marker for a locally-served asset (5-minute dedup)"""
+        return f"iiq:assets:refresh:{serial.upper()}"
+
     @staticmethod
     def iiq_fee_endpoint() -> str:
         """Cached successful fee endpoint URL"""
@@ -2,7 +2,8 @@
 Database models for caching Chromebook, User, and Meraki data
 Designed for PostgreSQL with SQLAlchemy
 """
-from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Text, Boolean, JSON, Numeric
+from sqlalchemy import Column, String, Date, DateTime, Integer, BigInteger, Text, Boolean, JSON, Numeric, Computed, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -10,6 +11,45 @@ from datetime import datetime
 Base = declarative_base()
 
 
+# Search documents for /api/search (generated columns; see migrations/007).
+# Identifiers weigh A, people B, places/models C. Expressions must stay IMMUTABLE.
+CHROMEBOOK_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', COALESCE(serial_number, '') || ' ' || COALESCE(asset_tag, '') || ' ' "
+    "|| COALESCE(mac_address, '') || ' ' || REPLACE(COALESCE(mac_address, ''), ':', '')), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(iiq_owner_email, '') || ' ' || COALESCE(iiq_owner_name, '') || ' ' "
+    "|| COALESCE(annotated_user, '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(iiq_location, '') || ' ' || COALESCE(annotated_location, '') || ' ' "
+    "|| COALESCE(model, '')), 'C')"
+)
+CHROMEBOOK_SEARCH_TEXT = (
+    "LOWER(COALESCE(serial_number, '') || ' ' || COALESCE(asset_tag, '') || ' ' || COALESCE(mac_address, '') || ' ' "
+    "|| REPLACE(COALESCE(mac_address, ''), ':', '') || ' ' || COALESCE(iiq_owner_email, '') || ' ' "
+    "|| COALESCE(iiq_owner_name, '') || ' ' || COALESCE(annotated_user, '') || ' ' || COALESCE(iiq_location, '') || ' ' "
+    "|| COALESCE(annotated_location, '') || ' ' || COALESCE(model, ''))"
+)
+ASSET_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', COALESCE(asset_tag, '') || ' ' || COALESCE(serial_number, '')), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(owner_email, '') || ' ' || COALESCE(owner_name, '') || ' ' "
+    "|| COALESCE(owner_student_id, '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(location, '') || ' ' || COALESCE(model, '')), 'C')"
+)
+ASSET_SEARCH_TEXT = (
+    "LOWER(COALESCE(asset_tag, '') || ' ' || COALESCE(serial_number, '') || ' ' || COALESCE(owner_email, '') || ' ' "
+    "|| COALESCE(owner_name, '') || ' ' || COALESCE(owner_student_id, '') || ' ' || COALESCE(location, '') || ' ' "
+    "|| COALESCE(model, ''))"
+)
+USER_SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', COALESCE(email, '') || ' ' || COALESCE(student_id, '') || ' ' "
+    "|| COALESCE(username, '')), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(full_name, '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(iiq_location, '')), 'C')"
+)
+USER_SEARCH_TEXT = (
+    "LOWER(COALESCE(email, '') || ' ' || COALESCE(student_id, '') || ' ' || COALESCE(username, '') || ' ' "
+    "|| COALESCE(full_name, '') || ' ' || COALESCE(iiq_location, ''))"
+)
+
+
 class Chromebook(Base):
     """Cached chromebook data from Google Admin + IncidentIQ"""
     __tablename__ = 'chromebooks'
@@ -21,11 +61,13 @@ class Chromebook(Base):
     ethernet_mac = Column(String(255))
     ip_address = Column(String(100))
     wan_ip_address = Column(String(100))
-    aue_date = Column(String(20))
+    aue_date = Column(Date)  # Model AUE date (scripts/update_aue_data.py, aue_corrections.py)
     aue_timestamp = Column(BigInteger)
 
     # Quick Wins Phase 2: Device lifecycle & extended fields
-    auto_update_expiration = Column(String(20))  # YYYY-MM-DD format from autoUpdateThrough
+    auto_update_expiration = Column(Date)  # Per-device autoUpdateThrough, parsed at sync time
+    # AUE year for widgets/filters (model date first, then device date); see migrations/009
+    aue_year = Column(Integer, Computed("EXTRACT(YEAR FROM COALESCE(aue_date, auto_update_expiration))::integer", persisted=True))
     support_end_date = Column(String(20))
     boot_mode = Column(String(50))  # Verified, Dev, etc.
     device_license_type = Column(String(100))
@@ -63,7 +105,7 @@ class Chromebook(Base):
     # Last sync info
     last_sync_status = Column(String(50))
     last_policy_sync_time = Column(DateTime)
-    recent_users = Column(JSON)  # List of recent user emails
+    recent_users = Column(JSONB)  # Google recentUsers: [{'type', 'email'}], emails lowercased
     
     # IncidentIQ data
     iiq_asset_id = Column(String(100), index=True)
@@ -74,6 +116,11 @@ class Chromebook(Base):
     iiq_owner_name = Column(String(255))  # Full name of assigned user from IIQ
     iiq_status = Column(String(100), index=True)  # Asset status (In Use, In Repair, etc.)
 
+    # Normalized join keys (generated on write; see migrations/006)
+    iiq_owner_email_lower = Column(String(255), Computed("LOWER(iiq_owner_email)", persisted=True), index=True)
+    owner_email_lower = Column(String(255), Computed("LOWER(COALESCE(iiq_owner_email, annotated_user))", persisted=True), index=True)
+    owner_user_id = Column(String(255), ForeignKey('users.user_id', ondelete='SET NULL'), index=True, nullable=True)  # Resolved at sync time
+
     # Meraki data (populated separately)
     last_seen_meraki = Column(DateTime, nullable=True)
     meraki_ap_name = Column(String(255), nullable=True)
@@ -83,6 +130,24 @@ class Chromebook(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     data_source = Column(String(50))  # 'google_admin', 'incidentiq', 'merged'
+
+    # Unified search document
+    search_vector = Column(TSVECTOR, Computed(CHROMEBOOK_SEARCH_VECTOR, persisted=True))
+    search_text = Column(Text, Computed(CHROMEBOOK_SEARCH_TEXT, persisted=True))
+
+    __table_args__ = (
+        Index('idx_chromebooks_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('idx_chromebooks_search_text_trgm', 'search_text', postgresql_using='gin',
+              postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        Index('idx_chromebooks_status_aue_year_model', 'status', 'aue_year', 'model'),
+        # recent_users @> '[{"email": ...}]' (devices a user has signed into)
+        Index('idx_chromebooks_recent_users', 'recent_users', postgresql_using='gin',
+              postgresql_ops={'recent_users': 'jsonb_path_ops'}),
+        # Bulk lookup by scanned MAC (AABBCCDDEEFF)
+        Index('idx_chromebooks_mac_bare', func.upper(func.replace(mac_address, ':', ''))),
+        # Bulk lookup by the first part of a composite asset tag ("TAG | OTHER")
+        Index('idx_chromebooks_asset_tag_first_upper', func.upper(func.split_part(asset_tag, ' | ', 1))),
+    )
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
@@ -131,6 +196,7 @@ class User(Base):
     # Primary identifiers
     user_id = Column(String(255), primary_key=True)  # Google user ID
     email = Column(String(255), unique=True, index=True)
+    email_lower = Column(String(255), Computed("LOWER(email)", persisted=True), index=True)
     
     # User info
     full_name = Column(String(255))
@@ -173,6 +239,16 @@ class User(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     last_login = Column(DateTime, nullable=True)
+
+    # Unified search document
+    search_vector = Column(TSVECTOR, Computed(USER_SEARCH_VECTOR, persisted=True))
+    search_text = Column(Text, Computed(USER_SEARCH_TEXT, persisted=True))
+
+    __table_args__ = (
+        Index('idx_users_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('idx_users_search_text_trgm', 'search_text', postgresql_using='gin',
+              postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    )
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
@@ -227,6 +303,7 @@ class Asset(Base):
 
     # Assignment (from IIQ)
     owner_email = Column(String(255), index=True)
+    owner_email_lower = Column(String(255), Computed("LOWER(owner_email)", persisted=True), index=True)
     owner_name = Column(String(255))
     owner_student_id = Column(String(50), index=True)  # Student ID from IIQ Owner.SchoolIdNumber
     owner_student_grade = Column(String(20))  # Student grade from IIQ Owner.Grade
@@ -238,6 +315,16 @@ class Asset(Base):
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     last_synced = Column(DateTime)  # When we last fetched from IIQ
 
+    # Unified search document
+    search_vector = Column(TSVECTOR, Computed(ASSET_SEARCH_VECTOR, persisted=True))
+    search_text = Column(Text, Computed(ASSET_SEARCH_TEXT, persisted=True))
+
+    __table_args__ = (
+        Index('idx_assets_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('idx_assets_search_text_trgm', 'search_text', postgresql_using='gin',
+              postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    )
+
     def to_dict(self):
         """Convert to dictionary for API responses"""
         return {
@@ -282,6 +369,11 @@ class MerakiClient(Base):
     # Metadata
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Join to chromebooks on the colon-less MAC (services/meraki_ingest.py)
+        Index('idx_meraki_clients_mac_bare', func.upper(func.replace(mac_address, ':', ''))),
+    )
     
     def to_dict(self):
         """Convert to dictionary for API responses"""
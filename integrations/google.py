@@ -26,7 +26,8 @@ class GoogleWorkspaceClient:
     SCOPES = [
         'https://www.googleapis.com/auth/admin.directory.device.chromeos.readonly',
         'https://www.googleapis.com/auth/admin.directory.user.readonly',
-        'https://www.googleapis.com/auth/admin.directory.orgunit.readonly'
+        'https://www.googleapis.com/auth/admin.directory.orgunit.readonly',
+        'https://www.googleapis.com/auth/admin.directory.group.member.readonly'
     ]
     
     def __init__(self, credentials_file: str, admin_email: str):
@@ -303,6 +304,48 @@ class GoogleWorkspaceClient:
             logger.error(f"Error listing users: {e}")
             raise
 
+    def list_group_members(self, group_key: str) -> List[str]:
+        """
+        List every user in a group, including members of nested groups
+
+        Args:
+            group_key: Group email address
+
+        Returns:
+            List of lowercase member emails (users only)
+        """
+        try:
+            emails = set()
+            page_token = None
+
+            while True:
+                response = self._execute_with_retry(
+                    lambda: self.service.members().list(
+                        groupKey=group_key,
+                        includeDerivedMembership=True,
+                        maxResults=200,
+                        pageToken=page_token
+                    )
+                )
+
+                for member in response.get('members', []):
+                    if member.get('type') == 'USER' and member.get('email'):
+                        emails.add(member['email'].lower())
+
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+            logger.info(f"Expanded group {group_key} to {len(emails)} users")
+            return sorted(emails)
+
+        except HttpError as e:
+            logger.error(f"HTTP error listing members of {group_key}: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Error listing members of {group_key}: {e}")
+            raise
+
     def get_org_unit(self, org_unit_path: str) -> Optional[Dict]:
         """
         Get information about an organizational unit
@@ -1,11 +1,143 @@
 """Meraki API Integration - Device location tracking"""
+import asyncio
+import os
+import random
 import requests
 import logging
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
+from cache.redis_manager import cache, CacheKeys
 
 logger = logging.getLogger(__name__)
 
+# AP inventory: rebuilt from the API after this many seconds, re-checked in Redis every minute
+AP_INDEX_TTL = int(os.getenv('MERAKI_AP_INDEX_TTL', '3600'))
+AP_INDEX_CHECK_INTERVAL = 60
+AP_INDEX_LOCK_TTL = 120
+
+# Meraki allows about 10 calls/second per organization. The bucket is shared by
+# every thread and worker through Redis; the default leaves headroom for other tools.
+MERAKI_RATE_PER_SECOND = float(os.getenv('MERAKI_RATE_PER_SECOND', '8'))
+MERAKI_RATE_BURST = int(os.getenv('MERAKI_RATE_BURST', '10'))
+MERAKI_MAX_RETRIES = 4
+MERAKI_MAX_BACKOFF = 30.0
+MERAKI_BATCH_CONCURRENCY = int(os.getenv('MERAKI_BATCH_CONCURRENCY', '8'))
+
+# Window for the org-wide client ingestion (seconds; Meraki allows up to 31 days)
+MERAKI_CLIENT_TIMESPAN = int(os.getenv('MERAKI_CLIENT_TIMESPAN', '86400'))
+
+
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait after a 429: Retry-After if sent, else exponential backoff, plus jitter"""
+    try:
+        delay = float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        delay = min(MERAKI_MAX_BACKOFF, 2 ** attempt)
+    # Jitter so workers throttled together don't retry together
+    return min(MERAKI_MAX_BACKOFF, delay) + random.uniform(0, 1 + delay * 0.25)
+
+
+class ApIndex:
+    """
+    Organization-wide AP inventory (AP MAC -> name/model/network)
+
+    Built from one paged /organizations/{id}/devices listing, shared across
+    workers through Redis and held in memory, so resolving an AP name is a
+    dict lookup. Whichever worker first sees the Redis copy expire rebuilds it
+    under a lock; the others pick up the new copy on their next check.
+    """
+
+    def __init__(self, org_id: str):
+        self.org_id = org_id
+        self.devices: Dict[str, Dict] = {}
+        self.built_at: Optional[float] = None
+        self.created_at = time.time()
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, ap_mac: str, loader: Callable[[], List[Dict]]) -> Optional[Dict]:
+        """
+        Look up an AP/device by MAC
+
+        Args:
+            ap_mac: Device MAC in any case
+            loader: Returns the org device listing when the index must be rebuilt
+
+        Returns:
+            {'name', 'model', 'networkId', 'networkName', 'productType', 'serial'} or None
+        """
+        self.refresh_if_stale(loader)
+        return self.devices.get((ap_mac or '').lower())
+
+    def refresh_if_stale(self, loader: Callable[[], List[Dict]]):
+        now = time.time()
+        if now - self._last_check < AP_INDEX_CHECK_INTERVAL:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # Another thread is already checking/rebuilding
+        try:
+            self._last_check = now
+            built_at = cache.get(CacheKeys.meraki_ap_index_built_at(self.org_id))
+
+            if built_at and now - built_at < AP_INDEX_TTL:
+                if built_at != self.built_at:
+                    devices = cache.get(CacheKeys.meraki_ap_index(self.org_id))
+                    if devices is not None:
+                        self.devices, self.built_at = devices, built_at
+                return
+
+            # Redis copy missing or expired: one worker rebuilds. If Redis is
+            # unreachable (or the rebuilding worker died), rebuild locally
+            # rather than serving an empty or very old index.
+            waited_too_long = not self.devices and now - self.created_at > AP_INDEX_LOCK_TTL
+            very_stale = self.built_at is not None and now - self.built_at > AP_INDEX_TTL * 2
+            if cache.set_if_absent(CacheKeys.meraki_ap_index_lock(self.org_id), 1, AP_INDEX_LOCK_TTL) \
+                    or waited_too_long or very_stale:
+                self.rebuild(loader)
+        except Exception as e:
+            logger.error(f"Meraki AP index refresh error: {e}")
+        finally:
+            self._lock.release()
+
+    def rebuild(self, loader: Callable[[], List[Dict]]) -> int:
+        """Rebuild from the API, publish to Redis and swap in; returns the device count"""
+        started = time.time()
+        devices = {
+            device['mac'].lower(): {
+                'name': device.get('name'),
+                'model': device.get('model'),
+                'networkId': device.get('networkId'),
+                'networkName': device.get('networkName'),
+                'productType': device.get('productType'),
+                'serial': device.get('serial'),
+            }
+            for device in loader()
+            if device.get('mac')
+        }
+        built_at = time.time()
+        cache.set(CacheKeys.meraki_ap_index(self.org_id), devices, ttl=AP_INDEX_TTL * 2)
+        cache.set(CacheKeys.meraki_ap_index_built_at(self.org_id), built_at, ttl=AP_INDEX_TTL * 2)
+        cache.delete(CacheKeys.meraki_ap_index_lock(self.org_id))
+        self.devices, self.built_at = devices, built_at
+        logger.info(f"Meraki AP index rebuilt: {len(devices)} devices in {built_at - started:.1f}s")
+        return len(devices)
+
+
+# One index per organization, shared by every MerakiClient in the process
+_ap_indexes: Dict[str, ApIndex] = {}
+_ap_indexes_lock = threading.Lock()
+
+
+def get_ap_index(org_id: str) -> ApIndex:
+    with _ap_indexes_lock:
+        if org_id not in _ap_indexes:
+            _ap_indexes[org_id] = ApIndex(org_id)
+        return _ap_indexes[org_id]
+
+
 class MerakiClient:
     def __init__(self, api_key: str, org_id: str):
         self.api_key = api_key
@@ -16,24 +148,101 @@ class MerakiClient:
             'X-Cisco-Meraki-API-Key': api_key,
             'Content-Type': 'application/json'
         })
-    
-    def get_ap_name_by_mac(self, network_id: str, ap_mac: str) -> str:
-        """Get friendly AP name from MAC address"""
-        try:
-            url = f'{self.base_url}/networks/{network_id}/devices'
-            response = self.session.get(url, timeout=5)
+        self.ap_index = get_ap_index(org_id)
+        self.rate_key = CacheKeys.rate_limit('meraki', org_id)
+
+    def _throttle(self):
+        """Block until the org-wide token bucket grants a call"""
+        while True:
+            allowed, wait = cache.take_token(self.rate_key, MERAKI_RATE_BURST, MERAKI_RATE_PER_SECOND)
+            if allowed:
+                return
+            time.sleep(wait + random.uniform(0, 0.05))
+
+    def _get(self, url: str, params: Optional[Dict] = None, timeout: float = 5) -> requests.Response:
+        """
+        Rate-limited GET
+
+        Waits for the organization's token bucket before each call and retries
+        429 responses (honouring Retry-After, with jitter) up to MERAKI_MAX_RETRIES
+        times. Other statuses are returned to the caller unchanged.
+        """
+        for attempt in range(MERAKI_MAX_RETRIES + 1):
+            self._throttle()
+            response = self.session.get(url, params=params, timeout=timeout)
+            if response.status_code != 429 or attempt == MERAKI_MAX_RETRIES:
+                return response
+            delay = _retry_delay(response, attempt)
+            logger.warning(f"Meraki rate limited (429) on {url}; retrying in {delay:.1f}s")
+            time.sleep(delay)
+        return response
+
+    def _iter_pages(self, url: str, params: Optional[Dict] = None) -> Iterator[List[Dict]]:
+        """Yield each page of a Meraki list endpoint (follows the Link: rel=next header)"""
+        params = dict(params or {})
+        while url:
+            response = self._get(url, params=params, timeout=30)
             response.raise_for_status()
-            
-            devices = response.json()
-            
-            for device in devices:
-                if device.get('mac', '').lower() == ap_mac.lower():
-                    return device.get('name') or device.get('model', 'Unknown AP')
-            
-            return f'AP ({ap_mac[-8:]})'
-        except Exception as e:
-            logger.error(f"Error getting AP name: {e}")
-            return f'AP ({ap_mac[-8:]})'
+            yield response.json()
+            url = response.links.get('next', {}).get('url')
+            params = None  # The next link carries the paging parameters
+
+    def _get_paged(self, url: str, params: Optional[Dict] = None) -> List[Dict]:
+        """GET every page of a Meraki list endpoint"""
+        return [item for page in self._iter_pages(url, params) for item in page]
+
+    def get_organization_networks(self) -> List[Dict]:
+        """All networks in the organization"""
+        return self._get_paged(f'{self.base_url}/organizations/{self.org_id}/networks', {'perPage': 1000})
+
+    def get_organization_devices(self) -> List[Dict]:
+        """All devices in the organization, with networkName filled in"""
+        networks = {network['id']: network.get('name') for network in self.get_organization_networks()}
+        devices = self._get_paged(f'{self.base_url}/organizations/{self.org_id}/devices', {'perPage': 1000})
+        for device in devices:
+            device['networkName'] = networks.get(device.get('networkId'))
+        return devices
+
+    def list_clients(self, timespan: int = MERAKI_CLIENT_TIMESPAN) -> Iterator[Dict]:
+        """
+        Every client seen on the organization's wireless networks within `timespan`
+
+        One paged /networks/{id}/clients listing per network (5000 clients per
+        call) instead of a search per MAC. Yielded page by page so callers can
+        write in batches.
+
+        Yields:
+            Meraki client dicts plus networkId, networkName, apMac and apName
+        """
+        for network in self.get_organization_networks():
+            if 'wireless' not in (network.get('productTypes') or []):
+                continue
+            url = f'{self.base_url}/networks/{network["id"]}/clients'
+            for page in self._iter_pages(url, {'timespan': timespan, 'perPage': 5000}):
+                for client in page:
+                    ap_mac = client.get('recentDeviceMac')
+                    ap_name = client.get('recentDeviceName')
+                    if ap_mac and not ap_name:
+                        ap = self.get_ap(ap_mac)
+                        ap_name = ap.get('name') if ap else None
+                    yield {
+                        **client,
+                        'networkId': network['id'],
+                        'networkName': network.get('name'),
+                        'apMac': ap_mac,
+                        'apName': ap_name,
+                    }
+
+    def get_ap(self, ap_mac: str) -> Optional[Dict]:
+        """AP inventory record for a device MAC (see ApIndex.get)"""
+        return self.ap_index.get(ap_mac, self.get_organization_devices)
+
+    def get_ap_name_by_mac(self, network_id: str, ap_mac: str) -> str:
+        """Get friendly AP name from MAC address (network_id is kept for callers; the index is org-wide)"""
+        device = self.get_ap(ap_mac)
+        if device:
+            return device.get('name') or device.get('model') or 'Unknown AP'
+        return f'AP ({ap_mac[-8:]})'
     
     def get_network_client(self, network_id: str, mac_address: str) -> Optional[Dict]:
         """Get detailed client info from specific network"""
@@ -41,7 +250,7 @@ class MerakiClient:
             # Format MAC without colons
             mac_clean = mac_address.replace(':', '')
             url = f'{self.base_url}/networks/{network_id}/clients/{mac_clean}'
-            response = self.session.get(url, timeout=5)
+            response = self._get(url)
             
             if response.status_code == 200:
                 return response.json()
@@ -56,7 +265,7 @@ class MerakiClient:
             # Get connection stats for last 24 hours
             url = f'{self.base_url}/networks/{network_id}/wireless/clients/{mac_address}/connectionStats'
             params = {'timespan': 86400}  # 24 hours in seconds
-            response = self.session.get(url, params=params, timeout=5)
+            response = self._get(url, params=params)
             response.raise_for_status()
             
             stats = response.json()
@@ -76,7 +285,7 @@ class MerakiClient:
             search_url = f'{self.base_url}/organizations/{self.org_id}/clients/search'
             params = {'mac': mac_address}
             
-            response = self.session.get(search_url, params=params, timeout=5)
+            response = self._get(search_url, params=params)
             response.raise_for_status()
             
             data = response.json()
@@ -105,7 +314,7 @@ class MerakiClient:
                     clients_url = f'{self.base_url}/networks/{network_id}/clients'
                     params = {'mac': mac_address}
                     
-                    response = self.session.get(clients_url, params=params, timeout=5)
+                    response = self._get(clients_url, params=params)
                     
                     if response.status_code == 200:
                         clients = response.json()
@@ -143,18 +352,13 @@ class MerakiClient:
                              network_client.get('recentDeviceMac'))
                     
                     if ap_mac:
-                        device_name = self.get_ap_name_by_mac(network_id, ap_mac)
-                        # Only use if it's wireless (AP), not a switch
-                        if 'wireless' in device_name.lower() or 'AP' in device_name or '-AP-' in device_name:
-                            ap_name = device_name
+                        ap_name = self._wireless_ap_name(ap_mac)
                 
                 # Fall back to recentDeviceMac from search
                 if not ap_name:
                     ap_mac = client.get('recentDeviceMac')
                     if ap_mac:
-                        device_name = self.get_ap_name_by_mac(network_id, ap_mac)
-                        if 'wireless' in device_name.lower() or 'AP' in device_name or '-AP-' in device_name:
-                            ap_name = device_name
+                        ap_name = self._wireless_ap_name(ap_mac)
             
             location_info = {
                 'lastSeen': last_seen,
@@ -179,6 +383,47 @@ class MerakiClient:
             logger.error(f"Error querying Meraki: {e}")
             return None
     
+    async def get_devices_by_mac_batch(self, mac_addresses: Iterable[str],
+                                       concurrency: int = MERAKI_BATCH_CONCURRENCY) -> Dict[str, Optional[Dict]]:
+        """
+        Resolve many MACs concurrently (get_device_by_mac for each)
+
+        Calls run on a small thread pool; the shared token bucket keeps the
+        whole organization within its request budget however many run at once.
+
+        Args:
+            mac_addresses: Client MAC addresses
+            concurrency: Lookups in flight at a time
+
+        Returns:
+            {mac: location info or None}
+        """
+        macs = list(dict.fromkeys(mac for mac in mac_addresses if mac))
+        if not macs:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='meraki')
+        try:
+            # Warm the AP index once so the lookups don't race to rebuild it
+            await loop.run_in_executor(executor, self.ap_index.refresh_if_stale, self.get_organization_devices)
+            results = await asyncio.gather(*(
+                loop.run_in_executor(executor, self.get_device_by_mac, mac) for mac in macs
+            ))
+        finally:
+            executor.shutdown(wait=False)
+        return dict(zip(macs, results))
+
+    def _wireless_ap_name(self, ap_mac: str) -> Optional[str]:
+        """AP name if the MAC belongs to a wireless AP (not a switch), else None"""
+        device = self.get_ap(ap_mac)
+        if device is None:
+            return f'AP ({ap_mac[-8:]})'
+        name = device.get('name') or device.get('model') or 'Unknown AP'
+        if device.get('productType') == 'wireless' or 'AP' in name:
+            return name
+        return None
+
     def compare_timestamps(self, meraki_time, google_time: str) -> Dict:
         """
         Compare Meraki and Google timestamps
@@ -3,17 +3,32 @@ Chromebook Dashboard - Main Application
 Combines IncidentIQ asset data with Google Workspace device information
 """
 
-from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from authlib.integrations.starlette_client import OAuth
+# Times every import/init phase below (see /api/startup-report)
+from services.startup import startup_report, connect_with_retry
+
+with startup_report.measure('fastapi / starlette', 'import'):
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI, HTTPException, Request, Depends, BackgroundTasks, WebSocket, WebSocketDisconnect
+    from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+    from fastapi.templating import Jinja2Templates
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.middleware.gzip import GZipMiddleware
+    from starlette.middleware.sessions import SessionMiddleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+    try:
+        from brotli_asgi import BrotliMiddleware
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
 import redis
+import asyncio
 import json
+import csv
+import io
+import re
 import os
+import time
+import hashlib
 from datetime import datetime
 from typing import Optional, Dict, List
 import logging
@@ -23,9 +38,10 @@ from dotenv import load_dotenv
 load_dotenv('/opt/chromebook-dashboard/.env')
 
 # Database imports
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import QueuePool
+with startup_report.measure('sqlalchemy', 'import'):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker, Session
+    from sqlalchemy.pool import QueuePool
 
 # Database Configuration
 DB_HOST = os.getenv('DB_HOST', 'localhost')
@@ -64,59 +80,190 @@ ALLOWED_DOMAIN = os.getenv('ALLOWED_DOMAIN', 'cr.k12.de.us')
 ALLOWED_GROUP = os.getenv('ALLOWED_GROUP', '') # Google Group email
 REDIRECT_URI = os.getenv('REDIRECT_URI')
 
-# Google API imports
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+# Google API client, authlib and the IIQ/Meraki integrations are imported on
+# first use (inside the functions that need them) to keep worker boot fast.
+
+with startup_report.measure('app services', 'import'):
+    # Cache integration (connects lazily; verified in the lifespan hook)
+    from cache.redis_manager import cache, CacheKeys
+
+    # orjson responses for list endpoints
+    from routes.responses import FastJSONResponse
+
+    # Fingerprinted static assets
+    from services.static_assets import StaticManifest, FingerprintedStaticFiles
+
+    # Search-box typeahead (rebuilt in-process after each sync)
+    from services.typeahead import TypeaheadManager
+
+    # Serial / asset tag / MAC lookup file written by the sync (mmapped per worker)
+    from services.lookup_index import SharedLookupIndex
+
+    # Batched serial / asset tag / MAC resolution
+    from services.bulk_lookup import MAX_BULK_KEYS, normalize_keys, lookup_keys
+    from services.scan_session import ScanSession
 
-# IncidentIQ integration
-from integrations.incidentiq import IncidentIQClient
+    # Rate limiting and request coalescing for live IIQ / Google lookups
+    from services.live_guard import RequestCoalescer, enforce_rate_limit
 
-# Meraki integration
-from integrations.meraki import MerakiClient
+    # Server-Timing header + per-route latency percentiles
+    from services.request_timing import ServerTimingMiddleware, instrument_clients, latency_tracker
 
-# Cache integration
-from cache.redis_manager import cache, CacheKeys
+    # Prometheus /metrics (multiprocess registry when PROMETHEUS_MULTIPROC_DIR is set)
+    from services import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect to Redis and Postgres (with retry) before serving; release metrics on exit"""
+    connect_with_retry('Redis', cache.connect)
+    connect_with_retry('PostgreSQL', lambda: engine.connect().close())
+    startup_report.log()
+    yield
+    await cache.close_async()
+    metrics.mark_worker_dead()
+
+
 # Initialize FastAPI
-app = FastAPI(title="Chromebook Dashboard", version="1.0.0")
+app = FastAPI(title="Chromebook Dashboard", version="1.0.0", lifespan=lifespan)
+
+# Conditional GET for polled JSON endpoints. Their data only changes when a sync
+# (or a manual widget refresh) bumps the sync generation, or when the background IIQ
+# refresh rewrites mirrored asset/chromebook rows and bumps the mirror generation, so
+# the ETag is derived from both generations + the request instead of the body and a
+# match skips the handler. Only endpoints served purely from the local tables belong
+# here: the combined/unified searches also fall back to live IIQ/Google lookups,
+# which change results without either bump.
+ETAG_PATH_PREFIXES = (
+    '/api/devices/advanced-search',
+    '/api/dashboard/',
+    '/api/reports/',
+)
+SYNC_GENERATION_CHECK_SECONDS = 5.0
+_sync_generation = {'value': None, 'checked_at': 0.0}
+
+
+def current_sync_generation():
+    """Sync + mirror generation, re-read from Redis at most every few seconds per worker"""
+    now = time.time()
+    if now - _sync_generation['checked_at'] >= SYNC_GENERATION_CHECK_SECONDS:
+        generation = cache.get(CacheKeys.sync_generation())
+        if generation is not None:
+            generation = f"{generation}.{cache.get(CacheKeys.mirror_generation()) or 0}"
+        _sync_generation['value'] = generation
+        _sync_generation['checked_at'] = now
+    return _sync_generation['value']
+
+
+def negotiated_encoding(request: Request) -> str:
+    accept = request.headers.get('accept-encoding', '')
+    if BROTLI_AVAILABLE and 'br' in accept:
+        return 'br'
+    if 'gzip' in accept:
+        return 'gzip'
+    return 'identity'
+
+
+def build_etag(request: Request) -> Optional[str]:
+    """Strong ETag from sync/mirror generation + path + sorted query params + response encoding"""
+    generation = current_sync_generation()
+    if generation is None:
+        return None
+    query = '&'.join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    raw = f"{generation}|{request.url.path}|{query}|{negotiated_encoding(request)}"
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
 
-# Add cache control middleware for static files
-class NoCacheMiddleware(BaseHTTPMiddleware):
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
+        if (request.method != 'GET'
+                or not request.url.path.startswith(ETAG_PATH_PREFIXES)
+                or not request.session.get('user')):
+            return await call_next(request)
+
+        etag = build_etag(request)
+        headers = {'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding, Cookie'}
+        if etag:
+            headers['ETag'] = etag
+            if_none_match = request.headers.get('if-none-match', '')
+            candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            if etag in candidates or '*' in candidates:
+                return Response(status_code=304, headers=headers)
+
         response = await call_next(request)
+        if response.status_code == 200 and etag:
+            response.headers.update(headers)
+        return response
 
-        # Add no-cache headers for JS and CSS files
-        if request.url.path.endswith(('.js', '.css')):
-            response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
+app.add_middleware(ConditionalGetMiddleware)
 
-        return response
+# Response compression above a size threshold (brotli when installed, else gzip)
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
+# Server-Sent Event feeds must flush every event; the compressors buffer until the body ends
+UNCOMPRESSED_PATH_SUFFIXES = ('/sync/events',)
+
+
+class CompressionMiddleware:
+    """Brotli/gzip compression that passes event streams through untouched"""
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        if BROTLI_AVAILABLE:
+            self.compressed_app = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    @staticmethod
+    def is_event_stream(scope) -> bool:
+        if scope['path'].endswith(UNCOMPRESSED_PATH_SUFFIXES):
+            return True
+        accept = dict(scope.get('headers') or []).get(b'accept', b'')
+        return b'text/event-stream' in accept
 
-app.add_middleware(NoCacheMiddleware)
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and self.is_event_stream(scope):
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed_app(scope, receive, send)
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+# Mount static files. Templates link assets through static_url(), which emits
+# content-hashed names served as immutable (precompressed .br/.gz when accepted).
+with startup_report.measure('static asset manifest'):
+    static_manifest = StaticManifest("static")
+app.mount("/static", FingerprintedStaticFiles(directory="static", manifest=static_manifest), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals['static_url'] = static_manifest.url
 
 # Session middleware for authentication
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
 
-# OAuth setup
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=GOOGLE_CLIENT_ID,
-    client_secret=GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
+# OAuth setup (authlib is imported and configured on the first login)
+_oauth = None
+
+
+def get_oauth():
+    """Authlib OAuth registry with the Google provider registered"""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        oauth = OAuth()
+        oauth.register(
+            name='google',
+            client_id=GOOGLE_CLIENT_ID,
+            client_secret=GOOGLE_CLIENT_SECRET,
+            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            client_kwargs={'scope': 'openid email profile'}
+        )
+        _oauth = oauth
+    return _oauth
 
 # CORS
 app.add_middleware(
@@ -127,6 +274,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request time by subsystem (Postgres, Redis, IIQ, Google, Meraki).
+# Added last so it is the outermost middleware and sees the full request.
+with startup_report.measure('instrumentation'):
+    instrument_clients()
+    app.add_middleware(ServerTimingMiddleware)
+    metrics.register_engine('main', engine)
+    metrics.install()
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint (bearer token required when METRICS_TOKEN is set)"""
+    if METRICS_TOKEN and request.headers.get('authorization') != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # Authentication dependency
 async def get_current_user(request: Request):
     user = request.session.get('user')
@@ -134,6 +301,13 @@ async def get_current_user(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
     return user
 
+
+@app.get("/api/startup-report")
+async def get_startup_report(user: dict = Depends(get_current_user)):
+    """Import and init cost per phase for this worker (lazy imports appear after first use)"""
+    return {"pid": os.getpid(), **startup_report.summary()}
+
+
 # Redis connection
 redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
 
@@ -165,6 +339,9 @@ def get_google_service():
         if not os.path.exists(SERVICE_ACCOUNT_FILE):
             raise HTTPException(status_code=500, detail="Service account file not found")
         
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         credentials = service_account.Credentials.from_service_account_file(
             SERVICE_ACCOUNT_FILE,
             scopes=SCOPES
@@ -219,63 +396,17 @@ def get_google_user(service, email: str) -> Optional[Dict]:
         logger.error(f"Error fetching Google user {email}: {e}")
         return None
 
-def get_user_chromebook_history(service, email: str, iiq_client) -> List[Dict]:
-    """Get Chromebooks this user has logged into with asset tags from IIQ"""
-    try:
-        # Search for devices where this user appears in recentUsers
-        results = service.chromeosdevices().list(
-            customerId='my_customer',
-            projection='FULL',
-            maxResults=100
-        ).execute()
-        
-        devices = results.get('chromeosdevices', [])
-        user_devices = []
-        
-        for device in devices:
-            recent_users = device.get('recentUsers', [])
-            for recent_user in recent_users:
-                if recent_user.get('email', '').lower() == email.lower():
-                    serial = device.get('serialNumber', 'N/A')
-                    
-                    # Try to get asset tag from IIQ
-                    asset_tag = 'N/A'
-                    asset_id = ''
-                    if serial != 'N/A':
-                        iiq_results = iiq_client.search_and_extract(serial, limit=1)
-                        if iiq_results:
-                            asset_tag = iiq_results[0].get('assetTag', 'N/A')
-                            asset_id = iiq_results[0].get('assetId', '')
-                    
-                    user_devices.append({
-                        'assetTag': asset_tag,
-                        'assetId': asset_id,
-                        'serialNumber': serial,
-                        'model': device.get('model', 'N/A'),
-                        'lastSync': device.get('lastSync', 'N/A'),
-                        'orgUnitPath': device.get('orgUnitPath', 'N/A')
-                    })
-                    break
-        
-        # Sort by most recent and limit to 10
-        return user_devices[:10]
-        
-    except Exception as e:
-        logger.error(f"Error fetching user device history: {e}")
-        return []
-
-
 @app.get("/login")
 async def login(request: Request):
     """Redirect to Google login"""
     redirect_uri = REDIRECT_URI
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_oauth().google.authorize_redirect(request, redirect_uri)
 
 @app.get("/auth/callback")
 async def auth_callback(request: Request):
     """Handle Google OAuth callback"""
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_oauth().google.authorize_access_token(request)
         user_info = token.get('userinfo')
         
         # Check domain
@@ -284,7 +415,11 @@ async def auth_callback(request: Request):
             raise HTTPException(status_code=403, detail=f"Only {ALLOWED_DOMAIN} emails allowed")
         
         # Check group membership if specified
-        if ALLOWED_GROUP:
+        # Fast path: expanded membership set refreshed by sync_allowed_group.py
+        group_members_key = CacheKeys.allowed_group_members(ALLOWED_GROUP) if ALLOWED_GROUP else None
+        if ALLOWED_GROUP and cache.is_set_member(group_members_key, email.lower()):
+            logger.info(f"User {email} is member of {ALLOWED_GROUP} (cached membership)")
+        elif ALLOWED_GROUP:
             try:
                 google_service = get_google_service()
                 
@@ -298,6 +433,9 @@ async def auth_callback(request: Request):
                     
                     if result.get('isMember'):
                         logger.info(f"User {email} is member of {ALLOWED_GROUP} (direct or nested)")
+                        # Remember the hit until the next scheduled refresh replaces the set
+                        # (only added to a live, expiring set - never creates one)
+                        cache.add_to_set(group_members_key, email.lower())
                     else:
                         logger.warning(f"User {email} not in group {ALLOWED_GROUP}")
                         raise HTTPException(
@@ -347,6 +485,15 @@ async def health_check(user: dict = Depends(get_current_user), ):
         "incidentiq_configured": bool(INCIDENTIQ_SITE_ID and INCIDENTIQ_API_TOKEN)
     }
 
+@app.get("/api/metrics/latency")
+async def latency_metrics(user: dict = Depends(get_current_user)):
+    """Rolling p50/p95/p99 (ms) per route for this worker process"""
+    return {
+        "pid": os.getpid(),
+        "window": latency_tracker.window,
+        "routes": latency_tracker.percentiles()
+    }
+
 @app.get("/api/dashboard/stats")
 async def dashboard_stats(user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get dashboard analytics from database - instant results"""
@@ -404,9 +551,7 @@ async def dashboard_aue_expiration(
             SELECT COUNT(*)
             FROM chromebooks
             WHERE status = 'ACTIVE'
-            AND aue_date IS NOT NULL
-            AND aue_date <> ''
-            AND EXTRACT(YEAR FROM aue_date::date) < :current_year
+            AND aue_year < :current_year
         """)
         expired_result = db.execute(expired_query, {"current_year": current_year}).fetchone()
         expired_count = expired_result[0] if expired_result else 0
@@ -424,15 +569,13 @@ async def dashboard_aue_expiration(
                 ) as models
             FROM (
                 SELECT
-                    EXTRACT(YEAR FROM aue_date::date)::integer as aue_year,
+                    aue_year,
                     model,
                     COUNT(*) as model_count
                 FROM chromebooks
                 WHERE status = 'ACTIVE'
-                AND aue_date IS NOT NULL
-                AND aue_date <> ''
-                AND EXTRACT(YEAR FROM aue_date::date) >= :current_year
-                GROUP BY EXTRACT(YEAR FROM aue_date::date)::integer, model
+                AND aue_year >= :current_year
+                GROUP BY aue_year, model
             ) subquery
             GROUP BY aue_year
             ORDER BY aue_year
@@ -512,6 +655,78 @@ async def dashboard_security_alerts(
         logger.error(f"Dashboard security alerts error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch security alerts: {str(e)}")
 
+# Whole home page in one read: the single-row stats view plus the (year, model) AUE rows
+DASHBOARD_BOOTSTRAP_QUERY = text("""
+    SELECT
+        s.*,
+        COALESCE((
+            SELECT jsonb_agg(
+                jsonb_build_object('year', a.aue_year, 'model', a.model, 'count', a.device_count)
+                ORDER BY a.aue_year, a.model
+            )
+            FROM mv_dashboard_aue a
+        ), '[]'::jsonb) AS aue_rows
+    FROM mv_dashboard_stats s
+""")
+
+
+@app.get("/api/dashboard/bootstrap")
+async def dashboard_bootstrap(user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    All home-page widget data in one round trip, read from the materialized views
+    refreshed at the end of each sync. Each section matches the shape of
+    /api/dashboard/stats, /api/dashboard/aue-expiration and /api/dashboard/security-alerts.
+    """
+    try:
+        row = db.execute(DASHBOARD_BOOTSTRAP_QUERY).fetchone()
+        if not row:
+            raise HTTPException(status_code=503, detail="Dashboard views are empty - run a sync")
+
+        timestamp = datetime.utcnow().isoformat()
+        current_year = datetime.now().year
+
+        expired_count = 0
+        years = {}
+        for aue in row.aue_rows or []:
+            if aue['year'] < current_year:
+                expired_count += aue['count']
+                continue
+            year = years.setdefault(aue['year'], {"year": aue['year'], "count": 0, "models": []})
+            year["count"] += aue['count']
+            year["models"].append({"model": aue['model'], "count": aue['count']})
+
+        return {
+            "stats": {
+                "total_devices": row.total_devices,
+                "active": row.active,
+                "disabled": row.disabled,
+                "provisioned": row.provisioned,
+                "deprovisioned": row.deprovisioned,
+                "last_sync": row.last_sync.isoformat() if row.last_sync else None,
+                "timestamp": timestamp
+            },
+            "aueExpiration": {
+                "expiredCount": expired_count,
+                "years": [years[y] for y in sorted(years)],
+                "currentYear": current_year,
+                "timestamp": timestamp
+            },
+            "securityAlerts": {
+                "devModeCount": row.dev_mode_count,
+                "poorBatteryCount": row.poor_battery_count,
+                "pendingRepairsCount": row.pending_repairs_count,
+                "totalAlerts": row.total_alerts,
+                "timestamp": timestamp
+            },
+            "refreshedAt": row.refreshed_at.isoformat() if row.refreshed_at else None
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Dashboard bootstrap error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch dashboard data: {str(e)}")
+
 @app.post("/api/dashboard/refresh-widgets")
 async def refresh_dashboard_widgets(
     user: dict = Depends(get_current_user),
@@ -521,6 +736,10 @@ async def refresh_dashboard_widgets(
     try:
         cache.delete(CacheKeys.dashboard_aue_expiration())
         cache.delete(CacheKeys.dashboard_security_alerts())
+        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_stats"))
+        db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_aue"))
+        db.commit()
+        cache.increment(CacheKeys.sync_generation())  # invalidates dashboard ETags
 
         logger.info(f"Dashboard widget caches invalidated by user: {user.get('email')}")
 
@@ -533,7 +752,112 @@ async def refresh_dashboard_widgets(
         logger.error(f"Dashboard widget refresh error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to refresh widgets: {str(e)}")
 
-@app.get("/api/devices/advanced-search")
+def build_device_filters(
+    status: str = None,
+    model: str = None,
+    location: str = None,
+    org_unit: str = None,
+    battery_min: int = None,
+    battery_max: int = None,
+    boot_mode: str = None,
+    aue_year: int = None,
+    repair_status: str = None
+):
+    """
+    Build the chromebooks WHERE clause shared by advanced search and export
+
+    Returns:
+        (where_clause, params) - columns use the c. prefix for chromebooks
+    """
+    # Build dynamic WHERE clauses (use c. prefix for chromebooks table)
+    conditions = ["1=1"]  # Always true base condition
+    params = {}
+
+    if status:
+        conditions.append("c.status = :status")
+        params["status"] = status
+
+    if model:
+        conditions.append("c.model ILIKE :model")
+        params["model"] = f"%{model}%"
+
+    if location:
+        conditions.append("(c.iiq_location ILIKE :location OR c.annotated_location ILIKE :location)")
+        params["location"] = f"%{location}%"
+
+    if org_unit:
+        conditions.append("c.org_unit_path LIKE :org_unit || '%'")
+        params["org_unit"] = org_unit
+
+    if battery_min is not None:
+        conditions.append("c.battery_health >= :battery_min")
+        params["battery_min"] = battery_min
+
+    if battery_max is not None:
+        conditions.append("c.battery_health <= :battery_max")
+        params["battery_max"] = battery_max
+
+    if boot_mode:
+        conditions.append("c.boot_mode = :boot_mode")
+        params["boot_mode"] = boot_mode
+
+    if aue_year:
+        conditions.append("c.aue_year = :aue_year")
+        params["aue_year"] = aue_year
+
+    if repair_status:
+        conditions.append("c.iiq_status = :repair_status")
+        params["repair_status"] = repair_status
+
+    return " AND ".join(conditions), params
+
+
+# Output field -> SQL expression (aliases c/a/u as joined in advanced_device_search)
+ADVANCED_SEARCH_COLUMNS = {
+    "device_id": "c.device_id",
+    "serial_number": "c.serial_number",
+    "asset_tag": "COALESCE(a.asset_tag, SPLIT_PART(c.asset_tag, ' | ', 1))",
+    "model": "c.model",
+    "status": "c.status",
+    "annotated_user": "c.annotated_user",
+    "iiq_owner_email": "c.iiq_owner_email",
+    "iiq_owner_name": "c.iiq_owner_name",
+    "iiq_location": "c.iiq_location",
+    "iiq_room": "c.iiq_room",
+    "annotated_location": "c.annotated_location",
+    "org_unit_path": "c.org_unit_path",
+    "battery_health": "c.battery_health",
+    "boot_mode": "c.boot_mode",
+    "auto_update_expiration": "c.auto_update_expiration",
+    "iiq_status": "c.iiq_status",
+    "iiq_notes": "c.iiq_notes",
+    "last_sync_status": "c.last_sync_status",
+    "updated_at": "c.updated_at",
+    "iiq_asset_id": "COALESCE(c.iiq_asset_id, a.asset_id)",
+    "mac_address": "c.mac_address",
+    "ip_address": "c.ip_address",
+    "wan_ip_address": "c.wan_ip_address",
+    "os_version": "c.os_version",
+    "last_used_date": "c.last_used_date",
+    "recent_users": "c.recent_users",
+    "iiqOwnerStudentId": "COALESCE(u.student_id, a.owner_student_id)",
+    "studentGrade": "COALESCE(u.student_grade, a.owner_student_grade)",
+    "userFullName": "u.full_name",
+}
+
+
+def parse_advanced_search_fields(fields: Optional[str]) -> List[str]:
+    """Validate a comma-separated fields= value (all columns when empty)"""
+    if not fields:
+        return list(ADVANCED_SEARCH_COLUMNS)
+    keys = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [k for k in keys if k not in ADVANCED_SEARCH_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return keys
+
+
+@app.get("/api/devices/advanced-search", response_class=FastJSONResponse)
 async def advanced_device_search(
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -547,56 +871,26 @@ async def advanced_device_search(
     aue_year: int = None,
     repair_status: str = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    fields: str = None
 ):
-    """Advanced multi-criteria device search with pagination"""
+    """
+    Advanced multi-criteria device search with pagination.
+    `fields` (comma-separated) limits the selected columns to what the caller renders;
+    the live IIQ assetId lookup only runs when iiq_asset_id is requested.
+    """
     try:
-        # Build dynamic WHERE clauses (use c. prefix for chromebooks table)
-        conditions = ["1=1"]  # Always true base condition
-        params = {}
-
-        if status:
-            conditions.append("c.status = :status")
-            params["status"] = status
-
-        if model:
-            conditions.append("c.model ILIKE :model")
-            params["model"] = f"%{model}%"
-
-        if location:
-            conditions.append("(c.iiq_location ILIKE :location OR c.annotated_location ILIKE :location)")
-            params["location"] = f"%{location}%"
-
-        if org_unit:
-            conditions.append("c.org_unit_path LIKE :org_unit || '%'")
-            params["org_unit"] = org_unit
-
-        if battery_min is not None:
-            conditions.append("c.battery_health >= :battery_min")
-            params["battery_min"] = battery_min
-
-        if battery_max is not None:
-            conditions.append("c.battery_health <= :battery_max")
-            params["battery_max"] = battery_max
-
-        if boot_mode:
-            conditions.append("c.boot_mode = :boot_mode")
-            params["boot_mode"] = boot_mode
-
-        if aue_year:
-            conditions.append("EXTRACT(YEAR FROM c.auto_update_expiration::date) = :aue_year")
-            params["aue_year"] = aue_year
-
-        if repair_status:
-            conditions.append("c.iiq_status = :repair_status")
-            params["repair_status"] = repair_status
+        keys = parse_advanced_search_fields(fields)
+        where_clause, params = build_device_filters(
+            status=status, model=model, location=location, org_unit=org_unit,
+            battery_min=battery_min, battery_max=battery_max, boot_mode=boot_mode,
+            aue_year=aue_year, repair_status=repair_status
+        )
 
         # Add pagination params
         params["limit"] = limit
         params["offset"] = offset
 
-        where_clause = " AND ".join(conditions)
-
         # Count total matching records
         count_query = text(f"""
             SELECT COUNT(*)
@@ -605,26 +899,20 @@ async def advanced_device_search(
         """)
         total_count = db.execute(count_query, params).fetchone()[0]
 
-        # Fetch paginated results with JOIN to get IIQ asset tag and student ID
+        # Fetch paginated results with JOIN to get IIQ asset tag and student ID.
+        # Only the requested columns are selected; serial_number is always needed internally.
+        select_keys = list(keys)
+        if 'serial_number' not in select_keys:
+            select_keys.append('serial_number')
+        select_list = ",\n                ".join(
+            f'{ADVANCED_SEARCH_COLUMNS[key]} AS "{key}"' for key in select_keys
+        )
         data_query = text(f"""
             SELECT
-                c.device_id, c.serial_number,
-                COALESCE(a.asset_tag, SPLIT_PART(c.asset_tag, ' | ', 1)) as asset_tag,
-                c.model, c.status,
-                c.annotated_user, c.iiq_owner_email, c.iiq_owner_name,
-                c.iiq_location, c.iiq_room, c.annotated_location,
-                c.org_unit_path, c.battery_health, c.boot_mode,
-                c.auto_update_expiration, c.iiq_status, c.iiq_notes,
-                c.last_sync_status, c.updated_at,
-                COALESCE(c.iiq_asset_id, a.asset_id) as iiq_asset_id,
-                c.mac_address, c.ip_address, c.wan_ip_address, c.os_version, c.last_used_date,
-                c.recent_users,
-                COALESCE(u.student_id, a.owner_student_id) as student_id,
-                COALESCE(u.student_grade, a.owner_student_grade) as student_grade,
-                u.full_name as user_full_name
+                {select_list}
             FROM chromebooks c
             LEFT JOIN assets a ON c.serial_number = a.serial_number
-            LEFT JOIN users u ON LOWER(COALESCE(c.iiq_owner_email, c.annotated_user)) = LOWER(u.email)
+            LEFT JOIN users u ON u.user_id = c.owner_user_id
             WHERE {where_clause}
             ORDER BY COALESCE(a.asset_tag, SPLIT_PART(c.asset_tag, ' | ', 1)) NULLS LAST, c.serial_number
             LIMIT :limit OFFSET :offset
@@ -633,10 +921,12 @@ async def advanced_device_search(
         results = db.execute(data_query, params).fetchall()
 
         # Build lookup of serial numbers to get real-time assetIds from IIQ
+        # (skipped when the caller didn't ask for iiq_asset_id)
         iiq_asset_lookup = {}
-        serials_for_iiq = [row[1] for row in results]  # Extract serial numbers
+        serials_for_iiq = [row.serial_number for row in results] if 'iiq_asset_id' in keys else []
         if serials_for_iiq:
             try:
+                from integrations.incidentiq import IncidentIQClient
                 iiq_client = IncidentIQClient(INCIDENTIQ_SITE_ID, INCIDENTIQ_API_TOKEN, INCIDENTIQ_PRODUCT_ID)
                 for serial in serials_for_iiq:
                     iiq_results = iiq_client.search_and_extract(serial, limit=1)
@@ -647,45 +937,16 @@ async def advanced_device_search(
 
         devices = []
         for row in results:
-            serial = row[1]
-            # Use real-time assetId from IIQ if available, otherwise use database value
-            real_time_asset_id = iiq_asset_lookup.get(serial) or row[19]
-
-            devices.append({
-                "device_id": row[0],
-                "serial_number": row[1],
-                "asset_tag": row[2],
-                "model": row[3],
-                "status": row[4],
-                "annotated_user": row[5],
-                "iiq_owner_email": row[6],
-                "iiq_owner_name": row[7],
-                "iiq_location": row[8],
-                "iiq_room": row[9],
-                "annotated_location": row[10],
-                "org_unit_path": row[11],
-                "battery_health": row[12],
-                "boot_mode": row[13],
-                "auto_update_expiration": row[14],
-                "iiq_status": row[15],
-                "iiq_notes": row[16],
-                "last_sync_status": row[17],
-                "updated_at": row[18].isoformat() if row[18] else None,
-                "iiq_asset_id": real_time_asset_id,
-                "mac_address": row[20],
-                "ip_address": row[21],
-                "wan_ip_address": row[22],
-                "os_version": row[23],
-                "last_used_date": row[24].isoformat() if row[24] else None,
-                "recent_users": row[25],
-                "iiqOwnerStudentId": row[26],
-                "studentGrade": row[27],
-                "userFullName": row[28]
-            })
+            mapping = row._mapping
+            device = {key: mapping[key] for key in keys}
+            if 'iiq_asset_id' in device:
+                # Use real-time assetId from IIQ if available, otherwise use database value
+                device['iiq_asset_id'] = iiq_asset_lookup.get(row.serial_number) or device['iiq_asset_id']
+            devices.append(device)
 
         logger.info(f"Advanced search: {total_count} devices matched, returning {len(devices)} (offset={offset})")
 
-        return {
+        return FastJSONResponse({
             "devices": devices,
             "total_count": total_count,
             "limit": limit,
@@ -702,25 +963,451 @@ async def advanced_device_search(
                 "repair_status": repair_status
             },
             "timestamp": datetime.utcnow().isoformat()
-        }
+        })
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Advanced search error: {e}")
         raise HTTPException(status_code=500, detail=f"Advanced search failed: {str(e)}")
 
+
+EXPORT_COLUMNS = [
+    'serial_number', 'asset_tag', 'model', 'status', 'iiq_status', 'org_unit_path',
+    'annotated_user', 'iiq_owner_email', 'iiq_owner_name', 'student_id',
+    'iiq_location', 'iiq_room', 'annotated_location', 'battery_health', 'boot_mode',
+    'auto_update_expiration', 'os_version', 'mac_address', 'ip_address',
+    'last_used_date', 'device_id'
+]
+EXPORT_BATCH_SIZE = 1000
+
+
+def stream_device_export(where_clause: str, params: Dict, export_format: str):
+    """
+    Yield CSV or NDJSON chunks straight from a server-side cursor.
+    Rows are fetched EXPORT_BATCH_SIZE at a time, so memory is flat regardless of row count.
+    """
+    query = text(f"""
+        SELECT
+            c.serial_number,
+            COALESCE(a.asset_tag, SPLIT_PART(c.asset_tag, ' | ', 1)) as asset_tag,
+            c.model, c.status, c.iiq_status, c.org_unit_path,
+            c.annotated_user, c.iiq_owner_email, c.iiq_owner_name,
+            COALESCE(u.student_id, a.owner_student_id) as student_id,
+            c.iiq_location, c.iiq_room, c.annotated_location, c.battery_health, c.boot_mode,
+            c.auto_update_expiration, c.os_version, c.mac_address, c.ip_address,
+            c.last_used_date, c.device_id
+        FROM chromebooks c
+        LEFT JOIN assets a ON c.serial_number = a.serial_number
+        LEFT JOIN users u ON u.user_id = c.owner_user_id
+        WHERE {where_clause}
+        ORDER BY c.serial_number
+    """)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == 'csv':
+        writer.writerow(EXPORT_COLUMNS)
+
+    # stream_results -> psycopg2 named (server-side) cursor
+    with engine.connect().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE) as conn:
+        result = conn.execute(query, params)
+        for batch in result.partitions():
+            for row in batch:
+                values = [v.isoformat() if hasattr(v, 'isoformat') else v for v in row]
+                if export_format == 'csv':
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, values))))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@app.get("/api/devices/export")
+async def export_devices(
+    user: dict = Depends(get_current_user),
+    format: str = "csv",
+    status: str = None,
+    model: str = None,
+    location: str = None,
+    org_unit: str = None,
+    battery_min: int = None,
+    battery_max: int = None,
+    boot_mode: str = None,
+    aue_year: int = None,
+    repair_status: str = None
+):
+    """
+    Export every device matching the advanced-search filters as CSV or NDJSON.
+    Streamed with chunked transfer encoding from a server-side cursor (no paging, no row limit).
+    """
+    export_format = format.lower()
+    if export_format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+
+    where_clause, params = build_device_filters(
+        status=status, model=model, location=location, org_unit=org_unit,
+        battery_min=battery_min, battery_max=battery_max, boot_mode=boot_mode,
+        aue_year=aue_year, repair_status=repair_status
+    )
+
+    filename = f"devices-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    media_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+
+    logger.info(f"Device export ({export_format}) started by {user.get('email')} with filters {params}")
+
+    return StreamingResponse(
+        stream_device_export(where_clause, params, export_format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def stream_bulk_lookup(keys: List[str], found: Dict[str, Dict], not_found: List[str]):
+    """NDJSON: one line per matched key (input order), then a notFound/summary line"""
+    buffer = []
+    for key in keys:
+        record = found.get(key)
+        if record is None:
+            continue
+        buffer.append(json.dumps({'key': key, **record}, default=str))
+        if len(buffer) >= 500:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    buffer.append(json.dumps({
+        'notFound': not_found,
+        'summary': {'requested': len(keys), 'found': len(found), 'notFound': len(not_found)}
+    }))
+    yield '\n'.join(buffer) + '\n'
+
+
+@app.post("/api/devices/bulk-lookup")
+async def bulk_lookup_devices(
+    request: Request,
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Resolve up to MAX_BULK_KEYS serials, asset tags or MAC addresses in one call.
+
+    Body: {"keys": [...]}, a JSON list, or text/plain with one key per line.
+    Each key type is one `= ANY(:keys)` query against chromebooks and assets, so
+    10k keys cost a handful of index lookups instead of 10k requests. Streams
+    NDJSON: one merged record per matched key, then a final line listing every
+    key that matched nothing.
+    """
+    content_type = request.headers.get('content-type', '')
+    try:
+        if content_type.startswith('application/json'):
+            body = await request.json()
+            raw_keys = body.get('keys', []) if isinstance(body, dict) else body
+            if not isinstance(raw_keys, list):
+                raise ValueError("'keys' must be a list")
+        else:
+            raw_keys = (await request.body()).decode('utf-8').splitlines()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid body: {str(e)}")
+
+    keys = normalize_keys(raw_keys)
+    if not keys:
+        raise HTTPException(status_code=400, detail="No keys provided")
+    if len(keys) > MAX_BULK_KEYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_KEYS} keys per request (got {len(keys)})")
+
+    try:
+        found, not_found = lookup_keys(db, keys)
+    except Exception as e:
+        logger.error(f"Bulk lookup error ({len(keys)} keys): {e}")
+        raise HTTPException(status_code=500, detail=f"Lookup failed: {str(e)}")
+
+    logger.info(f"Bulk lookup by {user.get('email')}: {len(keys)} keys, {len(found)} found")
+
+    return StreamingResponse(
+        stream_bulk_lookup(keys, found, not_found),
+        media_type='application/x-ndjson'
+    )
+
+
+@app.websocket("/ws/scan")
+async def scan_session_socket(websocket: WebSocket):
+    """
+    Inventory scanning: the client streams scanned tags, the server resolves them
+    in ~50 ms micro-batches and pushes results plus the session tally back.
+    See services.scan_session.ScanSession for the message format.
+    """
+    user = websocket.session.get('user')
+    if not user:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    session = ScanSession(SessionLocal, websocket.send_json)
+
+    async def close_after_batcher_error():
+        try:
+            await websocket.close(code=1011)
+        except RuntimeError:
+            pass  # Already closed
+
+    def batcher_done(task: asyncio.Task):
+        # A dead batcher would leave scans unresolved: close so the client reconnects
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Scan session batcher for {user.get('email')} stopped: {error}")
+            asyncio.create_task(close_after_batcher_error())
+
+    batcher = asyncio.create_task(session.run())
+    batcher.add_done_callback(batcher_done)
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                await session.handle(message)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                # One bad message must not drop the socket (and the in-memory tally)
+                logger.warning(f"Scan session message from {user.get('email')} failed: {e}")
+                await websocket.send_json({'type': 'error', 'detail': f"Could not process message: {str(e)}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        batcher.cancel()
+        logger.info(f"Scan session by {user.get('email')} closed: {session.tally()}")
+
+
+# Local mirror columns, shaped like IncidentIQClient.extract_asset_info() output
+LOCAL_ASSET_SEARCH_QUERY = text("""
+    SELECT
+        a.asset_id, a.asset_tag, a.serial_number, a.model, a.device_type, a.status,
+        a.owner_email, a.owner_name, a.owner_student_id, a.location
+    FROM assets a
+    WHERE UPPER(a.asset_tag) = :q_upper
+       OR UPPER(a.serial_number) = :q_upper
+       OR a.owner_email_lower = :q_lower
+    ORDER BY a.asset_tag
+    LIMIT 50
+""")
+
+# Google-only devices (no IIQ asset row yet)
+LOCAL_CHROMEBOOK_SEARCH_QUERY = text("""
+    SELECT
+        c.iiq_asset_id, SPLIT_PART(c.asset_tag, ' | ', 1), c.serial_number, c.model, 'Chromebooks', c.iiq_status,
+        COALESCE(c.iiq_owner_email, c.annotated_user), c.iiq_owner_name, NULL, c.iiq_location
+    FROM chromebooks c
+    WHERE c.serial_number = :q_upper
+       OR UPPER(c.asset_tag) = :q_upper
+       OR c.owner_email_lower = :q_lower
+    ORDER BY c.asset_tag
+    LIMIT 50
+""")
+
+
+def search_local_assets(db: Session, query: str) -> List[Dict]:
+    """Indexed serial/asset tag/owner lookup against the local IIQ + Google mirror"""
+    params = {"q_upper": query.strip().upper(), "q_lower": query.strip().lower()}
+
+    rows = db.execute(LOCAL_ASSET_SEARCH_QUERY, params).fetchall()
+    if not rows:
+        rows = db.execute(LOCAL_CHROMEBOOK_SEARCH_QUERY, params).fetchall()
+
+    return [
+        {
+            'assetId': row[0] or '',
+            'assetTag': row[1] or 'N/A',
+            'serialNumber': row[2] or 'N/A',
+            'model': row[3] or 'N/A',
+            'deviceType': row[4] or 'Unknown',
+            'status': row[5] or 'N/A',
+            'assignedUserEmail': row[6] or '',
+            'assignedUser': row[7] or 'Not assigned',
+            'assignedUserStudentId': row[8] or '',
+            'location': row[9] or 'N/A',
+            'isChromebook': row[4] == 'Chromebooks'
+        }
+        for row in rows
+    ]
+
+
+def refresh_iiq_assets(serials: List[str]):
+    """
+    Background task: re-fetch matched assets from IIQ and update the local mirror.
+    Each serial is refreshed at most once per 5 minutes across all workers.
+    """
+    serials = [
+        s for s in serials[:10]
+        if s and s != 'N/A' and not cache.exists(CacheKeys.iiq_asset_refresh(s))
+    ]
+    if not serials:
+        return
+
+    # assets.asset_tag is unique too: a tag still held by another asset row (moved
+    # tag, shared placeholder) is left as-is until the full sync reconciles it.
+    # `changed` compares against the pre-statement row (the CTE reads the old snapshot).
+    upsert_asset = text("""
+        WITH old AS (
+            SELECT asset_tag, serial_number, device_type, model, status, owner_email, owner_name,
+                   owner_student_id, owner_student_grade, location, room
+            FROM assets WHERE asset_id = :asset_id
+        )
+        INSERT INTO assets (
+            asset_id, asset_tag, serial_number, device_type, model, status,
+            owner_email, owner_name, owner_student_id, owner_student_grade,
+            location, room, last_synced
+        ) VALUES (
+            :asset_id,
+            CASE WHEN EXISTS (
+                SELECT 1 FROM assets t WHERE t.asset_tag = :asset_tag AND t.asset_id <> :asset_id
+            ) THEN NULL ELSE :asset_tag END,
+            :serial_number, :device_type, :model, :status,
+            :owner_email, :owner_name, :owner_student_id, :owner_student_grade,
+            :location, :room, NOW()
+        )
+        ON CONFLICT (asset_id) DO UPDATE SET
+            asset_tag = COALESCE(EXCLUDED.asset_tag, assets.asset_tag),
+            serial_number = EXCLUDED.serial_number,
+            device_type = EXCLUDED.device_type,
+            model = EXCLUDED.model,
+            status = EXCLUDED.status,
+            owner_email = EXCLUDED.owner_email,
+            owner_name = EXCLUDED.owner_name,
+            owner_student_id = EXCLUDED.owner_student_id,
+            owner_student_grade = EXCLUDED.owner_student_grade,
+            location = EXCLUDED.location,
+            room = EXCLUDED.room,
+            last_synced = NOW(),
+            updated_at = NOW()
+        RETURNING NOT EXISTS (
+            SELECT 1 FROM old o
+            WHERE (o.asset_tag, o.serial_number, o.device_type, o.model, o.status, o.owner_email, o.owner_name,
+                   o.owner_student_id, o.owner_student_grade, o.location, o.room)
+                  IS NOT DISTINCT FROM
+                  (assets.asset_tag, assets.serial_number, assets.device_type, assets.model, assets.status,
+                   assets.owner_email, assets.owner_name, assets.owner_student_id, assets.owner_student_grade,
+                   assets.location, assets.room)
+        ) AS changed
+    """)
+    # owner_user_id is re-resolved from the new owner the same way the full sync
+    # does (owner_email_lower = LOWER(COALESCE(iiq_owner_email, annotated_user)))
+    update_chromebook = text("""
+        UPDATE chromebooks c SET
+            iiq_asset_id = :asset_id,
+            iiq_status = :status,
+            iiq_owner_email = :owner_email,
+            iiq_owner_name = :owner_name,
+            iiq_location = :location,
+            owner_user_id = (
+                SELECT u.user_id FROM users u
+                WHERE u.email_lower = LOWER(COALESCE(:owner_email, c.annotated_user))
+                LIMIT 1
+            )
+        FROM chromebooks old
+        WHERE old.device_id = c.device_id
+          AND c.serial_number = :serial_upper
+        RETURNING (old.iiq_asset_id, old.iiq_status, old.iiq_owner_email, old.iiq_owner_name,
+                   old.iiq_location, old.owner_user_id)
+                  IS DISTINCT FROM
+                  (c.iiq_asset_id, c.iiq_status, c.iiq_owner_email, c.iiq_owner_name,
+                   c.iiq_location, c.owner_user_id) AS changed
+    """)
+
+    from integrations.incidentiq import IncidentIQClient
+    iiq_client = IncidentIQClient(INCIDENTIQ_SITE_ID, INCIDENTIQ_API_TOKEN, INCIDENTIQ_PRODUCT_ID)
+    session = SessionLocal()
+    refreshed = 0
+    changed = False
+    try:
+        for serial in serials:
+            cache.set(CacheKeys.iiq_asset_refresh(serial), True, ttl=300)
+            try:
+                assets = iiq_client.search_and_extract(serial, limit=1)
+            except Exception as e:
+                logger.warning(f"Background IIQ refresh fetch failed for {serial}: {e}")
+                continue
+            for asset in assets:
+                if not asset.get('assetId'):
+                    continue
+                params = {
+                    'asset_id': asset['assetId'],
+                    'asset_tag': asset.get('assetTag', 'N/A'),
+                    'serial_number': asset.get('serialNumber', 'N/A'),
+                    'serial_upper': asset.get('serialNumber', '').upper(),
+                    'device_type': asset.get('deviceType', 'Unknown'),
+                    'model': asset.get('model', 'N/A'),
+                    'status': asset.get('status', 'N/A'),
+                    'owner_email': asset.get('assignedUserEmail', ''),
+                    'owner_name': asset.get('assignedUser', 'Not assigned'),
+                    'owner_student_id': asset.get('assignedUserStudentId', ''),
+                    'owner_student_grade': asset.get('assignedUserGrade', ''),
+                    'location': asset.get('location', 'N/A'),
+                    'room': asset.get('room', 'N/A')
+                }
+                # One commit per asset: a bad row doesn't roll back the others
+                try:
+                    asset_changed = session.execute(upsert_asset, params).scalar()
+                    rows = session.execute(update_chromebook, params).fetchall()
+                    session.commit()
+                    refreshed += 1
+                    changed = changed or bool(asset_changed) or any(row.changed for row in rows)
+                except Exception as e:
+                    session.rollback()
+                    logger.warning(f"Background IIQ refresh failed for {serial} (asset {asset['assetId']}): {e}")
+        logger.info(f"Background IIQ refresh updated {refreshed} of {len(serials)} asset(s)")
+        # Advanced search reads these columns under an ETag: invalidate it, but only on a real
+        # change (each serial refreshes at most once per 5 minutes, so bumps stay infrequent)
+        if changed:
+            cache.increment(CacheKeys.mirror_generation())
+    finally:
+        session.close()
+
+
 @app.get("/api/combined/search")
-async def combined_search(user: dict = Depends(get_current_user), query: str = "", db: Session = Depends(get_db)):
-    """IIQ-first search - real-time data from IIQ API, merged with cached Google data for chromebooks"""
+async def combined_search(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user),
+    query: str = "",
+    db: Session = Depends(get_db)
+):
+    """
+    Local-first search - answers from the assets/chromebooks mirror, then refreshes
+    matched assets from IIQ in the background. Falls back to a live IIQ search only
+    when the device is not in the local mirror yet.
+    """
     try:
         if not query:
             return {"devices": [], "count": 0, "source": "none"}
 
-        # STEP 1: Search IIQ API in real-time (all asset types)
-        iiq_client = IncidentIQClient(INCIDENTIQ_SITE_ID, INCIDENTIQ_API_TOKEN, INCIDENTIQ_PRODUCT_ID)
-        iiq_results = iiq_client.search_and_extract(query, limit=50)
+        # STEP 1: Indexed lookup against the local mirror. Asset tags and MACs are
+        # first resolved to a serial through the shared mmap index (no DB round trip).
+        resolved = lookup_index.resolve(query)
+        iiq_results = search_local_assets(db, resolved['serial'] if resolved else query)
+        source = "local"
+
+        if iiq_results:
+            background_tasks.add_task(
+                refresh_iiq_assets,
+                [asset['serialNumber'] for asset in iiq_results]
+            )
+        else:
+            # Unknown locally (new asset or free-text query) - search IIQ live.
+            # Rate limited per user; identical concurrent queries share one IIQ call.
+            enforce_rate_limit(request, 'combined_search')
+            from integrations.incidentiq import IncidentIQClient
+            iiq_client = IncidentIQClient(INCIDENTIQ_SITE_ID, INCIDENTIQ_API_TOKEN, INCIDENTIQ_PRODUCT_ID)
+            iiq_results = await iiq_search_coalescer.run(
+                query.strip().lower(), iiq_client.search_and_extract, query, limit=50
+            )
+            source = "iiq"
 
         if not iiq_results:
-            return {"devices": [], "count": 0, "source": "iiq"}
+            return {"devices": [], "count": 0, "source": source}
 
         # STEP 2: Fetch Google data from database for ALL devices (not just those marked as chromebook in IIQ)
         # Some devices may be chromebooks but not marked as such in IIQ
@@ -779,7 +1466,7 @@ async def combined_search(user: dict = Depends(get_current_user), query: str = "
                 'iiqOwnerName': iiq_asset.get('assignedUser', 'Not assigned'),
                 'iiqOwnerStudentId': iiq_asset.get('assignedUserStudentId', ''),
                 'location': iiq_asset.get('location', 'N/A'),
-                'source': 'iiq'
+                'source': source
             }
 
             # Try to merge with Google data from database (cached) for any device found in chromebooks table
@@ -816,7 +1503,7 @@ async def combined_search(user: dict = Depends(get_current_user), query: str = "
                     'aueDate': google_row[18].isoformat() if google_row[18] and hasattr(google_row[18], 'isoformat') else google_row[18],
                     'bootMode': google_row[19],
                     'lastKnownUser': last_known_user,
-                    'source': 'iiq+google'
+                    'source': f'{source}+google'
                 })
             else:
                 # Not in chromebooks table: set defaults for Google data
@@ -841,50 +1528,84 @@ async def combined_search(user: dict = Depends(get_current_user), query: str = "
 
             devices.append(device)
 
-        return {"devices": devices, "count": len(devices), "source": "iiq+google"}
+        return {"devices": devices, "count": len(devices), "source": f"{source}+google"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
+USER_SEARCH_COLUMNS = """
+    u.id, u.user_id, u.iiq_user_id, u.email, u.full_name, u.first_name, u.last_name,
+    u.org_unit_path, u.is_admin, u.is_suspended,
+    u.username, u.is_active_iiq, u.iiq_location, u.iiq_role_name,
+    u.student_id, u.student_grade, u.total_fee_balance, u.has_outstanding_fees,
+    u.data_source, u.is_merged, u.device_count
+"""
+
+# Fast path: email-shaped query -> users.email_lower equality lookup
+USER_SEARCH_BY_EMAIL = text(f"""
+    SELECT {USER_SEARCH_COLUMNS}
+    FROM users u
+    WHERE u.email_lower = :query
+    LIMIT 20
+""")
+
+# Fast path: numeric query -> idx_users_student_id equality lookup
+USER_SEARCH_BY_STUDENT_ID = text(f"""
+    SELECT {USER_SEARCH_COLUMNS}
+    FROM users u
+    WHERE u.student_id = :query
+    ORDER BY u.full_name ASC
+    LIMIT 20
+""")
+
+# Substring search served by the pg_trgm GIN indexes (migration 005)
+USER_SEARCH_FUZZY = text(f"""
+    SELECT {USER_SEARCH_COLUMNS}
+    FROM users u
+    WHERE LOWER(u.email) LIKE :pattern
+       OR LOWER(u.full_name) LIKE :pattern
+       OR u.student_id LIKE :pattern
+    ORDER BY
+        CASE
+            WHEN LOWER(u.email) LIKE :prefix THEN 0
+            WHEN LOWER(u.full_name) LIKE :prefix THEN 1
+            ELSE 2
+        END,
+        u.full_name ASC
+    LIMIT 20
+""")
+
+
 @app.get("/api/user/search")
 async def user_search(user: dict = Depends(get_current_user), query: str = "", db: Session = Depends(get_db)):
     """
     Fast unified user search from database (no API calls).
     Supports email, name, and student ID queries. <200ms latency.
+    Email-shaped and numeric queries try an exact indexed match first;
+    everything else uses the trigram indexes. Device counts are stored at sync time.
     Returns merged Google + IIQ user data with fee balances.
     """
     try:
         if not query:
             return {"users": [], "count": 0}
 
-        # Database-only query with email, name, and student ID matching
-        search_pattern = f"%{query.lower()}%"
-        search_query = text("""
-            SELECT
-                u.id, u.user_id, u.iiq_user_id, u.email, u.full_name, u.first_name, u.last_name,
-                u.org_unit_path, u.is_admin, u.is_suspended,
-                u.username, u.is_active_iiq, u.iiq_location, u.iiq_role_name,
-                u.student_id, u.student_grade, u.total_fee_balance, u.has_outstanding_fees,
-                u.data_source, u.is_merged,
-                COUNT(DISTINCT c.device_id) as device_count
-            FROM users u
-            LEFT JOIN chromebooks c ON LOWER(c.iiq_owner_email) = LOWER(u.email)
-            WHERE LOWER(u.email) LIKE :query
-               OR LOWER(u.full_name) LIKE :query
-               OR u.student_id LIKE :query
-            GROUP BY u.id
-            ORDER BY
-                CASE WHEN LOWER(u.email) LIKE :exact_query THEN 0 ELSE 1 END,
-                u.full_name ASC
-            LIMIT 20
-        """)
+        q = query.strip().lower()
+        results = []
 
-        results = db.execute(search_query, {
-            "query": search_pattern,
-            "exact_query": f"%{query.lower()}%"
-        }).fetchall()
+        if '@' in q:
+            results = db.execute(USER_SEARCH_BY_EMAIL, {"query": q}).fetchall()
+        elif q.isdigit():
+            results = db.execute(USER_SEARCH_BY_STUDENT_ID, {"query": q}).fetchall()
+
+        if not results:
+            results = db.execute(USER_SEARCH_FUZZY, {
+                "pattern": f"%{q}%",
+                "prefix": f"{q}%"
+            }).fetchall()
 
         users_list = []
         for row in results:
@@ -920,6 +1641,249 @@ async def user_search(user: dict = Depends(get_current_user), query: str = "", d
         raise HTTPException(status_code=500, detail=f"User search failed: {str(e)}")
 
 
+# Unified search: one statement over the per-entity search documents (migration 007).
+# Each branch is served by the GIN index on search_vector (token/prefix match)
+# BitmapOr'd with the trigram index on search_text (substring match).
+UNIFIED_SEARCH_QUERY = text("""
+    WITH q AS (SELECT to_tsquery('simple', :tsq) AS tsq)
+    SELECT * FROM (
+        (SELECT 'chromebook' AS type,
+                c.device_id AS id,
+                c.serial_number,
+                c.asset_tag,
+                COALESCE(c.iiq_owner_email, c.annotated_user) AS owner_email,
+                c.iiq_owner_name AS owner_name,
+                NULL::varchar AS student_id,
+                COALESCE(c.iiq_location, c.annotated_location) AS location,
+                c.model,
+                c.status,
+                ts_rank(c.search_vector, q.tsq) + word_similarity(:q, c.search_text) AS rank
+         FROM chromebooks c, q
+         WHERE :want_chromebook AND (c.search_vector @@ q.tsq OR c.search_text LIKE :pattern)
+         ORDER BY rank DESC
+         LIMIT :limit)
+        UNION ALL
+        (SELECT 'asset' AS type,
+                a.asset_id AS id,
+                a.serial_number,
+                a.asset_tag,
+                a.owner_email,
+                a.owner_name,
+                a.owner_student_id AS student_id,
+                a.location,
+                a.model,
+                a.status,
+                ts_rank(a.search_vector, q.tsq) + word_similarity(:q, a.search_text) AS rank
+         FROM assets a, q
+         WHERE :want_asset AND (a.search_vector @@ q.tsq OR a.search_text LIKE :pattern)
+           AND NOT EXISTS (
+               SELECT 1 FROM chromebooks c2 WHERE c2.serial_number = UPPER(a.serial_number)
+           )
+         ORDER BY rank DESC
+         LIMIT :limit)
+        UNION ALL
+        (SELECT 'user' AS type,
+                u.user_id AS id,
+                NULL::varchar AS serial_number,
+                NULL::varchar AS asset_tag,
+                u.email AS owner_email,
+                u.full_name AS owner_name,
+                u.student_id,
+                u.iiq_location AS location,
+                NULL::varchar AS model,
+                CASE WHEN u.is_suspended THEN 'SUSPENDED' ELSE 'ACTIVE' END AS status,
+                ts_rank(u.search_vector, q.tsq) + word_similarity(:q, u.search_text) AS rank
+         FROM users u, q
+         WHERE :want_user AND (u.search_vector @@ q.tsq OR u.search_text LIKE :pattern)
+         ORDER BY rank DESC
+         LIMIT :limit)
+    ) results
+    ORDER BY rank DESC
+    LIMIT :limit
+""")
+
+SEARCH_TYPES = ('chromebook', 'asset', 'user')
+
+
+def build_prefix_tsquery(query: str) -> str:
+    """
+    Turn free text into a prefix-matching tsquery ("john sm" -> "john:* & sm:*")
+
+    Args:
+        query: Raw search text
+
+    Returns:
+        tsquery string, or '' if nothing searchable remains
+    """
+    tokens = re.findall(r"[\w@.\-]+", query.lower())
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+# Devices whose Google recentUsers include an email, served by the GIN
+# jsonb_path_ops index on recent_users (migration 010). recencyRank is the
+# user's position in that device's recentUsers list (1 = most recent user).
+DEVICES_USED_QUERY = text("""
+    SELECT
+        c.device_id,
+        c.serial_number,
+        c.asset_tag,
+        c.iiq_asset_id,
+        c.model,
+        c.status,
+        c.org_unit_path,
+        c.annotated_user,
+        c.last_used_date,
+        c.last_sync_status,
+        (
+            SELECT t.position
+            FROM jsonb_array_elements(c.recent_users) WITH ORDINALITY AS t(entry, position)
+            WHERE t.entry->>'email' = :email
+            LIMIT 1
+        ) AS recency_rank
+    FROM chromebooks c
+    WHERE c.recent_users @> CAST(:needle AS jsonb)
+    ORDER BY recency_rank, c.last_used_date DESC NULLS LAST
+    LIMIT :limit
+""")
+
+
+@app.get("/api/user/{email}/devices-used")
+async def user_devices_used(
+    email: str,
+    limit: int = 50,
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Chromebooks this user has signed into (Google recentUsers), most recent first.
+    One GIN index lookup on chromebooks.recent_users - no Google or IIQ calls.
+    """
+    email = email.strip().lower()
+    if '@' not in email:
+        raise HTTPException(status_code=400, detail="A full email address is required")
+    limit = max(1, min(limit, 200))
+
+    try:
+        rows = db.execute(DEVICES_USED_QUERY, {
+            "email": email,
+            "needle": json.dumps([{"email": email}]),
+            "limit": limit
+        }).fetchall()
+    except Exception as e:
+        logger.error(f"Devices-used lookup error for {email}: {e}")
+        raise HTTPException(status_code=500, detail=f"Lookup failed: {str(e)}")
+
+    devices = [
+        {
+            'deviceId': row.device_id,
+            'serialNumber': row.serial_number,
+            'assetTag': row.asset_tag or 'N/A',
+            'assetId': row.iiq_asset_id or '',
+            'model': row.model or 'N/A',
+            'status': row.status,
+            'orgUnitPath': row.org_unit_path or 'N/A',
+            'assignedUser': row.annotated_user,
+            'lastUsed': row.last_used_date.isoformat() if row.last_used_date else None,
+            'lastSync': row.last_sync_status or 'N/A',
+            'recencyRank': row.recency_rank,
+        }
+        for row in rows
+    ]
+    return FastJSONResponse({"email": email, "devices": devices, "count": len(devices)})
+
+
+@app.get("/api/search")
+async def unified_search(
+    user: dict = Depends(get_current_user),
+    q: str = "",
+    types: str = "",
+    limit: int = 25,
+    db: Session = Depends(get_db)
+):
+    """
+    Unified ranked search across chromebooks, assets and users.
+    Matches serial, asset tag, MAC, owner name/email, student ID, location and model
+    in a single indexed query. Assets already present as Chromebooks are omitted.
+
+    Args:
+        q: Search text (tokens are prefix-matched; substrings match via trigram)
+        types: Optional comma-separated filter: chromebook,asset,user
+        limit: Maximum results (1-100)
+    """
+    try:
+        q_clean = q.strip().lower()
+        tsq = build_prefix_tsquery(q_clean)
+        if not tsq:
+            return {"query": q, "results": [], "count": 0}
+
+        wanted = {t.strip() for t in types.lower().split(',') if t.strip()} or set(SEARCH_TYPES)
+        limit = max(1, min(limit, 100))
+
+        rows = db.execute(UNIFIED_SEARCH_QUERY, {
+            "tsq": tsq,
+            "q": q_clean,
+            "pattern": f"%{q_clean}%",
+            "limit": limit,
+            "want_chromebook": 'chromebook' in wanted,
+            "want_asset": 'asset' in wanted,
+            "want_user": 'user' in wanted
+        }).fetchall()
+
+        results = [{
+            'type': row.type,
+            'id': row.id,
+            'serialNumber': row.serial_number,
+            'assetTag': row.asset_tag,
+            'ownerEmail': row.owner_email,
+            'ownerName': row.owner_name,
+            'studentId': row.student_id,
+            'location': row.location,
+            'model': row.model,
+            'status': row.status,
+            'rank': round(float(row.rank), 4)
+        } for row in rows]
+
+        logger.info(f"Unified search for '{q}' returned {len(results)} results")
+
+        return {"query": q, "results": results, "count": len(results)}
+
+    except Exception as e:
+        logger.error(f"Unified search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+
+typeahead = TypeaheadManager(SessionLocal)
+lookup_index = SharedLookupIndex()
+iiq_search_coalescer = RequestCoalescer('iiq_search')
+
+
+@app.get("/api/device/resolve")
+async def resolve_device(user: dict = Depends(get_current_user), key: str = ""):
+    """
+    Resolve a serial, asset tag or MAC address to serial + Google device ID.
+    Served from the mmapped lookup file, so it costs no DB or Redis query.
+    """
+    resolved = lookup_index.resolve(key.strip())
+    if not resolved:
+        raise HTTPException(status_code=404, detail=f"No device found for '{key}'")
+    return resolved
+
+
+@app.get("/api/suggest")
+async def suggest(user: dict = Depends(get_current_user), q: str = "", limit: int = 10):
+    """
+    Typeahead completions for the search box, served from memory (no DB/API calls).
+    Covers serial numbers, asset tags, user emails, full names and student IDs.
+    The index is rebuilt in the background when a sync bumps the sync generation.
+    """
+    limit = max(1, min(limit, 25))
+    return {
+        "query": q,
+        "suggestions": typeahead.suggest(q, limit),
+        "generation": typeahead.generation
+    }
+
 
 @app.get("/")
 async def root(request: Request, user: dict = Depends(get_current_user)):
@@ -0,0 +1,26 @@
+-- Migration: 004_local_search_indexes.sql
+-- Description: Expression indexes for local-first /api/combined/search lookups
+--              (case-insensitive serial, asset tag and owner email matches)
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/004_local_search_indexes.sql
+
+-- CONCURRENTLY cannot run inside a transaction block, so no BEGIN/COMMIT here
+
+-- Assets mirror (all IIQ device types)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assets_asset_tag_upper ON assets (UPPER(asset_tag));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assets_serial_number_upper ON assets (UPPER(serial_number));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_assets_owner_email_lower ON assets (LOWER(owner_email));
+
+-- Chromebooks (Google-only devices without an IIQ asset row)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chromebooks_asset_tag_upper ON chromebooks (UPPER(asset_tag));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chromebooks_iiq_owner_email_lower ON chromebooks (LOWER(iiq_owner_email));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chromebooks_annotated_user_lower ON chromebooks (LOWER(annotated_user));
+
+-- Verify indexes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE indexname IN (
+    'idx_assets_asset_tag_upper', 'idx_assets_serial_number_upper', 'idx_assets_owner_email_lower',
+    'idx_chromebooks_asset_tag_upper', 'idx_chromebooks_iiq_owner_email_lower', 'idx_chromebooks_annotated_user_lower'
+)
+ORDER BY indexname;
@@ -0,0 +1,36 @@
+-- Migration: 005_user_search_trigram.sql
+-- Description: pg_trgm GIN indexes for /api/user/search substring matching,
+--              plus a backfill of the stored users.device_count
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/005_user_search_trigram.sql
+-- Note: CREATE EXTENSION requires a superuser (or trusted extension) on first run
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Trigram indexes serve LIKE '%query%' on the searched expressions
+-- CONCURRENTLY cannot run inside a transaction block, so no BEGIN/COMMIT here
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_trgm ON users USING GIN (LOWER(email) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_full_name_trgm ON users USING GIN (LOWER(full_name) gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_student_id_trgm ON users USING GIN (student_id gin_trgm_ops);
+
+-- Exact-match fast paths use idx_users_email_lower (003) and idx_users_student_id
+
+-- Backfill device counts (kept current by SimpleSyncService.refresh_user_device_counts)
+ALTER TABLE users ADD COLUMN IF NOT EXISTS device_count INTEGER DEFAULT 0;
+
+UPDATE users u
+SET device_count = COALESCE(c.device_count, 0)
+FROM users u2
+LEFT JOIN (
+    SELECT LOWER(iiq_owner_email) AS email, COUNT(DISTINCT device_id) AS device_count
+    FROM chromebooks
+    WHERE iiq_owner_email IS NOT NULL
+    GROUP BY LOWER(iiq_owner_email)
+) c ON c.email = LOWER(u2.email)
+WHERE u.user_id = u2.user_id;
+
+-- Verify indexes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'users' AND indexname LIKE '%trgm%'
+ORDER BY indexname;
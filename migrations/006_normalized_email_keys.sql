@@ -0,0 +1,55 @@
+-- Migration: 006_normalized_email_keys.sql
+-- Description: Lowercase-normalized owner email columns and a resolved
+--              chromebooks.owner_user_id so device/user joins hit plain indexes
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/006_normalized_email_keys.sql
+-- Note: adding STORED generated columns rewrites the table (PostgreSQL 12+)
+
+BEGIN;
+
+-- Generated columns are recomputed on every sync write, so they can never drift
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS iiq_owner_email_lower VARCHAR(255)
+    GENERATED ALWAYS AS (LOWER(iiq_owner_email)) STORED;
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS owner_email_lower VARCHAR(255)
+    GENERATED ALWAYS AS (LOWER(COALESCE(iiq_owner_email, annotated_user))) STORED;
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS owner_email_lower VARCHAR(255)
+    GENERATED ALWAYS AS (LOWER(owner_email)) STORED;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS email_lower VARCHAR(255)
+    GENERATED ALWAYS AS (LOWER(email)) STORED;
+
+-- Resolved owner (populated by SimpleSyncService.resolve_chromebook_owners)
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS owner_user_id VARCHAR(255);
+ALTER TABLE chromebooks DROP CONSTRAINT IF EXISTS fk_chromebooks_owner_user_id;
+ALTER TABLE chromebooks ADD CONSTRAINT fk_chromebooks_owner_user_id
+    FOREIGN KEY (owner_user_id) REFERENCES users(user_id) ON DELETE SET NULL;
+
+-- Replace the 004 expression indexes with plain indexes on the new columns
+DROP INDEX IF EXISTS idx_assets_owner_email_lower;
+DROP INDEX IF EXISTS idx_chromebooks_iiq_owner_email_lower;
+DROP INDEX IF EXISTS idx_chromebooks_annotated_user_lower;
+
+CREATE INDEX IF NOT EXISTS idx_chromebooks_iiq_owner_email_lower ON chromebooks(iiq_owner_email_lower);
+CREATE INDEX IF NOT EXISTS idx_chromebooks_owner_email_lower ON chromebooks(owner_email_lower);
+CREATE INDEX IF NOT EXISTS idx_chromebooks_owner_user_id ON chromebooks(owner_user_id);
+CREATE INDEX IF NOT EXISTS idx_assets_owner_email_lower ON assets(owner_email_lower);
+CREATE INDEX IF NOT EXISTS idx_users_email_lower_col ON users(email_lower);
+
+-- Backfill resolved owners
+UPDATE chromebooks c
+SET owner_user_id = u.user_id
+FROM chromebooks c2
+LEFT JOIN users u ON u.email_lower = c2.owner_email_lower
+WHERE c.device_id = c2.device_id
+  AND c.owner_user_id IS DISTINCT FROM u.user_id;
+
+COMMENT ON COLUMN chromebooks.owner_email_lower IS 'LOWER(COALESCE(iiq_owner_email, annotated_user)) - effective owner join key';
+COMMENT ON COLUMN chromebooks.owner_user_id IS 'users.user_id resolved from owner_email_lower at sync time';
+
+COMMIT;
+
+-- Verify migration
+SELECT
+    COUNT(*) AS chromebooks,
+    COUNT(owner_email_lower) AS with_owner_email,
+    COUNT(owner_user_id) AS with_resolved_owner
+FROM chromebooks;
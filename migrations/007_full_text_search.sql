@@ -0,0 +1,47 @@
+-- Migration: 007_full_text_search.sql
+-- Description: Per-entity search documents (tsvector + trigram text) for the
+--              unified /api/search endpoint
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/007_full_text_search.sql
+-- Note: requires pg_trgm (005). Adding STORED generated columns rewrites the table.
+--       Expressions must match the *_SEARCH_VECTOR / *_SEARCH_TEXT constants in database/models.py
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Weights: A = serial / asset tag / MAC, B = owner name / email / student ID, C = location / model
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (setweight(to_tsvector('simple', COALESCE(serial_number, '') || ' ' || COALESCE(asset_tag, '') || ' ' || COALESCE(mac_address, '') || ' ' || REPLACE(COALESCE(mac_address, ''), ':', '')), 'A') || setweight(to_tsvector('simple', COALESCE(iiq_owner_email, '') || ' ' || COALESCE(iiq_owner_name, '') || ' ' || COALESCE(annotated_user, '')), 'B') || setweight(to_tsvector('simple', COALESCE(iiq_location, '') || ' ' || COALESCE(annotated_location, '') || ' ' || COALESCE(model, '')), 'C')) STORED;
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (LOWER(COALESCE(serial_number, '') || ' ' || COALESCE(asset_tag, '') || ' ' || COALESCE(mac_address, '') || ' ' || REPLACE(COALESCE(mac_address, ''), ':', '') || ' ' || COALESCE(iiq_owner_email, '') || ' ' || COALESCE(iiq_owner_name, '') || ' ' || COALESCE(annotated_user, '') || ' ' || COALESCE(iiq_location, '') || ' ' || COALESCE(annotated_location, '') || ' ' || COALESCE(model, ''))) STORED;
+
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (setweight(to_tsvector('simple', COALESCE(asset_tag, '') || ' ' || COALESCE(serial_number, '')), 'A') || setweight(to_tsvector('simple', COALESCE(owner_email, '') || ' ' || COALESCE(owner_name, '') || ' ' || COALESCE(owner_student_id, '')), 'B') || setweight(to_tsvector('simple', COALESCE(location, '') || ' ' || COALESCE(model, '')), 'C')) STORED;
+ALTER TABLE assets ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (LOWER(COALESCE(asset_tag, '') || ' ' || COALESCE(serial_number, '') || ' ' || COALESCE(owner_email, '') || ' ' || COALESCE(owner_name, '') || ' ' || COALESCE(owner_student_id, '') || ' ' || COALESCE(location, '') || ' ' || COALESCE(model, ''))) STORED;
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (setweight(to_tsvector('simple', COALESCE(email, '') || ' ' || COALESCE(student_id, '') || ' ' || COALESCE(username, '')), 'A') || setweight(to_tsvector('simple', COALESCE(full_name, '')), 'B') || setweight(to_tsvector('simple', COALESCE(iiq_location, '')), 'C')) STORED;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS search_text TEXT
+    GENERATED ALWAYS AS (LOWER(COALESCE(email, '') || ' ' || COALESCE(student_id, '') || ' ' || COALESCE(username, '') || ' ' || COALESCE(full_name, '') || ' ' || COALESCE(iiq_location, ''))) STORED;
+
+-- Full-text and substring (trigram) indexes
+CREATE INDEX IF NOT EXISTS idx_chromebooks_search_vector ON chromebooks USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_chromebooks_search_text_trgm ON chromebooks USING GIN (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_assets_search_vector ON assets USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_assets_search_text_trgm ON assets USING GIN (search_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_search_vector ON users USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_users_search_text_trgm ON users USING GIN (search_text gin_trgm_ops);
+
+COMMIT;
+
+ANALYZE chromebooks;
+ANALYZE assets;
+ANALYZE users;
+
+-- Verify
+SELECT tablename, indexname
+FROM pg_indexes
+WHERE indexname LIKE 'idx_%_search_%'
+ORDER BY tablename, indexname;
@@ -0,0 +1,51 @@
+-- Migration: 008_dashboard_materialized_views.sql
+-- Description: Pre-aggregated dashboard widgets for /api/dashboard/bootstrap
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/008_dashboard_materialized_views.sql
+-- Note: refreshed CONCURRENTLY at the end of each sync (SimpleSyncService.refresh_dashboard_views),
+--       which requires the unique indexes below
+
+BEGIN;
+
+-- Device counts + security alerts (single row)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_dashboard_stats AS
+SELECT
+    1 AS id,
+    COUNT(*)::integer AS total_devices,
+    COUNT(*) FILTER (WHERE status = 'ACTIVE')::integer AS active,
+    COUNT(*) FILTER (WHERE status = 'DISABLED')::integer AS disabled,
+    COUNT(*) FILTER (WHERE status = 'PROVISIONED')::integer AS provisioned,
+    COUNT(*) FILTER (WHERE status = 'DEPROVISIONED')::integer AS deprovisioned,
+    MAX(updated_at) AS last_sync,
+    COUNT(*) FILTER (WHERE status = 'ACTIVE' AND boot_mode = 'Dev')::integer AS dev_mode_count,
+    COUNT(*) FILTER (WHERE status = 'ACTIVE' AND battery_health IS NOT NULL AND battery_health < 30)::integer AS poor_battery_count,
+    COUNT(*) FILTER (WHERE status = 'ACTIVE' AND iiq_status IN ('In Repair', 'Pending Repair', 'Repair Needed'))::integer AS pending_repairs_count,
+    COUNT(*) FILTER (WHERE status = 'ACTIVE' AND (
+        boot_mode = 'Dev'
+        OR (battery_health IS NOT NULL AND battery_health < 30)
+        OR iiq_status IN ('In Repair', 'Pending Repair', 'Repair Needed')
+    ))::integer AS total_alerts,
+    NOW() AS refreshed_at
+FROM chromebooks;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_dashboard_stats_id ON mv_dashboard_stats(id);
+
+-- Active devices by AUE year and model (the API splits expired vs. upcoming years)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_dashboard_aue AS
+SELECT
+    EXTRACT(YEAR FROM aue_date::date)::integer AS aue_year,
+    COALESCE(model, 'Unknown') AS model,
+    COUNT(*)::integer AS device_count
+FROM chromebooks
+WHERE status = 'ACTIVE'
+AND aue_date IS NOT NULL
+AND aue_date <> ''
+GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_dashboard_aue_year_model ON mv_dashboard_aue(aue_year, model);
+
+COMMIT;
+
+-- Verify
+SELECT * FROM mv_dashboard_stats;
+SELECT aue_year, SUM(device_count) AS devices FROM mv_dashboard_aue GROUP BY aue_year ORDER BY aue_year;
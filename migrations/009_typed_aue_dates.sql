@@ -0,0 +1,46 @@
+-- Migration: 009_typed_aue_dates.sql
+-- Description: Store AUE dates as DATE with a generated aue_year and a
+--              (status, aue_year, model) index for AUE widgets and filters
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/009_typed_aue_dates.sql
+-- Note: rewrites chromebooks. mv_dashboard_aue (008) depends on aue_date, so it is
+--       dropped and recreated on aue_year.
+
+BEGIN;
+
+DROP MATERIALIZED VIEW IF EXISTS mv_dashboard_aue;
+
+-- Anything that is not a YYYY-MM-DD prefix (e.g. '') becomes NULL
+ALTER TABLE chromebooks ALTER COLUMN aue_date TYPE DATE
+    USING CASE WHEN aue_date ~ '^\d{4}-\d{2}-\d{2}' THEN LEFT(aue_date, 10)::date END;
+ALTER TABLE chromebooks ALTER COLUMN auto_update_expiration TYPE DATE
+    USING CASE WHEN auto_update_expiration ~ '^\d{4}-\d{2}-\d{2}' THEN LEFT(auto_update_expiration, 10)::date END;
+
+-- Model AUE date first (as the dashboard widget used), then the per-device date from Google
+ALTER TABLE chromebooks ADD COLUMN IF NOT EXISTS aue_year INTEGER
+    GENERATED ALWAYS AS (EXTRACT(YEAR FROM COALESCE(aue_date, auto_update_expiration))::integer) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_chromebooks_status_aue_year_model ON chromebooks(status, aue_year, model);
+
+CREATE MATERIALIZED VIEW mv_dashboard_aue AS
+SELECT
+    aue_year,
+    COALESCE(model, 'Unknown') AS model,
+    COUNT(*)::integer AS device_count
+FROM chromebooks
+WHERE status = 'ACTIVE'
+AND aue_year IS NOT NULL
+GROUP BY 1, 2;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_dashboard_aue_year_model ON mv_dashboard_aue(aue_year, model);
+
+COMMIT;
+
+ANALYZE chromebooks;
+
+-- Verify
+SELECT aue_year, COUNT(*) AS devices
+FROM chromebooks
+WHERE status = 'ACTIVE'
+GROUP BY aue_year
+ORDER BY aue_year;
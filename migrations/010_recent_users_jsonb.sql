@@ -0,0 +1,39 @@
+-- Migration: 010_recent_users_jsonb.sql
+-- Description: Store chromebooks.recent_users as JSONB with a GIN jsonb_path_ops
+--              index so "which Chromebooks has this user signed into" is an
+--              index lookup (recent_users @> '[{"email": "..."}]')
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/010_recent_users_jsonb.sql
+-- Note: rewrites chromebooks. The sync lowercases emails from now on; existing rows are
+--       normalized here so containment matches are exact.
+
+BEGIN;
+
+ALTER TABLE chromebooks ALTER COLUMN recent_users TYPE JSONB USING recent_users::jsonb;
+
+UPDATE chromebooks
+SET recent_users = (
+    SELECT jsonb_agg(
+        CASE WHEN entry ? 'email'
+             THEN jsonb_set(entry, '{email}', to_jsonb(LOWER(entry->>'email')))
+             ELSE entry
+        END
+        ORDER BY position
+    )
+    FROM jsonb_array_elements(recent_users) WITH ORDINALITY AS t(entry, position)
+)
+-- Empty arrays are skipped (jsonb_agg over no rows would turn them into NULL)
+WHERE jsonb_typeof(recent_users) = 'array'
+  AND jsonb_array_length(recent_users) > 0;
+
+CREATE INDEX IF NOT EXISTS idx_chromebooks_recent_users
+    ON chromebooks USING gin (recent_users jsonb_path_ops);
+
+COMMIT;
+
+ANALYZE chromebooks;
+
+-- Verify (should use idx_chromebooks_recent_users)
+EXPLAIN SELECT serial_number
+FROM chromebooks
+WHERE recent_users @> '[{"email": "student@example.org"}]';
@@ -0,0 +1,18 @@
+-- Migration: 011_chromebook_mac_lookup_index.sql
+-- Description: Expression index on the colon-less, uppercased MAC address so
+--              POST /api/devices/bulk-lookup resolves scanned MACs with one
+--              indexed `= ANY(:keys)` query
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/011_chromebook_mac_lookup_index.sql
+
+-- CONCURRENTLY cannot run inside a transaction block, so no BEGIN/COMMIT here
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chromebooks_mac_bare
+    ON chromebooks (UPPER(REPLACE(mac_address, ':', '')));
+
+ANALYZE chromebooks;
+
+-- Verify index
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE indexname = 'idx_chromebooks_mac_bare';
@@ -0,0 +1,38 @@
+-- Migration: 012_meraki_clients_ingest.sql
+-- Description: Ensure meraki_clients exists for the org-wide Meraki client ingestion
+--              and index the colon-less MAC so linking clients to chromebooks is
+--              one join (pairs with idx_chromebooks_mac_bare from migration 011)
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/012_meraki_clients_ingest.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS meraki_clients (
+    mac_address VARCHAR(17) PRIMARY KEY,
+    serial_number VARCHAR(100),
+    network_id VARCHAR(100),
+    network_name VARCHAR(255),
+    ap_name VARCHAR(255),
+    ap_mac VARCHAR(17),
+    ip_address VARCHAR(45),
+    vlan INTEGER,
+    description VARCHAR(255),
+    first_seen TIMESTAMP,
+    last_seen TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_meraki_clients_serial_number ON meraki_clients (serial_number);
+CREATE INDEX IF NOT EXISTS ix_meraki_clients_last_seen ON meraki_clients (last_seen);
+CREATE INDEX IF NOT EXISTS idx_meraki_clients_mac_bare ON meraki_clients (UPPER(REPLACE(mac_address, ':', '')));
+
+COMMIT;
+
+ANALYZE meraki_clients;
+
+-- Verify indexes
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'meraki_clients'
+ORDER BY indexname;
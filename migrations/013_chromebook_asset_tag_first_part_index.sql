@@ -0,0 +1,18 @@
+-- Migration: 013_chromebook_asset_tag_first_part_index.sql
+-- Description: Expression index on the uppercased first part of composite
+--              chromebook asset tags ("TAG | OTHER") so POST /api/devices/bulk-lookup
+--              matches scanned tags with one indexed `= ANY(:keys)` query
+-- Date: 2026-10-19
+-- Run with: psql -U chromebook_user -d chromebook_dashboard -f migrations/013_chromebook_asset_tag_first_part_index.sql
+
+-- CONCURRENTLY cannot run inside a transaction block, so no BEGIN/COMMIT here
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chromebooks_asset_tag_first_upper
+    ON chromebooks (UPPER(SPLIT_PART(asset_tag, ' | ', 1)));
+
+ANALYZE chromebooks;
+
+-- Verify index
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE indexname = 'idx_chromebooks_asset_tag_first_upper';
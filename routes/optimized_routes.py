@@ -2,9 +2,11 @@
 Optimized FastAPI routes using Redis cache + PostgreSQL database
 FAST search: < 100ms for cached results, < 500ms for database lookups
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import threading
+import json
+import os
 from sqlalchemy import text
 from sqlalchemy import or_, and_
 from typing import Optional, List, Dict, Any
@@ -14,11 +16,93 @@ from database.models import Chromebook, User
 from database.connection import get_db
 from database.connection import db
 from cache.redis_manager import cache, CacheKeys
+from routes.responses import FastJSONResponse, Projection
+from services.live_guard import RequestCoalescer, live_rate_limit
+from services import job_queue
 
 
 router = APIRouter()
 
 
+# Lean projections for the list endpoints (same field names as the models' to_dict)
+C = Chromebook
+DEVICE_PROJECTION = Projection(
+    {
+        'device_id': (C.device_id,),
+        'serial_number': (C.serial_number,),
+        'asset_tag': (C.asset_tag,),
+        'model': (C.model,),
+        'status': (C.status,),
+        'user': (C.annotated_user,),
+        'location': (C.annotated_location,),
+        'org_unit_path': (C.org_unit_path,),
+        'last_sync': (C.last_sync_status,),
+        'last_policy_sync_time': (C.last_policy_sync_time,),
+        'recent_users': (C.recent_users,),
+        'iiq_asset_id': (C.iiq_asset_id,),
+        'iiq_location': (C.iiq_location,),
+        'iiq_room': (C.iiq_room,),
+        'iiq_owner_email': (C.iiq_owner_email,),
+        'iiq_owner_name': (C.iiq_owner_name,),
+        'iiq_status': (C.iiq_status,),
+        'notes': (C.iiq_notes,),
+        'meraki': (C.last_seen_meraki, C.meraki_ap_name, C.meraki_network),
+        'mac_address': (C.mac_address,),
+        'ethernet_mac': (C.ethernet_mac,),
+        'ip_address': (C.ip_address,),
+        'os_version': (C.os_version,),
+        'platform_version': (C.platform_version,),
+        'firmware_version': (C.firmware_version,),
+        'wan_ip_address': (C.wan_ip_address,),
+        'last_used_date': (C.last_used_date,),
+        'updated_at': (C.updated_at,),
+        'battery_health': (C.battery_health,),
+        'battery_cycle_count': (C.battery_cycle_count,),
+    },
+    builders={
+        'meraki': lambda last_seen, ap_name, network: {
+            'last_seen': last_seen, 'ap_name': ap_name, 'network': network
+        } if last_seen else None,
+    }
+)
+
+USER_PROJECTION = Projection(
+    {
+        'user_id': (User.user_id,),
+        'email': (User.email,),
+        'name': (User.full_name,),
+        'first_name': (User.first_name,),
+        'last_name': (User.last_name,),
+        'org_unit': (User.org_unit_path,),
+        'is_admin': (User.is_admin,),
+        'is_suspended': (User.is_suspended,),
+        'assigned_devices': (User.assigned_devices,),
+        'device_count': (User.device_count,),
+        'student_id': (User.student_id,),
+        'student_grade': (User.student_grade,),
+        'last_login': (User.last_login,),
+        'google_user_id': (User.google_user_id,),
+        'iiq_user_id': (User.iiq_user_id,),
+        'google_synced_at': (User.google_synced_at,),
+        'iiq_synced_at': (User.iiq_synced_at,),
+        'total_fee_balance': (User.total_fee_balance,),
+        'has_outstanding_fees': (User.has_outstanding_fees,),
+        'fee_last_synced': (User.fee_last_synced,),
+        'iiq_location': (User.iiq_location,),
+        'iiq_role_name': (User.iiq_role_name,),
+        'is_active_iiq': (User.is_active_iiq,),
+        'username': (User.username,),
+        'data_source': (User.data_source,),
+        'is_merged': (User.is_merged,),
+        'updated_at': (User.updated_at,),
+    },
+    builders={
+        'assigned_devices': lambda devices: devices or [],
+        'total_fee_balance': lambda balance: float(balance) if balance else 0.0,
+    }
+)
+
+
 # Fix for search_device
 @router.get("/search/device")
 async def search_device(q: str = Query(..., min_length=1)) -> Dict[str, Any]:
@@ -209,20 +293,23 @@ async def search_user(
     return result
 
 
-@router.get("/devices")
+@router.get("/devices", response_class=FastJSONResponse)
 async def list_devices(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     status: Optional[str] = None,
     org_unit: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated field names (default: all)"),
     db_session: Session = Depends(get_db)
-) -> Dict[str, Any]:
+):
     """
     List all devices with pagination and filtering
     
-    Performance: < 200ms for typical queries
+    Selects only the requested columns as row tuples (no ORM objects) and
+    serializes with orjson. Performance: < 200ms for typical queries
     """
-    query = db_session.query(Chromebook)
+    keys = DEVICE_PROJECTION.parse(fields)
+    query = db_session.query(*DEVICE_PROJECTION.columns(keys))
     
     # Apply filters
     if status:
@@ -232,35 +319,38 @@ async def list_devices(
         query = query.filter(Chromebook.org_unit_path.ilike(f'%{org_unit}%'))
     
     # Get total count
-    total = query.count()
+    total = query.order_by(None).count()
     
     # Apply pagination
-    devices = query.offset(offset).limit(limit).all()
+    rows = query.order_by(Chromebook.device_id).offset(offset).limit(limit).all()
     
-    return {
+    return FastJSONResponse({
         'success': True,
-        'devices': [d.to_dict() for d in devices],
+        'devices': DEVICE_PROJECTION.to_dicts(keys, rows),
         'total': total,
         'limit': limit,
         'offset': offset,
         'has_more': (offset + limit) < total
-    }
+    })
 
 
-@router.get("/users")
+@router.get("/users", response_class=FastJSONResponse)
 async def list_users(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     org_unit: Optional[str] = None,
     has_devices: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated field names (default: all)"),
     db_session: Session = Depends(get_db)
-) -> Dict[str, Any]:
+):
     """
     List all users with pagination and filtering
     
-    Performance: < 200ms for typical queries
+    Selects only the requested columns as row tuples (no ORM objects) and
+    serializes with orjson. Performance: < 200ms for typical queries
     """
-    query = db_session.query(User)
+    keys = USER_PROJECTION.parse(fields)
+    query = db_session.query(*USER_PROJECTION.columns(keys))
     
     # Apply filters
     if org_unit:
@@ -273,284 +363,78 @@ async def list_users(
             query = query.filter(User.device_count == 0)
     
     # Get total count
-    total = query.count()
+    total = query.order_by(None).count()
     
     # Apply pagination
-    users = query.offset(offset).limit(limit).all()
+    rows = query.order_by(User.user_id).offset(offset).limit(limit).all()
     
-    return {
+    return FastJSONResponse({
         'success': True,
-        'users': [u.to_dict() for u in users],
+        'users': USER_PROJECTION.to_dicts(keys, rows),
         'total': total,
         'limit': limit,
         'offset': offset,
         'has_more': (offset + limit) < total
-    }
+    })
 
 
-def update_sync_progress(log_entries, status='running', **extra):
-    """Update sync status in Redis with log entries"""
-    data = {
-        'status': status,
-        'log': log_entries,
-        **extra
-    }
-    cache.set(CacheKeys.sync_status(), data, ttl=86400)
-
-
-def run_sync_background():
-    """Run sync in background thread and update status with progress"""
-    import os
-    import sys
-    sys.path.insert(0, '/opt/chromebook-dashboard')
-
-    log_entries = []
-    start_time = datetime.now()
-
-    def add_log(message, log_type='info'):
-        log_entries.append({'message': message, 'type': log_type})
-        update_sync_progress(log_entries, status='running')
-
-    try:
-        from services.sync_service_simple import SimpleSyncService
-        from google.oauth2 import service_account
-        from googleapiclient.discovery import build
-        from integrations.incidentiq import IncidentIQClient
-        from integrations.meraki import MerakiClient
-
-        add_log('Initializing API connections...', 'info')
-
-        # Google Wrapper class with progress reporting
-        class GoogleWrapper:
-            def __init__(self, service, progress_callback):
-                self.service = service
-                self.customer_id = os.getenv('GOOGLE_CUSTOMER_ID', 'my_customer')
-                self.progress_callback = progress_callback
-
-            def get_chromebooks(self, max_results=50000):
-                devices = []
-                self.progress_callback('Fetching devices from Google Admin...', 'info')
-                request = self.service.chromeosdevices().list(
-                    customerId=self.customer_id,
-                    maxResults=200,
-                    projection='FULL'
-                )
-                while request is not None:
-                    response = request.execute()
-                    batch = response.get('chromeosdevices', [])
-                    devices.extend(batch)
-                    if len(devices) % 1000 == 0 or len(devices) < 1000:
-                        self.progress_callback(f'Google Admin: Retrieved {len(devices)} devices...', 'info')
-                    request = self.service.chromeosdevices().list_next(request, response)
-                self.progress_callback(f'Google Admin: Complete - {len(devices)} devices retrieved', 'success')
-                return devices
-
-        # Initialize Google service
-        add_log('Connecting to Google Admin API...', 'info')
-        SCOPES = ['https://www.googleapis.com/auth/admin.directory.device.chromeos.readonly']
-        creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH', '/opt/chromebook-dashboard/credentials.json')
-        admin_email = os.getenv('GOOGLE_ADMIN_EMAIL', 'gsync@cr.k12.de.us')
-
-        credentials = service_account.Credentials.from_service_account_file(
-            creds_path, scopes=SCOPES
-        )
-        credentials = credentials.with_subject(admin_email)
-        google_raw = build('admin', 'directory_v1', credentials=credentials)
-        google = GoogleWrapper(google_raw, add_log)
-        add_log('Google Admin API connected', 'success')
-
-        # Initialize IIQ
-        add_log('Connecting to IncidentIQ API...', 'info')
-        iiq_site = os.getenv('INCIDENTIQ_SITE_ID', '')
-        iiq_token = os.getenv('INCIDENTIQ_API_TOKEN', '')
-        iiq_product = os.getenv('INCIDENTIQ_PRODUCT_ID', '88df910c-91aa-e711-80c2-0004ffa00050')
-        iiq = IncidentIQClient(iiq_site, iiq_token, iiq_product)
-        add_log('IncidentIQ API connected', 'success')
-
-        # Initialize Meraki (optional)
-        meraki_key = os.getenv('MERAKI_API_KEY', '')
-        meraki_org = os.getenv('MERAKI_ORG_ID', '')
-        meraki = None
-        if meraki_key:
-            add_log('Connecting to Meraki API...', 'info')
-            meraki = MerakiClient(meraki_key, meraki_org)
-            add_log('Meraki API connected', 'success')
-
-        # Create custom sync service with progress
-        add_log('Starting data synchronization...', 'info')
-
-        # Fetch Google devices
-        google_devices = google.get_chromebooks()
-
-        # Fetch IIQ assets
-        add_log('Fetching assets from IncidentIQ...', 'info')
-        iiq_assets = iiq.search_assets("", limit=50000)
-        add_log(f'IncidentIQ: Retrieved {len(iiq_assets)} assets', 'success')
-
-        # Process and sync to database
-        add_log('Processing and updating database...', 'info')
-
-        # Create lookup by serial
-        iiq_lookup = {}
-        for asset in iiq_assets:
-            serial = asset.get('SerialNumber', '').upper()
-            if serial:
-                iiq_lookup[serial] = asset
-
-        # Import database models
-        from database.models import Chromebook, SyncLog
-        from database.connection import db
-
-        processed = 0
-        created = 0
-        updated = 0
-
-        with db.get_session() as session:
-            for device in google_devices:
-                processed += 1
-                device_id = device.get('deviceId')
-                serial = device.get('serialNumber', '').upper()
-
-                if not device_id or not serial:
-                    continue
-
-                iiq_data = iiq_lookup.get(serial, {})
-
-                existing = session.query(Chromebook).filter(
-                    Chromebook.device_id == device_id
-                ).first()
-
-                # Extract battery health from Google API response
-                battery_health = None
-                battery_cycles = None
-                battery_reports = device.get('batteryStatusReports', [])
-                if battery_reports:
-                    latest_report = battery_reports[0]
-                    # Calculate health percentage from capacity if available
-                    full_charge = latest_report.get('fullChargeCapacity')
-                    design_capacity = latest_report.get('designCapacity')
-                    if full_charge and design_capacity and design_capacity > 0:
-                        battery_health = int((full_charge / design_capacity) * 100)
-                        if battery_health > 100:
-                            battery_health = 100
-                    battery_cycles = latest_report.get('cycleCount')
-
-                if existing:
-                    # Update existing
-                    existing.serial_number = serial
-                    mac_raw = device.get("macAddress", "").replace(":", "").lower()
-                    if mac_raw and len(mac_raw) == 12:
-                        existing.mac_address = ":".join(mac_raw[i:i+2] for i in range(0, 12, 2))
-                    existing.os_version = device.get("osVersion")
-                    existing.model = device.get("model")
-                    existing.status = device.get("status")
-                    existing.org_unit_path = device.get("orgUnitPath")
-                    existing.user = device.get("annotatedUser")
-                    if iiq_data:
-                        existing.asset_tag = iiq_data.get("AssetTag")
-                        existing.location = iiq_data.get("LocationName")
-                    existing.last_sync = device.get("lastSync")
-                    # Update battery data
-                    if battery_health is not None:
-                        existing.battery_health = battery_health
-                    if battery_cycles is not None:
-                        existing.battery_cycle_count = battery_cycles
-                    updated += 1
-                else:
-                    # Create new
-                    mac_raw = device.get("macAddress", "").replace(":", "").lower()
-                    mac_formatted = ":".join(mac_raw[i:i+2] for i in range(0, 12, 2)) if mac_raw and len(mac_raw) == 12 else None
-                    new_device = Chromebook(
-                        device_id=device_id,
-                        serial_number=serial,
-                        mac_address=mac_formatted,
-                        os_version=device.get("osVersion"),
-                        model=device.get("model"),
-                        status=device.get("status"),
-                        org_unit_path=device.get("orgUnitPath"),
-                        user=device.get("annotatedUser"),
-                        asset_tag=iiq_data.get("AssetTag") if iiq_data else None,
-                        location=iiq_data.get("LocationName") if iiq_data else None,
-                        last_sync=device.get("lastSync"),
-                        battery_health=battery_health,
-                        battery_cycle_count=battery_cycles
-                    )
-                    session.add(new_device)
-                    created += 1
-
-                if processed % 500 == 0:
-                    session.commit()
-                    add_log(f'Database: Processed {processed} of {len(google_devices)} devices...', 'info')
-
-            session.commit()
-
-        add_log(f'Database: Complete - {processed} processed, {created} created, {updated} updated', 'success')
-
-        # Clear cache
-        add_log('Clearing search cache...', 'info')
-        cache.delete_pattern('chromebook:*')
-        cache.delete_pattern('search:*')
-        add_log('Cache cleared', 'success')
-
-        # Calculate duration
-        duration = (datetime.now() - start_time).total_seconds()
-
-        # Update final status
-        update_sync_progress(log_entries, status='completed',
-            last_sync=datetime.now().isoformat(),
-            records_processed=processed,
-            records_created=created,
-            records_updated=updated,
-            duration_seconds=int(duration)
-        )
-
-    except Exception as e:
-        add_log(f'Error: {str(e)}', 'error')
-        update_sync_progress(log_entries, status='failed',
-            error=str(e),
-            failed_at=datetime.now().isoformat()
-        )
-    finally:
-        cache.delete(CacheKeys.sync_lock('full'))
+SYNC_EVENTS_BLOCK_MS = 15000
 
 
 @router.post("/sync/all")
-async def trigger_full_sync(
-    background_tasks: BackgroundTasks
-) -> Dict[str, Any]:
+async def trigger_full_sync() -> Dict[str, Any]:
     """
     Trigger a full sync of all data sources
 
     This should be restricted to admin users only
-    Runs in background to avoid timeout
+    Queues a 'sync' job for sync_worker.py; only one sync job is queued or
+    running at a time (a second request returns the existing job).
     """
-    # Check if sync is already running
-    if cache.exists(CacheKeys.sync_lock('full')):
+    job = job_queue.enqueue('sync', priority=job_queue.PRIORITY_HIGH)
+
+    if job.get('deduplicated'):
         return {
             'success': False,
-            'error': 'Sync already in progress'
+            'error': 'Sync already in progress',
+            'job_id': job['id'],
+            'job_status': job['status']
         }
 
-    # Set lock for 1 hour
-    cache.set(CacheKeys.sync_lock('full'), {'started': datetime.now().isoformat()}, ttl=3600)
-
-    # Update status to show sync is starting
+    # Update status to show sync is waiting for a worker
     cache.set(CacheKeys.sync_status(), {
-        'status': 'started',
-        'started_at': datetime.now().isoformat()
+        'status': 'queued',
+        'job_id': job['id'],
+        'queued_at': datetime.now().isoformat()
     }, ttl=86400)
 
-    # Run sync in background thread
-    sync_thread = threading.Thread(target=run_sync_background)
-    sync_thread.start()
-
     return {
         'success': True,
-        'message': 'Full sync started',
-        'note': 'This will take 2-5 minutes. Check /sync/status for progress.'
+        'message': 'Full sync queued',
+        'job_id': job['id'],
+        'note': 'This will take 2-5 minutes. Check /sync/status or /sync/events for progress.'
     }
 
 
+@router.post("/jobs/{job_type}")
+async def trigger_job(job_type: str, priority: int = Query(job_queue.PRIORITY_NORMAL, ge=0, le=9)) -> Dict[str, Any]:
+    """Queue a background job (sync, export, report_precompute) for sync_worker.py"""
+    from services.jobs import JOB_HANDLERS
+
+    if job_type not in JOB_HANDLERS:
+        raise HTTPException(status_code=404, detail=f"Unknown job type. Available: {', '.join(JOB_HANDLERS)}")
+    job = job_queue.enqueue(job_type, priority=priority)
+    return {'success': True, 'job': job}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str) -> Dict[str, Any]:
+    """Status, attempts and result/error of a queued job"""
+    job = job_queue.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {'success': True, 'job': job, 'queue': job_queue.queue_depth()}
+
+
 @router.get("/sync/status")
 async def get_sync_status(db_session: Session = Depends(get_db)) -> Dict[str, Any]:
     """
@@ -562,6 +446,13 @@ async def get_sync_status(db_session: Session = Depends(get_db)) -> Dict[str, An
     status = cache.get(CacheKeys.sync_status())
     
     if status:
+        # Rebuild the current run's log from the events stream (one XRANGE read)
+        run_start_id = status.get('run_start_id')
+        if run_start_id:
+            status['log'] = [
+                {'message': event['message'], 'type': event['type']}
+                for _, event in cache.stream_range(CacheKeys.sync_events(), start=run_start_id)
+            ]
         return {
             'success': True,
             'status': status,
@@ -592,6 +483,57 @@ async def get_sync_status(db_session: Session = Depends(get_db)) -> Dict[str, An
     }
 
 
+@router.get("/sync/events")
+async def stream_sync_events(
+    request: Request,
+    last_event_id: Optional[str] = Query(None, description="Resume after this event ID")
+):
+    """
+    Server-Sent Events feed of sync progress
+
+    Replays the current run's events, then pushes each new event as it is
+    appended to the stream. Browsers reconnect with a Last-Event-ID header,
+    which resumes exactly after the last event they received.
+    """
+    resume_id = request.headers.get('last-event-id') or last_event_id
+
+    def format_event(entry_id, event):
+        return f"id: {entry_id}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+
+    async def event_source():
+        stream_key = CacheKeys.sync_events()
+        last_id = resume_id
+        yield "retry: 3000\n\n"
+
+        if not last_id:
+            # Fresh connection: replay the current (or most recent) run
+            status = cache.get(CacheKeys.sync_status()) or {}
+            last_id = None
+            run_start_id = status.get('run_start_id')
+            if run_start_id:
+                for entry_id, event in cache.stream_range(stream_key, start=run_start_id):
+                    last_id = entry_id
+                    yield format_event(entry_id, event)
+            if last_id is None:
+                # Nothing to replay: start after the newest existing event
+                last_id = cache.stream_last_id(stream_key) or '0-0'
+
+        while not await request.is_disconnected():
+            entries = await cache.stream_read(stream_key, last_id, SYNC_EVENTS_BLOCK_MS)
+            if not entries:
+                yield ": keepalive\n\n"
+                continue
+            for entry_id, event in entries:
+                last_id = entry_id
+                yield format_event(entry_id, event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @router.get("/stats")
 async def get_stats(db_session: Session = Depends(get_db)) -> Dict[str, Any]:
     """
@@ -677,72 +619,81 @@ async def health_check() -> Dict[str, Any]:
     
     return health
 
-@router.get("/search/device/live")
+live_device_coalescer = RequestCoalescer('live_device')
+
+
+def fetch_live_device(query: str) -> Dict[str, Any]:
+    """Look one serial up directly in Google Admin + IIQ (blocking, 5-8 seconds)"""
+    from integrations.google import GoogleWorkspaceClient
+    from integrations.incidentiq import IncidentIQClient
+
+    start_time = datetime.now()
+
+    # Initialize API clients
+    google = GoogleWorkspaceClient('/opt/chromebook-dashboard/credentials.json', os.getenv('GOOGLE_ADMIN_EMAIL'))
+    iiq = IncidentIQClient(os.getenv('IIQ_SITE_ID'), os.getenv('IIQ_API_TOKEN'))
+
+    # Search Google by serial
+    devices = google.search_chromebooks(serial=query)
+
+    if not devices:
+        return {'success': False, 'error': 'Device not found in Google Admin', 'query': query}
+
+    device = devices[0]
+
+    # Get IIQ data
+    iiq_data = {}
+    if device.get('serialNumber'):
+        iiq_assets = iiq.search_assets(device['serialNumber'], limit=1)
+        if iiq_assets:
+            iiq_data = iiq_assets[0]
+
+    # Build response in same format as cached
+    response_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
+
+    return {
+        'success': True,
+        'device': {
+            'device_id': device.get('deviceId'),
+            'serial_number': device.get('serialNumber'),
+            'asset_tag': device.get('annotatedAssetId') or iiq_data.get('AssetTag'),
+            'model': device.get('model'),
+            'status': device.get('status'),
+            'user': device.get('annotatedUser'),
+            'location': device.get('annotatedLocation'),
+            'org_unit_path': device.get('orgUnitPath'),
+            'last_sync': device.get('lastSync'),
+            'mac_address': device.get('macAddress'),
+            'ip_address': device['lastKnownNetwork'][0].get('ipAddress') if device.get('lastKnownNetwork') else None,
+            'os_version': device.get('osVersion'),
+            'platform_version': device.get('platformVersion'),
+            'firmware_version': device.get('firmwareVersion'),
+            'recent_users': device.get('recentUsers', []),
+            'iiq_asset_id': iiq_data.get('AssetID'),
+            'iiq_location': iiq_data.get('LocationName'),
+            'iiq_room': iiq_data.get('RoomName'),
+            'meraki': None
+        },
+        'source': 'live_api',
+        'response_time_ms': response_time_ms,
+        'warning': 'Live data - not cached'
+    }
+
+
+@router.get("/search/device/live", dependencies=[Depends(live_rate_limit('device_live'))])
 async def search_device_live(q: str = Query(..., min_length=1)) -> Dict[str, Any]:
     """
     Live search - bypasses cache and database, hits APIs directly
     USE SPARINGLY - takes 5-8 seconds
+
+    Rate limited per user (429 + Retry-After). Concurrent requests for the same
+    serial share a single Google/IIQ round trip.
     """
-    from integrations.google import GoogleWorkspaceClient
-    from integrations.incidentiq import IncidentIQClient
-    import os
-    
     query = q.strip().upper()
-    start_time = datetime.now()
-    
+
     try:
-        # Initialize API clients
-        google = GoogleWorkspaceClient('/opt/chromebook-dashboard/credentials.json', os.getenv('GOOGLE_ADMIN_EMAIL'))
-        iiq = IncidentIQClient(os.getenv('IIQ_SITE_ID'), os.getenv('IIQ_API_TOKEN'))
-        
-        # Search Google by serial
-        devices = google.search_chromebooks(serial=query)
-        
-        if not devices:
-            return {'success': False, 'error': 'Device not found in Google Admin', 'query': q}
-        
-        device = devices[0]
-        
-        # Get IIQ data
-        iiq_data = {}
-        if device.get('serialNumber'):
-            iiq_assets = iiq.search_assets(device['serialNumber'], limit=1)
-            if iiq_assets:
-                iiq_data = iiq_assets[0]
-        
-        # Build response in same format as cached
-        response_time_ms = int((datetime.now() - start_time).total_seconds() * 1000)
-        
-        result = {
-            'success': True,
-            'device': {
-                'device_id': device.get('deviceId'),
-                'serial_number': device.get('serialNumber'),
-                'asset_tag': device.get('annotatedAssetId') or iiq_data.get('AssetTag'),
-                'model': device.get('model'),
-                'status': device.get('status'),
-                'user': device.get('annotatedUser'),
-                'location': device.get('annotatedLocation'),
-                'org_unit_path': device.get('orgUnitPath'),
-                'last_sync': device.get('lastSync'),
-                'mac_address': device.get('macAddress'),
-                'ip_address': device['lastKnownNetwork'][0].get('ipAddress') if device.get('lastKnownNetwork') else None,
-                'os_version': device.get('osVersion'),
-                'platform_version': device.get('platformVersion'),
-                'firmware_version': device.get('firmwareVersion'),
-                'recent_users': device.get('recentUsers', []),
-                'iiq_asset_id': iiq_data.get('AssetID'),
-                'iiq_location': iiq_data.get('LocationName'),
-                'iiq_room': iiq_data.get('RoomName'),
-                'meraki': None
-            },
-            'source': 'live_api',
-            'response_time_ms': response_time_ms,
-            'warning': 'Live data - not cached'
-        }
-        
-        return result
-        
+        return await live_device_coalescer.run(query, fetch_live_device, query)
+
     except Exception as e:
         return {
             'success': False,
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 import redis
 import json
 from sqlalchemy import func, and_
@@ -117,17 +117,11 @@ async def os_compliance_report():
 
                 aue_date = sample_device.aue_date if sample_device else None
 
-                # Check if expired (compare YYYY-MM-DD to today)
-                is_expired = None
-                if aue_date:
-                    try:
-                        aue_dt = datetime.strptime(aue_date, '%Y-%m-%d')
-                        is_expired = aue_dt < datetime.now()
-                    except:
-                        is_expired = None
+                # Check if expired (aue_date is a DATE column)
+                is_expired = aue_date < date.today() if aue_date else None
 
                 # Format as YYYY-MM for display
-                display_date = aue_date[:7] if aue_date else None
+                display_date = aue_date.strftime('%Y-%m') if aue_date else None
 
                 models_with_aue.append({
                     'model': model,
@@ -337,17 +331,12 @@ async def aue_status_report():
 
             for model, aue_date, count in models:
                 if aue_date:
-                    try:
-                        aue_dt = datetime.strptime(aue_date, '%Y-%m-%d')
-                        is_expired = aue_dt < datetime.now()
-                        aue_display = aue_date[:7]  # YYYY-MM format
-
-                        if is_expired:
-                            expired_models.append({'model': model, 'aue_date': aue_display, 'count': count})
-                        else:
-                            active_models.append({'model': model, 'aue_date': aue_display, 'count': count})
-                    except:
-                        unknown_models.append({'model': model, 'aue_date': aue_date[:7] if aue_date else None, 'count': count})
+                    aue_display = aue_date.strftime('%Y-%m')  # YYYY-MM format
+
+                    if aue_date < date.today():
+                        expired_models.append({'model': model, 'aue_date': aue_display, 'count': count})
+                    else:
+                        active_models.append({'model': model, 'aue_date': aue_display, 'count': count})
                 else:
                     unknown_models.append({'model': model, 'aue_date': None, 'count': count})
 
@@ -406,7 +395,7 @@ async def model_details_report(model: str):
                     'org_unit': device.org_unit_path,
                     'os_version': device.os_version,
                     'last_sync': device.last_sync_status,
-                    'aue_date': device.aue_date
+                    'aue_date': device.aue_date.isoformat() if device.aue_date else None
                 })
 
             result = {
@@ -438,10 +427,9 @@ async def aue_year_report(year: str):
 
     try:
         with db.get_session() as session:
-            # Filter devices where aue_date starts with the year
+            # Filter on the generated aue_year column (indexed with status/model)
             devices = session.query(Chromebook).filter(
-                Chromebook.aue_date.isnot(None),
-                Chromebook.aue_date.like(f"{year}%")
+                Chromebook.aue_year == int(year)
             ).order_by(Chromebook.aue_date, Chromebook.model).all()
 
             # Check if year is expired
@@ -453,7 +441,7 @@ async def aue_year_report(year: str):
                     'serial_number': device.serial_number,
                     'asset_tag': device.asset_tag,
                     'model': device.model,
-                    'aue_date': device.aue_date,
+                    'aue_date': (device.aue_date or device.auto_update_expiration).isoformat(),
                     'user': device.annotated_user,
                     'location': device.annotated_location,
                     'status': device.status,
@@ -0,0 +1,85 @@
+"""
+Fast JSON path for list endpoints
+orjson serialization (native datetime/date) plus lean column projections
+selected with a `fields=` query parameter
+"""
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+def _orjson_default(obj: Any) -> Any:
+    """Types orjson doesn't handle natively"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (datetimes become ISO 8601 strings)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class Projection:
+    """
+    Maps API field names to the columns needed to build them
+
+    Plain fields map to one column and are copied as-is; composite fields map
+    to several columns plus a builder, so only requested columns are selected.
+    """
+
+    def __init__(self, fields: Dict[str, Sequence[Any]], builders: Optional[Dict[str, Callable]] = None):
+        """
+        Args:
+            fields: Ordered {field name: (column, ...)}
+            builders: Optional {field name: callable(*column values)} for composite fields
+        """
+        self.fields = fields
+        self.builders = builders or {}
+
+    def parse(self, fields: Optional[str]) -> List[str]:
+        """
+        Resolve a comma-separated `fields=` value (all fields when empty)
+
+        Raises:
+            HTTPException 400 for unknown field names
+        """
+        if not fields:
+            return list(self.fields)
+        requested = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in self.fields]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}"
+            )
+        return requested
+
+    def columns(self, keys: List[str]) -> List[Any]:
+        """Flat column list for query(*columns)"""
+        return [column for key in keys for column in self.fields[key]]
+
+    def to_dicts(self, keys: List[str], rows) -> List[Dict[str, Any]]:
+        """Turn projected row tuples back into {field: value} dicts"""
+        layout = []
+        position = 0
+        for key in keys:
+            width = len(self.fields[key])
+            layout.append((key, position, width, self.builders.get(key)))
+            position += width
+
+        results = []
+        for row in rows:
+            item = {}
+            for key, start, width, builder in layout:
+                if builder:
+                    item[key] = builder(*row[start:start + width])
+                else:
+                    item[key] = row[start]
+            results.append(item)
+        return results
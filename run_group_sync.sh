@@ -0,0 +1,4 @@
+#!/bin/bash
+# Hourly ALLOWED_GROUP membership refresh for login checks
+cd /opt/chromebook-dashboard
+/opt/chromebook-dashboard/venv/bin/python3 sync_allowed_group.py >> /var/log/chromebook-group-sync.log 2>&1
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Background job worker (sync, export, report precompute) - keep running under systemd/supervisor
+cd /opt/chromebook-dashboard
+exec /opt/chromebook-dashboard/venv/bin/python3 sync_worker.py >> /var/log/chromebook-sync-worker.log 2>&1
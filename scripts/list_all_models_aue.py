@@ -32,8 +32,7 @@ def list_all_models():
         for model, aue_date, count in models:
             if aue_date:
                 try:
-                    aue_dt = datetime.strptime(aue_date, '%Y-%m-%d')
-                    is_expired = aue_dt < datetime.now()
+                    is_expired = aue_date < datetime.now().date()  # DATE column
                     
                     if is_expired:
                         expired_models.append((model, aue_date, count))
@@ -51,7 +50,7 @@ def list_all_models():
         print(f"{'Model':<60} {'AUE Date':<12} {'Count':>8}")
         print("-" * 100)
         for model, aue, count in sorted(active_models, key=lambda x: x[2], reverse=True):
-            print(f"{model:<60} {aue[:7]:<12} {count:>8,}")
+            print(f"{model:<60} {aue.strftime('%Y-%m'):<12} {count:>8,}")
         
         print(f"\nTotal Active: {len(active_models)} models, {sum(c for _,_,c in active_models):,} devices")
         
@@ -62,7 +61,7 @@ def list_all_models():
         print(f"{'Model':<60} {'AUE Date':<12} {'Count':>8}")
         print("-" * 100)
         for model, aue, count in sorted(expired_models, key=lambda x: x[2], reverse=True):
-            print(f"{model:<60} {aue[:7]:<12} {count:>8,}")
+            print(f"{model:<60} {aue.strftime('%Y-%m'):<12} {count:>8,}")
         
         print(f"\nTotal Expired: {len(expired_models)} models, {sum(c for _,_,c in expired_models):,} devices")
         
@@ -73,7 +72,7 @@ def list_all_models():
         print(f"{'Model':<60} {'AUE Date':<12} {'Count':>8}")
         print("-" * 100)
         for model, aue, count in sorted(unknown_models, key=lambda x: x[2], reverse=True):
-            aue_display = aue[:7] if aue else "MISSING"
+            aue_display = aue.strftime('%Y-%m') if aue else "MISSING"
             print(f"{model:<60} {aue_display:<12} {count:>8,}")
         
         print(f"\nTotal Unknown: {len(unknown_models)} models, {sum(c for _,_,c in unknown_models):,} devices")
@@ -0,0 +1,181 @@
+"""
+Batch resolution of serials / asset tags / MAC addresses
+Resolves many scanned keys with one `= ANY(:keys)` query per key type against
+chromebooks and assets, instead of one lookup per key.
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import text
+
+
+MAX_BULK_KEYS = 10000
+
+MAC_PATTERN = re.compile(r'^[0-9A-F]{12}$')
+
+CHROMEBOOK_COLUMNS = """
+    c.device_id, c.serial_number, SPLIT_PART(c.asset_tag, ' | ', 1) AS asset_tag, c.mac_address,
+    c.model, c.status, c.iiq_status, c.org_unit_path,
+    COALESCE(c.iiq_owner_email, c.annotated_user) AS assigned_user,
+    COALESCE(c.iiq_location, c.annotated_location) AS location, c.iiq_asset_id
+"""
+
+CHROMEBOOKS_BY_SERIAL = text(f"""
+    SELECT {CHROMEBOOK_COLUMNS}, c.serial_number AS match_key
+    FROM chromebooks c
+    WHERE c.serial_number = ANY(:keys)
+""")
+
+# Chromebook tags can be composite ("TAG | OTHER"); match the first part like the
+# advanced search does. idx_chromebooks_asset_tag_first_upper (migration 013)
+CHROMEBOOKS_BY_ASSET_TAG = text(f"""
+    SELECT {CHROMEBOOK_COLUMNS}, UPPER(SPLIT_PART(c.asset_tag, ' | ', 1)) AS match_key
+    FROM chromebooks c
+    WHERE UPPER(SPLIT_PART(c.asset_tag, ' | ', 1)) = ANY(:keys)
+""")
+
+# idx_chromebooks_mac_bare (migration 011)
+CHROMEBOOKS_BY_MAC = text(f"""
+    SELECT {CHROMEBOOK_COLUMNS}, UPPER(REPLACE(c.mac_address, ':', '')) AS match_key
+    FROM chromebooks c
+    WHERE UPPER(REPLACE(c.mac_address, ':', '')) = ANY(:keys)
+""")
+
+ASSET_COLUMNS = """
+    a.asset_id, a.asset_tag, a.serial_number, a.model, a.device_type, a.status,
+    a.owner_email, a.location
+"""
+
+# idx_assets_serial_number_upper / idx_assets_asset_tag_upper (migration 004)
+ASSETS_BY_SERIAL = text(f"""
+    SELECT {ASSET_COLUMNS}, UPPER(a.serial_number) AS match_key
+    FROM assets a
+    WHERE UPPER(a.serial_number) = ANY(:keys)
+""")
+
+ASSETS_BY_ASSET_TAG = text(f"""
+    SELECT {ASSET_COLUMNS}, UPPER(a.asset_tag) AS match_key
+    FROM assets a
+    WHERE UPPER(a.asset_tag) = ANY(:keys)
+""")
+
+
+def normalize_keys(raw_keys: Iterable[str]) -> List[str]:
+    """Strip, uppercase and de-duplicate scanned keys, keeping scan order"""
+    seen = set()
+    keys = []
+    for raw in raw_keys:
+        key = str(raw or '').strip().upper()
+        if key and key not in seen:
+            seen.add(key)
+            keys.append(key)
+    return keys
+
+
+def bare_mac(key: str) -> str:
+    """'AA:BB:CC:DD:EE:FF' / 'AA-BB-..' / 'AABB.CCDD.EEFF' -> 'AABBCCDDEEFF' ('' if not a MAC)"""
+    value = key.replace(':', '').replace('-', '').replace('.', '')
+    return value if MAC_PATTERN.match(value) else ''
+
+
+def _chromebook_record(row, matched_on: str) -> Dict:
+    return {
+        'matchedOn': matched_on,
+        'source': 'chromebook',
+        'deviceId': row.device_id,
+        'serialNumber': row.serial_number,
+        'assetTag': row.asset_tag or None,
+        'macAddress': row.mac_address,
+        'model': row.model,
+        'googleStatus': row.status,
+        'iiqStatus': row.iiq_status,
+        'orgUnitPath': row.org_unit_path,
+        'assignedUser': row.assigned_user,
+        'location': row.location,
+        'assetId': row.iiq_asset_id,
+        'deviceType': 'Chromebooks',
+    }
+
+
+def _asset_record(row, matched_on: str) -> Dict:
+    return {
+        'matchedOn': matched_on,
+        'source': 'asset',
+        'deviceId': None,
+        'serialNumber': row.serial_number,
+        'assetTag': row.asset_tag,
+        'macAddress': None,
+        'model': row.model,
+        'googleStatus': None,
+        'iiqStatus': row.status,
+        'orgUnitPath': None,
+        'assignedUser': row.owner_email,
+        'location': row.location,
+        'assetId': row.asset_id,
+        'deviceType': row.device_type,
+    }
+
+
+def _merge_asset(record: Dict, asset_row):
+    """Fill IIQ fields on a chromebook record from its assets row"""
+    record['source'] = 'chromebook+asset'
+    record['assetId'] = record['assetId'] or asset_row.asset_id
+    record['assetTag'] = record['assetTag'] or asset_row.asset_tag
+    record['iiqStatus'] = record['iiqStatus'] or asset_row.status
+    record['assignedUser'] = record['assignedUser'] or asset_row.owner_email
+    record['location'] = record['location'] or asset_row.location
+    record['deviceType'] = asset_row.device_type or record['deviceType']
+
+
+def lookup_keys(db, keys: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    Resolve normalized keys (see normalize_keys) in at most five indexed queries
+
+    Args:
+        db: SQLAlchemy session or connection
+        keys: Uppercased serials / asset tags / MACs
+
+    Returns:
+        ({key: merged record}, [keys with no match]) - not-found keys keep input order
+    """
+    found: Dict[str, Dict] = {}
+    if not keys:
+        return found, []
+
+    # Chromebooks first: serial, then asset tag, then MAC
+    for row in db.execute(CHROMEBOOKS_BY_SERIAL, {"keys": keys}):
+        found.setdefault(row.match_key, _chromebook_record(row, 'serial'))
+
+    remaining = [k for k in keys if k not in found]
+    if remaining:
+        for row in db.execute(CHROMEBOOKS_BY_ASSET_TAG, {"keys": remaining}):
+            found.setdefault(row.match_key, _chromebook_record(row, 'assetTag'))
+
+    macs = {bare_mac(k): k for k in keys if k not in found and bare_mac(k)}
+    if macs:
+        for row in db.execute(CHROMEBOOKS_BY_MAC, {"keys": list(macs)}):
+            key = macs.get(row.match_key)
+            if key:
+                found.setdefault(key, _chromebook_record(row, 'mac'))
+
+    # Assets: unmatched keys as serials/tags, plus matched chromebook serials for IIQ details
+    remaining = [k for k in keys if k not in found]
+    chromebook_serials = {record['serialNumber']: key for key, record in found.items() if record['serialNumber']}
+
+    serial_keys = remaining + list(chromebook_serials)
+    if serial_keys:
+        for row in db.execute(ASSETS_BY_SERIAL, {"keys": serial_keys}):
+            if row.match_key in chromebook_serials:
+                record = found[chromebook_serials[row.match_key]]
+                if record['source'] == 'chromebook':
+                    _merge_asset(record, row)
+            elif row.match_key not in found:
+                found[row.match_key] = _asset_record(row, 'serial')
+
+    remaining = [k for k in keys if k not in found]
+    if remaining:
+        for row in db.execute(ASSETS_BY_ASSET_TAG, {"keys": remaining}):
+            found.setdefault(row.match_key, _asset_record(row, 'assetTag'))
+
+    not_found = [k for k in keys if k not in found]
+    return found, not_found
@@ -0,0 +1,264 @@
+"""
+Redis-backed background job queue
+The web tier enqueues jobs and reads their status; sync_worker.py claims them,
+heartbeats while running, and records results. Jobs whose worker stops
+heartbeating are retried, so a recycled process no longer loses a sync.
+"""
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from cache.redis_manager import cache, CacheKeys
+
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+HEARTBEAT_TIMEOUT = 120       # seconds without a heartbeat before a job is presumed dead
+RETRY_BACKOFF_SECONDS = 60    # first retry delay, doubled per attempt
+JOB_TTL = 7 * 86400           # how long job records are kept
+
+# Queue score: priority band first, then enqueue time (FIFO within a band)
+PRIORITY_BAND = 10 ** 13
+
+# KEYS: queue zset, processing zset. ARGV: now, heartbeat deadline
+# Pops the best-scored job and marks it as processing in one step.
+CLAIM_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[2], popped[1])
+return popped[1]
+"""
+
+# KEYS: delayed zset, queue zset, priorities hash. ARGV: now
+# Moves retries whose backoff has elapsed back into the queue.
+PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES')
+for i = 1, #due, 2 do
+    local job_id = due[i]
+    local priority = tonumber(redis.call('HGET', KEYS[3], job_id) or '5')
+    redis.call('ZADD', KEYS[2], priority * 10000000000000 + tonumber(ARGV[1]) * 1000, job_id)
+    redis.call('ZREM', KEYS[1], job_id)
+end
+return #due / 2
+"""
+
+
+# KEYS: processing zset, job key, delayed zset
+# ARGV: job id, worker id, job JSON, job TTL, retry_at ('' when not retrying)
+# Records a finished attempt only if the job is still running under this worker.
+# A job requeued after a missed heartbeat (and possibly claimed again) is left alone.
+OWNED_FINISH_SCRIPT = """
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+local current = redis.call('GET', KEYS[2])
+if not current or cjson.decode(current)['worker'] ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[4])
+if ARGV[5] ~= '' then
+    redis.call('ZADD', KEYS[3], ARGV[5], ARGV[1])
+end
+return 1
+"""
+
+
+def _queue_score(priority: int, now: float) -> float:
+    return priority * PRIORITY_BAND + int(now * 1000)
+
+
+def _save(job: Dict[str, Any]):
+    cache.set(CacheKeys.job(job['id']), job, ttl=JOB_TTL)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job record (status, attempts, result/error) or None"""
+    return cache.get(CacheKeys.job(job_id))
+
+
+def enqueue(job_type: str, payload: Optional[Dict[str, Any]] = None,
+            priority: int = PRIORITY_NORMAL, max_attempts: int = 3,
+            unique: bool = True) -> Dict[str, Any]:
+    """
+    Add a job to the queue
+
+    Args:
+        job_type: Handler name (see services.jobs.JOB_HANDLERS)
+        payload: JSON-serializable handler arguments
+        priority: 0 (highest) - 9 (lowest)
+        max_attempts: Total tries before the job is marked failed
+        unique: Return the already queued/running job of this type instead of adding another
+
+    Returns:
+        The job record (check 'deduplicated' to see if an existing job was returned)
+    """
+    now = time.time()
+    job = {
+        'id': uuid.uuid4().hex,
+        'type': job_type,
+        'payload': payload or {},
+        'priority': priority,
+        'status': 'queued',
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'enqueued_at': now,
+        'started_at': None,
+        'finished_at': None,
+        'worker': None,
+        'result': None,
+        'error': None,
+    }
+
+    if unique:
+        active_key = CacheKeys.job_active(job_type)
+        if not cache.set_if_absent(active_key, job['id'], ttl=JOB_TTL):
+            existing = get_job(cache.get(active_key) or '')
+            if existing and existing['status'] in ('queued', 'running', 'retrying'):
+                return {**existing, 'deduplicated': True}
+            # Stale marker (job finished or expired): take it over
+            cache.set(active_key, job['id'], ttl=JOB_TTL)
+        job['unique'] = True
+
+    _save(job)
+    cache.client.hset(CacheKeys.job_priorities(), job['id'], priority)
+    cache.client.zadd(CacheKeys.job_queue(), {job['id']: _queue_score(priority, now)})
+    return job
+
+
+def claim(worker_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the highest-priority ready job
+
+    Returns:
+        The job record (status 'running') or None if the queue is empty
+    """
+    now = time.time()
+    cache.client.eval(
+        PROMOTE_SCRIPT, 3,
+        CacheKeys.job_delayed(), CacheKeys.job_queue(), CacheKeys.job_priorities(), now
+    )
+    job_id = cache.client.eval(
+        CLAIM_SCRIPT, 2, CacheKeys.job_queue(), CacheKeys.job_processing(),
+        now, now + HEARTBEAT_TIMEOUT
+    )
+    if not job_id:
+        return None
+
+    job = get_job(job_id)
+    if job is None:
+        # Record expired while queued: nothing to run
+        cache.client.zrem(CacheKeys.job_processing(), job_id)
+        return None
+
+    job.update(status='running', worker=worker_id, started_at=now, attempts=job['attempts'] + 1)
+    _save(job)
+    return job
+
+
+def heartbeat(job_id: str, progress: Optional[str] = None):
+    """Extend the running job's deadline (call at least every HEARTBEAT_TIMEOUT seconds)"""
+    cache.client.zadd(CacheKeys.job_processing(), {job_id: time.time() + HEARTBEAT_TIMEOUT}, xx=True)
+    if progress is not None:
+        job = get_job(job_id)
+        if job:
+            job['progress'] = progress
+            _save(job)
+
+
+def _release(job: Dict[str, Any]):
+    """Drop the job's priority entry and its unique-type marker (terminal states only)"""
+    cache.client.hdel(CacheKeys.job_priorities(), job['id'])
+    if job.get('unique') and cache.get(CacheKeys.job_active(job['type'])) == job['id']:
+        cache.delete(CacheKeys.job_active(job['type']))
+
+
+def _record_owned(job: Dict[str, Any], retry_at: Optional[float] = None) -> bool:
+    """Atomically store the job and leave processing, if this worker still owns it"""
+    return bool(cache.client.eval(
+        OWNED_FINISH_SCRIPT, 3,
+        CacheKeys.job_processing(), CacheKeys.job(job['id']), CacheKeys.job_delayed(),
+        job['id'], job.get('worker') or '', json.dumps(job), JOB_TTL,
+        '' if retry_at is None else retry_at
+    ))
+
+
+def _apply_failure(job: Dict[str, Any], error: str) -> Optional[float]:
+    """Update the record for a failed attempt; returns the retry time, or None if out of attempts"""
+    now = time.time()
+    job['error'] = error
+    if job['attempts'] < job['max_attempts']:
+        delay = RETRY_BACKOFF_SECONDS * (2 ** (job['attempts'] - 1))
+        job.update(status='retrying', retry_at=now + delay)
+        return now + delay
+    job.update(status='failed', finished_at=now)
+    return None
+
+
+def complete(job: Dict[str, Any], result: Any = None) -> bool:
+    """
+    Mark a job succeeded and store its (JSON-serializable) result
+
+    Returns:
+        False if the job was requeued after a missed heartbeat; the result
+        is dropped and the retry (or its new worker) stays in charge
+    """
+    job.update(status='completed', result=result, error=None, finished_at=time.time())
+    if not _record_owned(job):
+        return False
+    _release(job)
+    return True
+
+
+def fail(job: Dict[str, Any], error: str) -> bool:
+    """
+    Record a failed attempt: schedule a retry with exponential backoff, or
+    mark the job failed once max_attempts is reached
+
+    Returns:
+        False if this worker no longer owns the job (nothing recorded)
+    """
+    retry_at = _apply_failure(job, error)
+    if not _record_owned(job, retry_at):
+        return False
+    if retry_at is None:
+        _release(job)
+    return True
+
+
+def requeue_stalled() -> List[str]:
+    """
+    Fail (and so retry) running jobs whose worker stopped heartbeating
+
+    Returns:
+        IDs of the stalled jobs
+    """
+    stalled = cache.client.zrangebyscore(CacheKeys.job_processing(), '-inf', time.time())
+    for job_id in stalled:
+        # Only one worker gets to handle each stalled job
+        if not cache.client.zrem(CacheKeys.job_processing(), job_id):
+            continue
+        job = get_job(job_id)
+        if job:
+            # Already removed from processing above, so record without the ownership check
+            retry_at = _apply_failure(job, f"Worker {job.get('worker')} stopped heartbeating")
+            _save(job)
+            if retry_at is None:
+                _release(job)
+            else:
+                cache.client.zadd(CacheKeys.job_delayed(), {job_id: retry_at})
+    return stalled
+
+
+def queue_depth() -> Dict[str, int]:
+    """Counts of queued, delayed (retrying) and running jobs"""
+    return {
+        'queued': cache.client.zcard(CacheKeys.job_queue()),
+        'retrying': cache.client.zcard(CacheKeys.job_delayed()),
+        'running': cache.client.zcard(CacheKeys.job_processing()),
+    }
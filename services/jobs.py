@@ -0,0 +1,137 @@
+"""
+Background job handlers run by sync_worker.py
+Each handler takes the job payload and returns a JSON-serializable result;
+raising marks the attempt failed (and retried) in the job queue.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from cache.redis_manager import cache, CacheKeys
+
+
+SYNC_EVENTS_MAXLEN = int(os.getenv('SYNC_EVENTS_MAXLEN', '1000'))
+
+
+def update_sync_progress(status='running', **extra):
+    """Update the small sync status summary in Redis (the log itself lives in the events stream)"""
+    data = cache.get(CacheKeys.sync_status()) or {}
+    data.update(status=status, **extra)
+    cache.set(CacheKeys.sync_status(), data, ttl=86400)
+
+
+def publish_sync_event(message, log_type='info', status='running'):
+    """
+    Append one progress event to the sync events stream
+
+    Returns:
+        Stream entry ID, or None if Redis is unavailable
+    """
+    return cache.stream_add(CacheKeys.sync_events(), {
+        'message': message,
+        'type': log_type,
+        'status': status,
+        'timestamp': datetime.now().isoformat()
+    }, maxlen=SYNC_EVENTS_MAXLEN, ttl=86400)
+
+
+def run_full_sync(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Google + IIQ device sync with progress events (the /sync/all job)"""
+
+    start_time = datetime.now()
+    run_start_id = publish_sync_event('Sync started', 'info')
+    update_sync_progress(status='running', run_start_id=run_start_id)
+
+    try:
+        from services.sync_service_simple import SimpleSyncService
+        from integrations.google import GoogleWorkspaceClient
+        from integrations.google_telemetry import ChromeTelemetryClient
+        from integrations.incidentiq import IncidentIQClient
+        from integrations.meraki import MerakiClient
+
+        publish_sync_event('Initializing API connections...', 'info')
+        creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH', '/opt/chromebook-dashboard/credentials.json')
+        admin_email = os.getenv('GOOGLE_ADMIN_EMAIL', 'gsync@cr.k12.de.us')
+        google = GoogleWorkspaceClient(creds_path, admin_email)
+        iiq = IncidentIQClient(
+            os.getenv('INCIDENTIQ_SITE_ID', ''),
+            os.getenv('INCIDENTIQ_API_TOKEN', ''),
+            os.getenv('INCIDENTIQ_PRODUCT_ID', '88df910c-91aa-e711-80c2-0004ffa00050')
+        )
+
+        # Optional clients: the sync skips Meraki ingest / battery telemetry without them
+        meraki_key = os.getenv('MERAKI_API_KEY', '')
+        meraki = MerakiClient(meraki_key, os.getenv('MERAKI_ORG_ID', '')) if meraki_key else None
+        telemetry = None
+        try:
+            telemetry = ChromeTelemetryClient(creds_path, admin_email)
+        except Exception as e:
+            publish_sync_event(f'Telemetry client not available: {e}', 'warning')
+
+        sync_service = SimpleSyncService(google, iiq, meraki, telemetry)
+        result = sync_service.sync_chromebooks(progress_callback=publish_sync_event)
+
+        duration = (datetime.now() - start_time).total_seconds()
+        publish_sync_event(f'Sync completed in {int(duration)}s', 'success', status='completed')
+        result['duration_seconds'] = int(duration)
+        # sync_chromebooks rewrites the status summary; keep this run's first event for replay
+        update_sync_progress(status='completed', run_start_id=run_start_id, **result)
+        return result
+
+    except Exception as e:
+        publish_sync_event(f'Error: {str(e)}', 'error', status='failed')
+        update_sync_progress(status='failed',
+            error=str(e),
+            failed_at=datetime.now().isoformat()
+        )
+        raise
+
+
+def run_sheets_export(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Export all chromebooks to the Looker Studio Google Sheet"""
+    from export_to_sheets import get_all_chromebooks, export_to_sheet
+
+    devices = get_all_chromebooks()
+    url = export_to_sheet(devices)
+    return {'devices': len(devices), 'url': url}
+
+
+def run_report_precompute(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the cached device reports so the first dashboard view is a cache hit"""
+    from routes import reports
+
+    reports.invalidate_report_cache()
+    builders = {
+        'summary': reports.devices_summary,
+        'ghost': reports.ghost_devices_report,
+        'os_compliance': reports.os_compliance_report,
+        'ou_breakdown': reports.ou_breakdown_report,
+        'aue_status': reports.aue_status_report,
+    }
+    results = {}
+    for name, build in builders.items():
+        report = asyncio.run(build())
+        results[name] = bool(report.get('success'))
+    return results
+
+
+def run_meraki_ingest(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Page org-wide Meraki wireless clients into meraki_clients and link them to chromebooks"""
+    from integrations.meraki import MerakiClient
+    from services.meraki_ingest import ingest_meraki_clients
+
+    meraki_key = os.getenv('MERAKI_API_KEY', '')
+    if not meraki_key:
+        return {'skipped': 'MERAKI_API_KEY is not set'}
+    meraki = MerakiClient(meraki_key, os.getenv('MERAKI_ORG_ID', ''))
+    return ingest_meraki_clients(meraki, timespan=payload.get('timespan'))
+
+
+# Job type -> handler
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'sync': run_full_sync,
+    'export': run_sheets_export,
+    'report_precompute': run_report_precompute,
+    'meraki_clients': run_meraki_ingest,
+}
@@ -0,0 +1,141 @@
+"""
+Guards for endpoints that call Google / IIQ live
+Per-user Redis token buckets and coalescing of identical concurrent lookups
+"""
+import asyncio
+import hashlib
+import os
+from typing import Any, Callable, Dict
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from cache.redis_manager import cache, CacheKeys
+
+
+LIVE_SEARCH_BURST = int(os.getenv('LIVE_SEARCH_BURST', '10'))
+LIVE_SEARCH_PER_MINUTE = float(os.getenv('LIVE_SEARCH_PER_MINUTE', '20'))
+
+# Followers in other workers wait this long for the leader's result
+COALESCE_WAIT_SECONDS = 15.0
+COALESCE_POLL_SECONDS = 0.1
+# Shared results are only meant for requests that overlapped the upstream call
+COALESCE_RESULT_TTL = 5
+
+
+def request_identity(request: Request) -> str:
+    """Signed-in user's email, falling back to the client address"""
+    user = request.scope.get('session', {}).get('user') or {}
+    if user.get('email'):
+        return user['email']
+    return request.client.host if request.client else 'anonymous'
+
+
+def enforce_rate_limit(request: Request, scope: str,
+                       capacity: int = LIVE_SEARCH_BURST,
+                       per_minute: float = LIVE_SEARCH_PER_MINUTE):
+    """
+    Take one token from the caller's bucket for `scope`
+
+    Raises:
+        HTTPException 429 (with Retry-After) when the bucket is empty
+    """
+    allowed, retry_after = cache.take_token(
+        CacheKeys.rate_limit(scope, request_identity(request)),
+        capacity, per_minute / 60.0
+    )
+    if not allowed:
+        seconds = max(1, int(retry_after + 0.999))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many live lookups. Try again in {seconds}s.",
+            headers={'Retry-After': str(seconds)}
+        )
+
+
+def live_rate_limit(scope: str) -> Callable:
+    """FastAPI dependency applying enforce_rate_limit to a whole endpoint"""
+    async def dependency(request: Request):
+        enforce_rate_limit(request, scope)
+    return dependency
+
+
+class RequestCoalescer:
+    """
+    Single-flight for blocking upstream calls
+
+    Within a worker, identical concurrent calls await one shared task. Across
+    workers, the first caller claims a short Redis marker and publishes its
+    result; callers in other workers poll for that result instead of calling
+    upstream again, and fall back to their own call if the leader doesn't finish.
+    Results must be JSON-serializable to be shared across workers.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _key(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    async def run(self, key: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) in the threadpool, or join an identical call in flight
+
+        Args:
+            key: Identity of the call (e.g. the normalized query)
+            fn: Blocking function doing the upstream request
+
+        Returns:
+            fn's result (shared with every coalesced caller)
+        """
+        shared_key = self._key(key)
+        task = self._inflight.get(shared_key)
+        if task is None:
+            # Detached from the first caller: its disconnect must not cancel the others' lookup
+            task = asyncio.create_task(self._run_across_workers(shared_key, fn, *args, **kwargs))
+            self._inflight[shared_key] = task
+            task.add_done_callback(lambda done: self._finished(shared_key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, shared_key: str, task: asyncio.Task):
+        if self._inflight.get(shared_key) is task:
+            del self._inflight[shared_key]
+        # Every caller may have gone away; avoid "exception never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    @staticmethod
+    def _poll_shared(result_key: str, marker: str):
+        """(published result or None, whether the leader's marker is still set)"""
+        shared = cache.get(result_key)
+        if shared is not None:
+            return shared, True
+        return None, cache.exists(marker)
+
+    async def _run_across_workers(self, shared_key: str, fn: Callable, *args, **kwargs) -> Any:
+        marker = CacheKeys.inflight(shared_key)
+        result_key = CacheKeys.inflight_result(shared_key)
+
+        claimed = await run_in_threadpool(cache.set_if_absent, marker, 1, int(COALESCE_WAIT_SECONDS))
+        if not claimed:
+            # Another worker is already calling upstream: wait for its result
+            waited = 0.0
+            while waited < COALESCE_WAIT_SECONDS:
+                shared, leader_running = await run_in_threadpool(self._poll_shared, result_key, marker)
+                if shared is not None:
+                    return shared['value']
+                if not leader_running:
+                    break  # Leader failed without publishing
+                await asyncio.sleep(COALESCE_POLL_SECONDS)
+                waited += COALESCE_POLL_SECONDS
+
+        try:
+            result = await run_in_threadpool(fn, *args, **kwargs)
+            await run_in_threadpool(cache.set, result_key, {'value': result}, COALESCE_RESULT_TTL)
+            return result
+        finally:
+            # The marker belongs to the worker that set it; a waiter that gave up leaves it alone
+            if claimed:
+                await run_in_threadpool(cache.delete, marker)
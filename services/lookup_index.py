@@ -0,0 +1,213 @@
+"""
+Memory-mapped serial / asset tag / MAC lookup table
+The sync writes one sorted fixed-width binary file; every uvicorn worker
+mmaps it and binary-searches it, so all workers share the same page cache.
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from cache.redis_manager import cache, CacheKeys
+
+
+LOOKUP_INDEX_PATH = os.getenv('LOOKUP_INDEX_PATH', '/opt/chromebook-dashboard/data/lookup_index.bin')
+
+# File layout: header, then records sorted by (kind, key)
+#   header: magic, format version, record count, sync generation
+#   record: kind, key (NUL-padded), serial, device_id
+HEADER = struct.Struct('<4sHIQ')
+KEY_WIDTH = 31
+SERIAL_WIDTH = 31
+DEVICE_ID_WIDTH = 40
+RECORD = struct.Struct(f'<B{KEY_WIDTH}s{SERIAL_WIDTH}s{DEVICE_ID_WIDTH}s')
+MAGIC = b'CBLX'
+VERSION = 2
+SORT_WIDTH = 1 + KEY_WIDTH  # kind byte + key
+
+KIND_SERIAL = 0
+KIND_ASSET_TAG = 1
+KIND_MAC = 2
+
+LOOKUP_SOURCE_QUERY = text("""
+    SELECT serial_number, device_id, SPLIT_PART(asset_tag, ' | ', 1) AS asset_tag, mac_address
+    FROM chromebooks
+    WHERE serial_number IS NOT NULL
+""")
+
+# Non-Chromebook assets only resolve asset tag -> serial
+ASSET_SOURCE_QUERY = text("""
+    SELECT serial_number, asset_tag
+    FROM assets
+    WHERE serial_number IS NOT NULL AND asset_tag IS NOT NULL
+""")
+
+
+def normalize_key(kind: int, value: str) -> str:
+    """Canonical key form: uppercase, MACs as 12 bare hex digits"""
+    value = (value or '').strip().upper()
+    if kind == KIND_MAC:
+        value = value.replace(':', '').replace('-', '').replace('.', '')
+    return value
+
+
+def _pack(kind: int, key: str, serial: str, device_id: str) -> Optional[bytes]:
+    """Fixed-width record, or None if any field doesn't fit (never truncated: lookups fall back to Postgres)"""
+    encoded = key.encode('utf-8')
+    encoded_serial = (serial or '').encode('utf-8')
+    encoded_device_id = (device_id or '').encode('utf-8')
+    if not encoded or len(encoded) > KEY_WIDTH:
+        return None
+    if not encoded_serial or len(encoded_serial) > SERIAL_WIDTH or len(encoded_device_id) > DEVICE_ID_WIDTH:
+        return None
+    return RECORD.pack(kind, encoded, encoded_serial, encoded_device_id)
+
+
+def write_lookup_index(session, generation: int, path: str = LOOKUP_INDEX_PATH) -> int:
+    """
+    Build the binary lookup file from Postgres and atomically replace it
+
+    Args:
+        session: SQLAlchemy session
+        generation: Sync generation stamped into the header
+        path: Output file path
+
+    Returns:
+        Number of records written
+    """
+    records = {}
+
+    for serial, device_id, asset_tag, mac in session.execute(LOOKUP_SOURCE_QUERY):
+        serial = serial.upper()
+        for kind, raw in ((KIND_SERIAL, serial), (KIND_ASSET_TAG, asset_tag), (KIND_MAC, mac)):
+            packed = _pack(kind, normalize_key(kind, raw), serial, device_id)
+            if packed:
+                records.setdefault(packed[:SORT_WIDTH], packed)
+
+    for serial, asset_tag in session.execute(ASSET_SOURCE_QUERY):
+        packed = _pack(KIND_ASSET_TAG, normalize_key(KIND_ASSET_TAG, asset_tag), serial.upper(), '')
+        if packed:
+            # Chromebook rows (with a device_id) win over plain asset rows
+            records.setdefault(packed[:SORT_WIDTH], packed)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), generation))
+        for sort_key in sorted(records):
+            f.write(records[sort_key])
+    os.replace(tmp_path, path)
+
+    return len(records)
+
+
+class LookupIndex:
+    """Read-only view over one mmapped lookup file"""
+
+    def __init__(self, path: str = LOOKUP_INDEX_PATH):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.generation = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError(f"Unsupported lookup index format in {path}")
+
+    def lookup(self, kind: int, value: str) -> Optional[Dict[str, str]]:
+        """
+        Binary-search for one key
+
+        Args:
+            kind: KIND_SERIAL, KIND_ASSET_TAG or KIND_MAC
+            value: Raw key (normalized here)
+
+        Returns:
+            {'serial', 'deviceId'} or None
+        """
+        encoded = normalize_key(kind, value).encode('utf-8')
+        if not encoded or len(encoded) > KEY_WIDTH:
+            return None
+        target = bytes([kind]) + encoded.ljust(KEY_WIDTH, b'\0')
+
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            probe = self.mm[offset:offset + SORT_WIDTH]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                _, _, serial, device_id = RECORD.unpack_from(self.mm, offset)
+                return {
+                    'serial': serial.rstrip(b'\0').decode('utf-8'),
+                    'deviceId': device_id.rstrip(b'\0').decode('utf-8') or None
+                }
+        return None
+
+    def resolve(self, value: str) -> Optional[Dict[str, str]]:
+        """Try the value as a serial, then an asset tag, then a MAC address"""
+        for kind, label in ((KIND_SERIAL, 'serial'), (KIND_ASSET_TAG, 'assetTag'), (KIND_MAC, 'mac')):
+            hit = self.lookup(kind, value)
+            if hit:
+                hit['matchedOn'] = label
+                return hit
+        return None
+
+    def close(self):
+        self.mm.close()
+
+
+class SharedLookupIndex:
+    """
+    Per-worker handle that remaps the file when the sync generation changes
+    """
+
+    def __init__(self, path: str = LOOKUP_INDEX_PATH, check_interval: float = 30.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.index: Optional[LookupIndex] = None
+        self.generation = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _reload(self, generation):
+        try:
+            index = LookupIndex(self.path)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Lookup index load error: {e}")
+            return
+        # Old map is left to the GC: in-flight lookups may still hold a reference
+        self.index = index
+        self.generation = generation
+
+    def _refresh_if_stale(self):
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+            generation = cache.get(CacheKeys.sync_generation())
+            if self.index is None or generation != self.generation:
+                self._reload(generation)
+
+    def resolve(self, value: str) -> Optional[Dict[str, str]]:
+        """
+        Resolve a serial / asset tag / MAC without touching Postgres
+
+        Returns:
+            {'serial', 'deviceId', 'matchedOn'} or None (also None if no file yet)
+        """
+        self._refresh_if_stale()
+        index = self.index
+        if index is None or not value:
+            return None
+        return index.resolve(value)
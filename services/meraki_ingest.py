@@ -0,0 +1,188 @@
+"""
+Org-wide Meraki client ingestion
+Pages every wireless network's client listing into meraki_clients with one
+bulk upsert per batch, then links clients to chromebooks with a single join on
+the normalized MAC, so device views show AP location without a live Meraki call.
+"""
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+
+from database.connection import db
+
+
+INGEST_BATCH_SIZE = 5000
+
+# One statement per batch: the rows travel as a single JSONB parameter.
+# A client seen on several networks keeps its most recent sighting.
+UPSERT_CLIENTS_SQL = text("""
+    INSERT INTO meraki_clients (
+        mac_address, network_id, network_name, ap_name, ap_mac,
+        ip_address, vlan, description, first_seen, last_seen, created_at, updated_at
+    )
+    SELECT
+        r.mac_address, r.network_id, r.network_name, r.ap_name, r.ap_mac,
+        r.ip_address, r.vlan, r.description,
+        CAST(to_timestamp(r.first_seen) AS timestamp), CAST(to_timestamp(r.last_seen) AS timestamp), NOW(), NOW()
+    FROM jsonb_to_recordset(CAST(:rows AS jsonb)) AS r(
+        mac_address text, network_id text, network_name text, ap_name text, ap_mac text,
+        ip_address text, vlan integer, description text, first_seen double precision, last_seen double precision
+    )
+    ON CONFLICT (mac_address) DO UPDATE SET
+        network_id = EXCLUDED.network_id,
+        network_name = EXCLUDED.network_name,
+        ap_name = EXCLUDED.ap_name,
+        ap_mac = EXCLUDED.ap_mac,
+        ip_address = EXCLUDED.ip_address,
+        vlan = EXCLUDED.vlan,
+        description = EXCLUDED.description,
+        first_seen = LEAST(meraki_clients.first_seen, EXCLUDED.first_seen),
+        last_seen = EXCLUDED.last_seen,
+        updated_at = NOW()
+    WHERE meraki_clients.last_seen IS NULL OR EXCLUDED.last_seen >= meraki_clients.last_seen
+""")
+
+# Both sides use the colon-less MAC expression indexes (migrations 011 and 012)
+LINK_CHROMEBOOKS_SQL = text("""
+    UPDATE chromebooks c
+    SET meraki_ap_name = m.ap_name,
+        meraki_network = m.network_name,
+        last_seen_meraki = m.last_seen
+    FROM meraki_clients m
+    WHERE UPPER(REPLACE(c.mac_address, ':', '')) = UPPER(REPLACE(m.mac_address, ':', ''))
+      AND m.last_seen IS NOT NULL
+      AND (c.last_seen_meraki IS DISTINCT FROM m.last_seen
+           OR c.meraki_ap_name IS DISTINCT FROM m.ap_name
+           OR c.meraki_network IS DISTINCT FROM m.network_name)
+""")
+
+LINK_SERIALS_SQL = text("""
+    UPDATE meraki_clients m
+    SET serial_number = c.serial_number
+    FROM chromebooks c
+    WHERE UPPER(REPLACE(c.mac_address, ':', '')) = UPPER(REPLACE(m.mac_address, ':', ''))
+      AND m.serial_number IS DISTINCT FROM c.serial_number
+""")
+
+
+def normalize_mac(mac: Optional[str]) -> Optional[str]:
+    """'a1b2c3d4e5f6' / 'a1:b2:...' -> 'A1:B2:C3:D4:E5:F6' (None if not a MAC)"""
+    bare = (mac or '').replace(':', '').replace('-', '').upper()
+    if len(bare) != 12:
+        return None
+    return ':'.join(bare[i:i + 2] for i in range(0, 12, 2))
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """Meraki timestamps arrive as epoch seconds or ISO 8601 strings"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _vlan(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _client_row(client: Dict) -> Optional[Dict]:
+    mac = normalize_mac(client.get('mac'))
+    if not mac:
+        return None
+    return {
+        'mac_address': mac,
+        'network_id': client.get('networkId'),
+        'network_name': client.get('networkName'),
+        'ap_name': client.get('apName'),
+        'ap_mac': normalize_mac(client.get('apMac')),
+        'ip_address': client.get('ip'),
+        'vlan': _vlan(client.get('vlan')),
+        'description': (client.get('description') or '')[:255] or None,
+        'first_seen': _epoch(client.get('firstSeen')),
+        'last_seen': _epoch(client.get('lastSeen')),
+    }
+
+
+def upsert_clients(session, rows: List[Dict]) -> int:
+    """
+    Bulk upsert client rows (see _client_row) into meraki_clients
+
+    Returns:
+        Number of distinct MACs written
+    """
+    # ON CONFLICT can't touch the same row twice in one statement: keep the latest sighting
+    latest: Dict[str, Dict] = {}
+    for row in rows:
+        current = latest.get(row['mac_address'])
+        if current is None or (row['last_seen'] or 0) >= (current['last_seen'] or 0):
+            latest[row['mac_address']] = row
+    if latest:
+        session.execute(UPSERT_CLIENTS_SQL, {"rows": json.dumps(list(latest.values()))})
+    return len(latest)
+
+
+def link_to_chromebooks(session) -> Dict[str, int]:
+    """
+    Copy AP location onto chromebooks and chromebook serials onto meraki_clients
+
+    Returns:
+        {'chromebooks': rows updated, 'clients': rows updated}
+    """
+    chromebooks = session.execute(LINK_CHROMEBOOKS_SQL).rowcount
+    clients = session.execute(LINK_SERIALS_SQL).rowcount
+    return {'chromebooks': chromebooks, 'clients': clients}
+
+
+def ingest_meraki_clients(meraki, timespan: Optional[int] = None,
+                          batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Page all wireless clients from Meraki into meraki_clients and link them to chromebooks
+
+    Args:
+        meraki: integrations.meraki.MerakiClient
+        timespan: Client listing window in seconds (default MERAKI_CLIENT_TIMESPAN)
+        batch_size: Rows per upsert statement
+
+    Returns:
+        {'fetched', 'upserted', 'linked_chromebooks', 'linked_clients', 'duration_seconds'}
+    """
+    started = time.time()
+    fetched = 0
+    upserted = 0
+    clients: Iterable[Dict] = meraki.list_clients(timespan) if timespan else meraki.list_clients()
+
+    with db.get_session() as session:
+        batch: List[Dict] = []
+        for client in clients:
+            fetched += 1
+            row = _client_row(client)
+            if row:
+                batch.append(row)
+            if len(batch) >= batch_size:
+                upserted += upsert_clients(session, batch)
+                session.commit()
+                batch = []
+                print(f"  Meraki: {fetched} clients fetched...")
+        upserted += upsert_clients(session, batch)
+        session.commit()
+
+        linked = link_to_chromebooks(session)
+        session.commit()
+
+    return {
+        'fetched': fetched,
+        'upserted': upserted,
+        'linked_chromebooks': linked['chromebooks'],
+        'linked_clients': linked['clients'],
+        'duration_seconds': int(time.time() - started),
+    }
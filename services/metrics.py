@@ -0,0 +1,209 @@
+"""
+Prometheus metrics for the web app, cache, DB pools, upstream APIs and sync
+Works across uvicorn workers when PROMETHEUS_MULTIPROC_DIR points at a shared
+directory (wiped before the workers start); otherwise uses the in-process registry.
+"""
+import os
+import sys
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from cache.redis_manager import cache, CacheKeys
+from services import request_timing
+from services.startup import when_imported
+
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status',
+    ['method', 'route', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['method', 'route'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'SQLAlchemy connections checked out of the pool',
+    ['engine'], multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'SQLAlchemy connections open beyond pool_size',
+    ['engine'], multiprocess_mode='livesum'
+)
+REDIS_LATENCY = Histogram(
+    'redis_operation_duration_seconds', 'Redis command / pipeline latency',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+)
+UPSTREAM_CALLS = Counter(
+    'upstream_api_calls_total', 'HTTP calls to external APIs',
+    ['integration', 'outcome']
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_api_duration_seconds', 'External API call latency',
+    ['integration'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# Host suffix -> integration label for calls made through `requests`
+UPSTREAM_HOSTS = {
+    'incidentiq.com': 'iiq',
+    'meraki.com': 'meraki',
+}
+
+_engines: Dict[str, object] = {}
+
+
+def register_engine(name: str, engine):
+    """Report pool gauges for an engine"""
+    _engines[name] = engine
+
+
+def _update_pool_gauges():
+    # database.connection's engine (used by the sync/report modules) is only
+    # reported once something in this process has imported it
+    connection = sys.modules.get('database.connection')
+    if connection is not None and 'connection' not in _engines:
+        _engines['connection'] = connection.db.engine
+
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if hasattr(pool, 'checkedout'):
+            DB_POOL_CHECKED_OUT.labels(name).set(pool.checkedout())
+            DB_POOL_OVERFLOW.labels(name).set(max(0, pool.overflow()))
+
+
+def _observe_request(method: str, route: str, status: int, seconds: float):
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_LATENCY.labels(method, route).observe(seconds)
+    _update_pool_gauges()
+
+
+def _observe_call(subsystem: str, seconds: float, failed: bool):
+    if subsystem == 'redis':
+        REDIS_LATENCY.observe(seconds)
+
+
+def _record_upstream(integration: str, started: float, failed: bool):
+    UPSTREAM_CALLS.labels(integration, 'error' if failed else 'ok').inc()
+    UPSTREAM_LATENCY.labels(integration).observe(time.perf_counter() - started)
+
+
+def _patch_requests(requests_module):
+    original_send = requests_module.Session.send
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        integration = next((label for suffix, label in UPSTREAM_HOSTS.items() if host.endswith(suffix)), None)
+        if integration is None:
+            return original_send(self, request, **kwargs)
+        started = time.perf_counter()
+        try:
+            response = original_send(self, request, **kwargs)
+        except Exception:
+            _record_upstream(integration, started, True)
+            raise
+        _record_upstream(integration, started, response.status_code >= 400)
+        return response
+
+    requests_module.Session.send = send
+
+
+def _patch_googleapiclient(http_module):
+    original_execute = http_module.HttpRequest.execute
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = original_execute(self, *args, **kwargs)
+        except Exception:
+            _record_upstream('google', started, True)
+            raise
+        _record_upstream('google', started, False)
+        return result
+
+    http_module.HttpRequest.execute = execute
+
+
+def instrument_upstream():
+    """
+    Count external API calls at the HTTP layer
+
+    IIQ and Meraki go through requests.Session.send (requests.post uses a
+    Session too); Google goes through googleapiclient's HttpRequest.execute.
+    Errors are exceptions or HTTP status >= 400, including calls the clients
+    catch and turn into empty results. Patches apply when those libraries are
+    first imported.
+    """
+    when_imported('requests', _patch_requests)
+    when_imported('googleapiclient.http', _patch_googleapiclient)
+
+
+class SyncStageCollector:
+    """Exports the last sync's per-stage durations, which the sync process stores in Redis"""
+
+    @staticmethod
+    def _families():
+        family = GaugeMetricFamily(
+            'sync_last_stage_duration_seconds', 'Duration of each stage of the last completed sync',
+            labels=['sync_type', 'stage']
+        )
+        completed = GaugeMetricFamily(
+            'sync_last_completed_timestamp_seconds', 'Unix time the last sync completed',
+            labels=['sync_type']
+        )
+        return family, completed
+
+    def describe(self):
+        # Registering calls describe() (or collect() without it): no Redis read at import time
+        return list(self._families())
+
+    def collect(self):
+        family, completed = self._families()
+        report = cache.get(CacheKeys.sync_stage_durations()) or {}
+        sync_type = report.get('sync_type', 'unknown')
+        for stage, seconds in report.get('stages', {}).items():
+            family.add_metric([sync_type, stage], seconds)
+        if report.get('completed_at'):
+            completed.add_metric([sync_type], report['completed_at'])
+        yield family
+        yield completed
+
+
+def install():
+    """Hook request/call observers and upstream counters (call once at startup)"""
+    request_timing.request_observers.append(_observe_request)
+    request_timing.call_observers.append(_observe_call)
+    instrument_upstream()
+    if not MULTIPROC_DIR:
+        REGISTRY.register(SyncStageCollector())
+
+
+def render_metrics():
+    """
+    Returns:
+        (body, content type) in the Prometheus text format, merged across
+        all workers when running in multiprocess mode
+    """
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(SyncStageCollector())
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    """Drop this worker's live gauges from the shared directory on shutdown"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,218 @@
+"""
+Per-request latency breakdown
+Accumulates time spent in Postgres, Redis and the IIQ / Google / Meraki clients
+for the current request, reports it as a Server-Timing header plus one
+structured log line, and keeps rolling p50/p95/p99 per route.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+
+logger = logging.getLogger('request_timing')
+
+SUBSYSTEMS = ('db', 'redis', 'iiq', 'google', 'meraki')
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', '1000'))
+UNMATCHED_ROUTE = '<unmatched>'
+
+# {subsystem: [total seconds, call count, nesting depth]} for the current request.
+# Mutated in place so time spent in threadpool copies of the context is kept.
+_request_timings: ContextVar[Optional[Dict[str, list]]] = ContextVar('request_timings', default=None)
+
+
+# Hooks for exporters: fn(method, route, status, seconds) after each request and
+# fn(subsystem, seconds, failed) after each timed call (inside a request or not)
+request_observers = []
+call_observers = []
+
+
+def _start(subsystem: str) -> Optional[list]:
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    entry = timings.setdefault(subsystem, [0.0, 0, 0])
+    entry[2] += 1
+    return entry
+
+
+def _stop(entry: Optional[list], started: float):
+    if entry is None:
+        return
+    entry[2] -= 1
+    # Only the outermost call is timed (search_and_extract -> search_assets)
+    if entry[2] == 0:
+        entry[0] += time.perf_counter() - started
+        entry[1] += 1
+
+
+def timed(subsystem: str, fn: Callable) -> Callable:
+    """Wrap fn so its duration is charged to `subsystem` for the current request"""
+    if getattr(fn, '_timed_subsystem', None):
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        entry = _start(subsystem)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            _stop(entry, started)
+            for observer in call_observers:
+                observer(subsystem, time.perf_counter() - started, failed)
+
+    wrapper._timed_subsystem = subsystem
+    return wrapper
+
+
+def instrument_class(cls, subsystem: str):
+    """Time every public method defined on an API client class"""
+    for name, value in list(vars(cls).items()):
+        if callable(value) and not name.startswith('_'):
+            setattr(cls, name, timed(subsystem, value))
+
+
+def instrument_redis():
+    """Time all Redis commands (RedisCache and the raw clients share redis.Redis)"""
+    import redis
+    from redis.client import Pipeline
+
+    redis.Redis.execute_command = timed('redis', redis.Redis.execute_command)
+    Pipeline.execute = timed('redis', Pipeline.execute)
+
+
+def instrument_sqlalchemy():
+    """Time every statement executed on any SQLAlchemy engine"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('request_timing', []).append((_start('db'), time.perf_counter()))
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get('request_timing')
+        if stack:
+            _stop(*stack.pop())
+
+    @event.listens_for(Engine, 'handle_error')
+    def handle_error(context):
+        stack = context.connection.info.get('request_timing') if context.connection else None
+        if stack:
+            _stop(*stack.pop())
+
+
+def instrument_clients():
+    """
+    Install all instrumentation wrappers (call once at startup)
+
+    API client classes are patched when their module is first imported, so
+    the integrations stay out of the startup import path.
+    """
+    from services.startup import when_imported
+
+    instrument_redis()
+    instrument_sqlalchemy()
+    when_imported('integrations.incidentiq', lambda module: instrument_class(module.IncidentIQClient, 'iiq'))
+    when_imported('integrations.google', lambda module: instrument_class(module.GoogleWorkspaceClient, 'google'))
+    when_imported('integrations.meraki', lambda module: instrument_class(module.MerakiClient, 'meraki'))
+
+
+class LatencyTracker:
+    """Rolling window of request durations per route (per worker process)"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, duration_ms: float):
+        with self._lock:
+            samples = self.samples.get(route)
+            if samples is None:
+                samples = self.samples[route] = deque(maxlen=self.window)
+            samples.append(duration_ms)
+
+    def percentiles(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns:
+            {route: {'count', 'p50', 'p95', 'p99'}} in milliseconds
+        """
+        with self._lock:
+            snapshot = {route: sorted(samples) for route, samples in self.samples.items()}
+
+        def pick(ordered, pct):
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct))], 1)
+
+        return {
+            route: {
+                'count': len(ordered),
+                'p50': pick(ordered, 0.50),
+                'p95': pick(ordered, 0.95),
+                'p99': pick(ordered, 0.99),
+            }
+            for route, ordered in snapshot.items() if ordered
+        }
+
+
+latency_tracker = LatencyTracker()
+
+
+class ServerTimingMiddleware(BaseHTTPMiddleware):
+    """
+    Adds `Server-Timing: db;dur=.., redis;dur=.., iiq;dur=.., app;dur=..` to
+    every response, logs the same breakdown as JSON and feeds latency_tracker
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        timings: Dict[str, list] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            _request_timings.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        # Unmatched paths (404s, scanners) share one label: raw URLs would grow the
+        # latency samples and the Prometheus route labels without bound
+        route = request.scope.get('route')
+        route_path = getattr(route, 'path', None) or UNMATCHED_ROUTE
+        breakdown = {
+            name: round(timings[name][0] * 1000, 1)
+            for name in SUBSYSTEMS if name in timings and timings[name][1]
+        }
+
+        response.headers['Server-Timing'] = ', '.join(
+            [f"{name};dur={ms}" for name, ms in breakdown.items()]
+            + [f"app;dur={round(total_ms, 1)}"]
+        )
+
+        if not request.url.path.startswith('/static'):
+            latency_tracker.record(f"{request.method} {route_path}", total_ms)
+            for observer in request_observers:
+                observer(request.method, route_path, response.status_code, total_ms / 1000)
+            logger.info(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'route': route_path,
+                'status': response.status_code,
+                'duration_ms': round(total_ms, 1),
+                'breakdown_ms': breakdown,
+                'calls': {name: timings[name][1] for name in breakdown},
+            }))
+
+        return response
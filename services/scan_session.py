@@ -0,0 +1,192 @@
+"""
+Barcode-scan sessions
+Scans arriving over a WebSocket are buffered and resolved in micro-batches
+(one bulk_lookup round per SCAN_BATCH_MS window instead of a request per scan),
+with a per-session tally of expected / found / unexpected devices kept in memory.
+"""
+import asyncio
+import json
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from services.bulk_lookup import MAX_BULK_KEYS, lookup_keys, normalize_keys
+
+
+SCAN_BATCH_MS = int(os.getenv('SCAN_BATCH_MS', '50'))
+MAX_EXPECTED_KEYS = MAX_BULK_KEYS * 2
+
+
+class ScanSession:
+    """
+    One scanner connection
+
+    Client messages (text frames):
+        "ABC123"                                  a single scan (keyboard-wedge scanners)
+        {"type": "scan", "key": "..."}            or {"type": "scan", "keys": [...]}
+        {"type": "expect", "keys": [...]}         asset tags / serials expected in this room/cart
+        {"type": "tally"}                         tally plus the expected keys not yet scanned
+        {"type": "reset"}                         clear scans (keeps the expected list)
+
+    Server messages:
+        {"type": "results", "results": [{key, status, record}], "tally": {...}}
+        status is 'found' (matched and expected, or no expected list),
+        'unexpected' (matched but not expected), 'notFound' or 'duplicate'
+    """
+
+    def __init__(self, session_factory: Callable, send: Callable[[Dict], Awaitable[None]]):
+        """
+        Args:
+            session_factory: SQLAlchemy sessionmaker used for each batch
+            send: Coroutine that delivers a JSON message to the client
+        """
+        self.session_factory = session_factory
+        self.send = send
+        self.expected: Set[str] = set()
+        self.results: Dict[str, Dict] = {}      # scanned key -> last result
+        self.found_expected: Set[str] = set()   # expected keys matched by a scan
+        self.unexpected: Set[str] = set()
+        self.not_found: Set[str] = set()
+        self.batches = 0
+        self._pending: List[str] = []
+        self._queued: Set[str] = set()
+        self._wakeup = asyncio.Event()
+
+    def tally(self) -> Dict[str, int]:
+        return {
+            'scanned': len(self.results),
+            'expected': len(self.expected),
+            'found': len(self.found_expected) if self.expected else len(self.results) - len(self.not_found),
+            'missing': len(self.expected - self.found_expected),
+            'unexpected': len(self.unexpected),
+            'notFound': len(self.not_found),
+            'batches': self.batches,
+        }
+
+    async def handle(self, message: str):
+        """Apply one client message"""
+        try:
+            data = json.loads(message)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            # Bare scan (plain text, or a JSON string/number)
+            await self.scan([message])
+            return
+
+        kind = data.get('type', 'scan')
+        if kind in ('scan', 'expect'):
+            keys = self._message_keys(data)
+            if keys is None:
+                await self.send({'type': 'error', 'detail': "'keys' must be a string or a list of strings"})
+            elif kind == 'scan':
+                await self.scan(keys)
+            else:
+                await self.expect(keys)
+        elif kind == 'tally':
+            await self.send({
+                'type': 'tally',
+                'tally': self.tally(),
+                'missing': sorted(self.expected - self.found_expected),
+            })
+        elif kind == 'reset':
+            self.results.clear()
+            self.found_expected.clear()
+            self.unexpected.clear()
+            self.not_found.clear()
+            await self.send({'type': 'tally', 'tally': self.tally()})
+        else:
+            await self.send({'type': 'error', 'detail': f"Unknown message type '{kind}'"})
+
+    @staticmethod
+    def _message_keys(data: Dict) -> Optional[List[str]]:
+        """'keys' (or 'key') of a message: a string is one key, a list is many (None if malformed)"""
+        value = data['keys'] if data.get('keys') is not None else data.get('key')
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list) and all(isinstance(k, (str, int)) for k in value):
+            return value
+        return None
+
+    async def expect(self, raw_keys: Iterable[str]):
+        keys = normalize_keys(raw_keys)
+        if len(self.expected) + len(keys) > MAX_EXPECTED_KEYS:
+            await self.send({'type': 'error', 'detail': f"At most {MAX_EXPECTED_KEYS} expected keys per session"})
+            return
+        self.expected.update(keys)
+        # Re-classify anything scanned before the expected list arrived
+        for key, result in self.results.items():
+            if result['status'] in ('found', 'unexpected'):
+                result['status'] = self._classify(key, result['record'])
+        await self.send({'type': 'tally', 'tally': self.tally()})
+
+    async def scan(self, raw_keys: Iterable[str]):
+        duplicates = []
+        for key in normalize_keys(raw_keys):
+            if key in self.results:
+                duplicates.append({**self.results[key], 'status': 'duplicate', 'previousStatus': self.results[key]['status']})
+            elif key not in self._queued:
+                self._queued.add(key)
+                self._pending.append(key)
+                self._wakeup.set()
+        if duplicates:
+            await self.send({'type': 'results', 'results': duplicates, 'tally': self.tally()})
+
+    async def run(self):
+        """Batch loop: wait for a scan, collect for SCAN_BATCH_MS, resolve the batch"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(SCAN_BATCH_MS / 1000)
+            self._wakeup.clear()
+            batch, self._pending = self._pending[:MAX_BULK_KEYS], self._pending[MAX_BULK_KEYS:]
+            if self._pending:
+                self._wakeup.set()
+            if batch:
+                await self._resolve(batch)
+
+    def _lookup(self, keys: List[str]):
+        db = self.session_factory()
+        try:
+            return lookup_keys(db, keys)
+        finally:
+            db.close()
+
+    def _classify(self, key: str, record: Optional[Dict]) -> str:
+        if record is None:
+            self.not_found.add(key)
+            return 'notFound'
+        if not self.expected:
+            return 'found'
+
+        # A scan matches the expected list by the scanned key or the device's tag/serial
+        identifiers = {key}
+        for field in ('assetTag', 'serialNumber'):
+            if record.get(field):
+                identifiers.add(str(record[field]).upper())
+        matched = identifiers & self.expected
+        if matched:
+            self.found_expected.update(matched)
+            self.unexpected.discard(key)
+            return 'found'
+        self.unexpected.add(key)
+        return 'unexpected'
+
+    async def _resolve(self, batch: List[str]):
+        try:
+            found, _ = await run_in_threadpool(self._lookup, batch)
+        except Exception as e:
+            print(f"Scan batch lookup error ({len(batch)} keys): {e}")
+            self._queued.difference_update(batch)
+            await self.send({'type': 'error', 'detail': f"Lookup failed: {str(e)}", 'keys': batch})
+            return
+
+        self.batches += 1
+        results = []
+        for key in batch:
+            record = found.get(key)
+            result = {'key': key, 'status': self._classify(key, record), 'record': record}
+            self.results[key] = result
+            results.append(result)
+        self._queued.difference_update(batch)
+        await self.send({'type': 'results', 'results': results, 'tally': self.tally()})
@@ -0,0 +1,152 @@
+"""
+Startup instrumentation
+Times import and init phases for a per-worker startup report, runs hooks when a
+lazily imported module is first loaded, and retries connections at startup.
+"""
+import importlib.abc
+import importlib.util
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+class StartupReport:
+    """Ordered (phase, milliseconds) timings for one worker process"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Dict[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float, kind: str = 'init'):
+        with self._lock:
+            self.phases.append({'phase': phase, 'kind': kind, 'ms': round(seconds * 1000, 1)})
+
+    @contextmanager
+    def measure(self, phase: str, kind: str = 'init'):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started, kind)
+
+    def summary(self) -> Dict:
+        """
+        Returns:
+            {'total_ms', 'phases': [{'phase', 'kind', 'ms'}, ...]}
+            (lazy imports appear with kind 'lazy_import' once first used)
+        """
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+            'phases': list(self.phases)
+        }
+
+    def log(self):
+        """Print the report, slowest phases first"""
+        summary = self.summary()
+        print(f"Startup report ({summary['total_ms']} ms since first import):")
+        for phase in sorted(summary['phases'], key=lambda p: p['ms'], reverse=True):
+            print(f"  {phase['ms']:>8.1f} ms  {phase['kind']:<11} {phase['phase']}")
+
+
+startup_report = StartupReport()
+
+
+_import_hooks: Dict[str, List[Callable]] = {}
+_hooks_lock = threading.Lock()
+
+
+class _PostImportFinder(importlib.abc.MetaPathFinder):
+    """Wraps the loader of hooked modules to time the import and run hooks after it"""
+
+    def __init__(self):
+        self._resolving = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in _import_hooks or fullname in self._resolving:
+            return None
+        self._resolving.add(fullname)
+        try:
+            spec = importlib.util.find_spec(fullname)
+        finally:
+            self._resolving.discard(fullname)
+        if spec is None or spec.loader is None or not hasattr(spec.loader, 'exec_module'):
+            return spec
+
+        loader = spec.loader
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            started = time.perf_counter()
+            exec_module(module)
+            startup_report.record(fullname, time.perf_counter() - started, 'lazy_import')
+            _run_hooks(fullname, module)
+
+        loader.exec_module = timed_exec_module
+        return spec
+
+
+def _run_hooks(module_name: str, module):
+    with _hooks_lock:
+        hooks = _import_hooks.pop(module_name, [])
+    for hook in hooks:
+        try:
+            hook(module)
+        except Exception as e:
+            print(f"Import hook error for '{module_name}': {e}")
+
+
+_finder = _PostImportFinder()
+sys.meta_path.insert(0, _finder)
+
+
+def when_imported(module_name: str, hook: Callable):
+    """
+    Run hook(module) once `module_name` is imported (immediately if it already is)
+
+    Lets instrumentation patch heavy integration modules without importing
+    them at startup.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        hook(module)
+        return
+    with _hooks_lock:
+        _import_hooks.setdefault(module_name, []).append(hook)
+
+
+def connect_with_retry(name: str, connect: Callable[[], object], attempts: int = 5,
+                       delay: float = 1.0, max_delay: float = 10.0) -> bool:
+    """
+    Call connect() until it succeeds, with exponential backoff
+
+    Args:
+        name: Label for logs and the startup report
+        connect: Callable that raises on failure
+        attempts: Maximum tries
+        delay: First backoff in seconds (doubled each retry, capped at max_delay)
+
+    Returns:
+        True if connected. Failure is logged, not raised, so a dependency
+        blip degrades the worker instead of stopping it from booting.
+    """
+    started = time.perf_counter()
+    last_error: Optional[Exception] = None
+    for attempt in range(1, attempts + 1):
+        try:
+            connect()
+            startup_report.record(f"connect {name}", time.perf_counter() - started)
+            print(f"✓ {name} connected (attempt {attempt})")
+            return True
+        except Exception as e:
+            last_error = e
+            if attempt < attempts:
+                print(f"  {name} not reachable (attempt {attempt}/{attempts}): {e}; retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    startup_report.record(f"connect {name} (failed)", time.perf_counter() - started)
+    print(f"✗ {name} unavailable after {attempts} attempts: {last_error}")
+    return False
@@ -0,0 +1,160 @@
+"""
+Fingerprinted static assets
+Content-hashed URLs for templates, precompressed .br/.gz variants and
+immutable caching for URLs that carry the current hash.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+FINGERPRINT_EXTENSIONS = ('.js', '.css', '.png', '.svg')
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.svg')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# dashboard.3f2a9c1d0b7e.js -> (dashboard, 3f2a9c1d0b7e, .js)
+FINGERPRINT_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[A-Za-z0-9]+)$')
+
+
+class StaticManifest:
+    """Maps static file paths to content hashes (built once at startup)"""
+
+    def __init__(self, directory: str, url_prefix: str = '/static'):
+        """
+        Args:
+            directory: Static files directory
+            url_prefix: Mount path of the static app
+        """
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.hashes: Dict[str, str] = {}
+        self.build()
+
+    def build(self):
+        """Hash every fingerprintable file and refresh its precompressed variants"""
+        hashes = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(FINGERPRINT_EXTENSIONS):
+                    continue
+                full_path = os.path.join(root, name)
+                rel_path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    content = f.read()
+                hashes[rel_path] = hashlib.sha256(content).hexdigest()[:12]
+                if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                    precompress(full_path, content)
+        self.hashes = hashes
+
+    def url(self, path: str) -> str:
+        """
+        Fingerprinted URL for a static file (used as `static_url()` in templates)
+
+        Args:
+            path: Path relative to the static directory, e.g. 'js/dashboard.js'
+
+        Returns:
+            '/static/js/dashboard.<hash>.js', or the plain URL for unknown files
+        """
+        path = path.lstrip('/')
+        digest = self.hashes.get(path)
+        if not digest:
+            return f"{self.url_prefix}/{path}"
+        stem, ext = os.path.splitext(path)
+        return f"{self.url_prefix}/{stem}.{digest}{ext}"
+
+    def resolve(self, path: str) -> Tuple[Optional[str], bool]:
+        """
+        Map a requested path back to the real file
+
+        Returns:
+            (real relative path or None, whether the hash is current)
+        """
+        match = FINGERPRINT_PATTERN.match(path.replace(os.sep, '/'))
+        if not match:
+            return None, False
+        real_path = match.group('stem') + match.group('ext')
+        digest = self.hashes.get(real_path)
+        if digest is None:
+            return None, False
+        return real_path, digest == match.group('hash')
+
+
+def precompress(full_path: str, content: bytes):
+    """Write .gz (and .br when brotli is installed) next to a file if missing or stale"""
+    mtime = os.path.getmtime(full_path)
+    variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if BROTLI_AVAILABLE:
+        variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    for suffix, compress in variants:
+        target = full_path + suffix
+        try:
+            if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                continue
+            # Every uvicorn worker runs this at import: a per-process temp file
+            # keeps one worker from truncating a variant another just renamed in
+            fd, tmp_target = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp',
+                                              dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(compress(content))
+                os.chmod(tmp_target, 0o644)
+                os.replace(tmp_target, target)
+            except BaseException:
+                os.unlink(tmp_target)
+                raise
+        except OSError as e:
+            print(f"Static precompress error for '{full_path}{suffix}': {e}")
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """
+    StaticFiles that understands fingerprinted names
+
+    Current-hash URLs are served with a one-year immutable Cache-Control,
+    from the precompressed variant the client accepts. Outdated hashes are
+    still served (with revalidation) so pages cached before a deploy keep working.
+    Plain, un-hashed URLs fall through to normal StaticFiles handling.
+    """
+
+    def __init__(self, *, directory: str, manifest: StaticManifest, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope):
+        real_path, current = self.manifest.resolve(path)
+        if real_path is None:
+            response = await super().get_response(path, scope)
+            response.headers.setdefault('Cache-Control', REVALIDATE_CACHE_CONTROL)
+            return response
+
+        full_path = os.path.join(self.directory, real_path)
+        media_type = mimetypes.guess_type(real_path)[0] or 'application/octet-stream'
+        headers = {
+            'Cache-Control': IMMUTABLE_CACHE_CONTROL if current else REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding'
+        }
+
+        accept = Headers(scope=scope).get('accept-encoding', '')
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in accept and os.path.exists(full_path + suffix):
+                headers['Content-Encoding'] = encoding
+                return FileResponse(full_path + suffix, media_type=media_type, headers=headers)
+
+        return FileResponse(full_path, media_type=media_type, headers=headers)
@@ -10,6 +10,7 @@ from sqlalchemy import and_, or_
 from database.models import Chromebook, User, MerakiClient, SyncLog
 from database.connection import db
 from cache.redis_manager import cache, CacheKeys
+from services.meraki_ingest import link_to_chromebooks
 
 
 class SyncService:
@@ -448,18 +449,10 @@ class SyncService:
             raise
     
     def _link_meraki_to_chromebooks(self, session: Session):
-        """Link Meraki client data to chromebooks (best effort by MAC matching)"""
-        # This is simplified - you may need more sophisticated matching logic
-        # For now, we'll just update chromebooks with recent Meraki data
-        
-        # Get all chromebooks
-        chromebooks = session.query(Chromebook).all()
-        
-        for chromebook in chromebooks:
-            # Try to find Meraki client data
-            # Note: You'll need to add MAC address field to Chromebook model
-            # or use another matching strategy
-            pass  # Implement your matching logic here
+        """Link Meraki client data to chromebooks with one join on the normalized MAC"""
+        linked = link_to_chromebooks(session)
+        session.commit()
+        print(f"Linked Meraki data to {linked['chromebooks']} chromebooks")
     
     def _parse_datetime(self, dt_string: Optional[str]) -> Optional[datetime]:
         """Parse datetime string to datetime object"""
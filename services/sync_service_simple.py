@@ -1,9 +1,10 @@
 """
 Simplified sync service for chromebooks only (to start)
 """
-from datetime import datetime
-from typing import Dict, Any, List
+from datetime import datetime, date
+from typing import Any, Callable, Dict, List, Optional
 from sqlalchemy.orm import Session
+from sqlalchemy import text
 import gc  # Garbage collection for memory optimization
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
@@ -18,9 +19,32 @@ from database.models import Chromebook, SyncLog, Asset, User
 from database.connection import db
 from cache.redis_manager import cache, CacheKeys
 from integrations.google_telemetry import ChromeTelemetryClient
+from services.lookup_index import write_lookup_index, LOOKUP_INDEX_PATH
+from services.meraki_ingest import ingest_meraki_clients
 from decimal import Decimal
 
 
+def parse_aue_date(value) -> Optional[date]:
+    """Normalize Google's autoUpdateThrough ('YYYY-MM-DD' or ISO timestamp) to a date"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def normalize_recent_users(recent_users) -> List[Dict[str, Any]]:
+    """Lowercase recentUsers emails so JSONB containment lookups match exactly"""
+    normalized = []
+    for entry in recent_users or []:
+        entry = dict(entry)
+        if entry.get('email'):
+            entry['email'] = entry['email'].strip().lower()
+        normalized.append(entry)
+    return normalized
+
+
 class SimpleSyncService:
     """Simplified service to sync chromebooks from your APIs"""
 
@@ -29,6 +53,32 @@ class SimpleSyncService:
         self.iiq = iiq_api
         self.meraki = meraki_api
         self.telemetry = telemetry_api
+        self.stage_durations: Dict[str, float] = {}
+        self._stage = None
+        self.progress_callback: Optional[Callable[[str, str], Any]] = None
+
+    def report(self, message: str, log_type: str = 'info'):
+        """Print a progress line and forward it to the progress callback, if any"""
+        print(message)
+        if self.progress_callback:
+            self.progress_callback(message.strip(), log_type)
+
+    def begin_stage(self, name: Optional[str]):
+        """Close the running stage (recording its duration) and start `name` (None to just close)"""
+        now = time.time()
+        if self._stage:
+            stage, started = self._stage
+            self.stage_durations[stage] = round(now - started, 2)
+        self._stage = (name, now) if name else None
+
+    def publish_stage_durations(self, sync_type: str):
+        """Store the last run's stage durations in Redis (exported on /metrics)"""
+        self.begin_stage(None)
+        cache.set(CacheKeys.sync_stage_durations(), {
+            'sync_type': sync_type,
+            'completed_at': time.time(),
+            'stages': self.stage_durations
+        }, ttl=30 * 86400)
 
     @staticmethod
     def get_memory_percent():
@@ -69,10 +119,72 @@ class SimpleSyncService:
 
         print(f"  ⚠ Timeout waiting for memory (waited {max_wait}s) - proceeding anyway")
         return False
+
+    def resolve_chromebook_owners(self) -> int:
+        """
+        Resolve chromebooks.owner_user_id from the normalized owner email so
+        device/user joins are primary-key lookups instead of LOWER() matches.
+
+        Returns:
+            Number of chromebooks whose owner changed
+        """
+        with db.get_session() as session:
+            result = session.execute(text("""
+                UPDATE chromebooks c
+                SET owner_user_id = u.user_id
+                FROM chromebooks c2
+                LEFT JOIN users u ON u.email_lower = c2.owner_email_lower
+                WHERE c.device_id = c2.device_id
+                  AND c.owner_user_id IS DISTINCT FROM u.user_id
+            """))
+            session.commit()
+            return result.rowcount
+
+    def refresh_user_device_counts(self) -> int:
+        """
+        Store each user's assigned-device count on users.device_count so
+        /api/user/search doesn't need a chromebooks join + GROUP BY per query.
+
+        Returns:
+            Number of users whose count changed
+        """
+        with db.get_session() as session:
+            result = session.execute(text("""
+                UPDATE users u
+                SET device_count = COALESCE(c.device_count, 0)
+                FROM users u2
+                LEFT JOIN (
+                    SELECT iiq_owner_email_lower AS email, COUNT(DISTINCT device_id) AS device_count
+                    FROM chromebooks
+                    WHERE iiq_owner_email_lower IS NOT NULL
+                    GROUP BY iiq_owner_email_lower
+                ) c ON c.email = u2.email_lower
+                WHERE u.user_id = u2.user_id
+                  AND u.device_count IS DISTINCT FROM COALESCE(c.device_count, 0)
+            """))
+            session.commit()
+            return result.rowcount
     
-    def sync_chromebooks(self) -> Dict[str, Any]:
-        """Sync all assets from IIQ, then enhance chromebooks with Google Admin data"""
+    def refresh_dashboard_views(self):
+        """
+        Refresh the dashboard materialized views (migration 008) without
+        blocking readers of /api/dashboard/bootstrap.
+        """
+        with db.get_session() as session:
+            session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_stats"))
+            session.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_dashboard_aue"))
+            session.commit()
+
+    def sync_chromebooks(self, progress_callback: Optional[Callable[[str, str], Any]] = None) -> Dict[str, Any]:
+        """
+        Sync all assets from IIQ, then enhance chromebooks with Google Admin data
+
+        Args:
+            progress_callback: Called with (message, log_type) for each progress line
+        """
         start_time = datetime.now()
+        self.progress_callback = progress_callback
+        self.stage_durations = {}
         assets_processed = 0
         assets_created = 0
         assets_updated = 0
@@ -96,9 +208,10 @@ class SimpleSyncService:
 
         try:
             # STEP 1: Fetch ALL assets from IncidentIQ (chromebooks, iPads, laptops, etc.)
-            print("STEP 1: Fetching all assets from IncidentIQ...")
+            self.report("STEP 1: Fetching all assets from IncidentIQ...")
+            self.begin_stage('iiq_assets_fetch')
             iiq_raw_assets = self.iiq.search_assets("", limit=100000)
-            print(f"  Found {len(iiq_raw_assets)} total assets in IIQ")
+            self.report(f"  Found {len(iiq_raw_assets)} total assets in IIQ")
 
             # Extract and categorize by device type
             all_assets = []
@@ -113,10 +226,11 @@ class SimpleSyncService:
                     if serial and serial != 'N/A':
                         chromebook_serials.append(serial)
 
-            print(f"  Categorized: {len(chromebook_serials)} chromebooks, {len(all_assets) - len(chromebook_serials)} other assets")
+            self.report(f"  Categorized: {len(chromebook_serials)} chromebooks, {len(all_assets) - len(chromebook_serials)} other assets")
 
             # STEP 2: Store all IIQ assets in assets table
-            print("STEP 2: Storing all IIQ assets in database...")
+            self.report("STEP 2: Storing all IIQ assets in database...")
+            self.begin_stage('assets_store')
             with db.get_session() as session:
                 for asset in all_assets:
                     assets_processed += 1
@@ -167,24 +281,26 @@ class SimpleSyncService:
 
                     if assets_processed % 100 == 0:
                         session.commit()
-                        print(f"  Processed {assets_processed} assets...")
+                        self.report(f"  Processed {assets_processed} assets...")
 
                 session.commit()
 
-            print(f"  Assets: {assets_processed} processed, {assets_created} created, {assets_updated} updated")
+            self.report(f"  Assets: {assets_processed} processed, {assets_created} created, {assets_updated} updated")
 
             # STEP 3: For chromebooks only, fetch Google Admin data
-            print("STEP 3: Fetching Google Admin data for chromebooks...")
+            self.report("STEP 3: Fetching Google Admin data for chromebooks...")
+            self.begin_stage('google_devices_fetch')
             google_devices = self.google.get_chromebooks(max_results=50000)
-            print(f"  Found {len(google_devices)} devices in Google Admin")
+            self.report(f"  Found {len(google_devices)} devices in Google Admin")
 
             # STEP 3.5: Fetch battery telemetry data if available
             battery_lookup = {}
             if self.telemetry:
-                print("STEP 3.5: Fetching battery telemetry data...")
+                self.report("STEP 3.5: Fetching battery telemetry data...")
+                self.begin_stage('battery_telemetry')
                 try:
                     telemetry_devices = self.telemetry.list_device_telemetry(page_size=100, max_results=50000)
-                    print(f"  Found {len(telemetry_devices)} devices with telemetry")
+                    self.report(f"  Found {len(telemetry_devices)} devices with telemetry")
 
                     # Create lookup by device_id
                     for telemetry in telemetry_devices:
@@ -193,9 +309,9 @@ class SimpleSyncService:
                             battery_info = self.telemetry.extract_battery_info(telemetry)
                             battery_lookup[device_id] = battery_info
 
-                    print(f"  Extracted battery info for {len(battery_lookup)} devices")
+                    self.report(f"  Extracted battery info for {len(battery_lookup)} devices")
                 except Exception as e:
-                    print(f"  Warning: Failed to fetch battery telemetry: {e}")
+                    self.report(f"  Warning: Failed to fetch battery telemetry: {e}", 'warning')
                     logger.error(f"Battery telemetry fetch failed: {e}")
 
             # STEP 4: Create lookup by serial number for IIQ data
@@ -206,7 +322,8 @@ class SimpleSyncService:
                     iiq_lookup[serial] = asset
 
             # STEP 5: Store/update Google Admin data for chromebooks in chromebooks table
-            print("STEP 5: Storing Google Admin data for chromebooks...")
+            self.report("STEP 5: Storing Google Admin data for chromebooks...")
+            self.begin_stage('chromebooks_store')
             with db.get_session() as session:
                 for device in google_devices:
                     chromebooks_processed += 1
@@ -253,10 +370,10 @@ class SimpleSyncService:
                         existing.annotated_location = device.get('annotatedLocation')
                         existing.org_unit_path = device.get('orgUnitPath')
                         existing.last_sync_status = device.get('lastSync')
-                        existing.recent_users = device.get('recentUsers', [])
+                        existing.recent_users = normalize_recent_users(device.get('recentUsers'))
 
                         # NEW FIELDS: Quick Wins Phase 2 - Device lifecycle & extended fields
-                        existing.auto_update_expiration = device.get('autoUpdateThrough')  # Use autoUpdateThrough (YYYY-MM-DD format)
+                        existing.auto_update_expiration = parse_aue_date(device.get('autoUpdateThrough'))
                         existing.support_end_date = device.get('supportEndDate')
                         existing.boot_mode = device.get('bootMode', 'Verified')
                         existing.device_license_type = device.get('deviceLicenseType')
@@ -399,7 +516,7 @@ class SimpleSyncService:
                             annotated_location=device.get('annotatedLocation'),
                             org_unit_path=device.get('orgUnitPath'),
                             last_sync_status=device.get('lastSync'),
-                            recent_users=device.get('recentUsers', []),
+                            recent_users=normalize_recent_users(device.get('recentUsers')),
                             iiq_asset_id=iiq_asset_id,
                             iiq_location=iiq_location,
                             iiq_room=iiq_room,
@@ -407,7 +524,7 @@ class SimpleSyncService:
                             iiq_owner_name=iiq_owner_name,
                             iiq_status=iiq_status,
                             # NEW FIELDS: Quick Wins Phase 2
-                            auto_update_expiration=device.get('autoUpdateThrough'),  # Use autoUpdateThrough (YYYY-MM-DD format)
+                            auto_update_expiration=parse_aue_date(device.get('autoUpdateThrough')),
                             support_end_date=device.get('supportEndDate'),
                             boot_mode=device.get('bootMode', 'Verified'),
                             device_license_type=device.get('deviceLicenseType'),
@@ -427,15 +544,16 @@ class SimpleSyncService:
 
                     if chromebooks_processed % 100 == 0:
                         session.commit()
-                        print(f"  Processed {chromebooks_processed} chromebooks...")
+                        self.report(f"  Processed {chromebooks_processed} chromebooks...")
 
                 session.commit()
 
             # STEP 6: Sync Google Workspace users
-            print("STEP 6: Fetching Google Workspace users...")
+            self.report("STEP 6: Fetching Google Workspace users...")
+            self.begin_stage('google_users')
             try:
                 google_users = self.google.list_all_users()
-                print(f"  Found {len(google_users)} users in Google Workspace")
+                self.report(f"  Found {len(google_users)} users in Google Workspace")
 
                 with db.get_session() as session:
                     for user_data in google_users:
@@ -547,13 +665,54 @@ class SimpleSyncService:
 
                         if users_processed % 100 == 0:
                             session.commit()
-                            print(f"  Processed {users_processed} users...")
+                            self.report(f"  Processed {users_processed} users...")
 
                     session.commit()
 
-                print(f"  Users: {users_processed} processed, {users_created} created, {users_updated} updated")
+                self.report(f"  Users: {users_processed} processed, {users_created} created, {users_updated} updated")
             except Exception as e:
-                print(f"  Warning: Failed to sync users: {e}")
+                self.report(f"  Warning: Failed to sync users: {e}", 'warning')
+
+            # STEP 7: Resolve device owners and refresh stored per-user device counts
+            self.report("STEP 7: Resolving device owners and user device counts...")
+            self.begin_stage('owners_device_counts')
+            try:
+                owners_changed = self.resolve_chromebook_owners()
+                changed = self.refresh_user_device_counts()
+                self.report(f"  Resolved owners for {owners_changed} chromebooks, updated device counts for {changed} users")
+            except Exception as e:
+                self.report(f"  Warning: Failed to refresh owners/device counts: {e}", 'warning')
+
+            # STEP 7.5: Org-wide Meraki client listing -> meraki_clients -> chromebooks AP location
+            if self.meraki:
+                self.report("STEP 7.5: Ingesting Meraki wireless clients...")
+                self.begin_stage('meraki_clients')
+                try:
+                    meraki_result = ingest_meraki_clients(self.meraki)
+                    self.report(f"  Meraki: {meraki_result['upserted']} clients stored, "
+                                f"{meraki_result['linked_chromebooks']} chromebooks updated")
+                except Exception as e:
+                    self.report(f"  Warning: Failed to ingest Meraki clients: {e}", 'warning')
+
+            # STEP 8: Publish the serial/asset tag/MAC lookup file mmapped by web workers
+            self.report("STEP 8: Writing shared lookup index...")
+            self.begin_stage('lookup_index')
+            try:
+                next_generation = (cache.get(CacheKeys.sync_generation()) or 0) + 1
+                with db.get_session() as session:
+                    written = write_lookup_index(session, next_generation)
+                self.report(f"  Wrote {written} lookup records to {LOOKUP_INDEX_PATH}")
+            except Exception as e:
+                self.report(f"  Warning: Failed to write lookup index: {e}", 'warning')
+
+            # STEP 9: Refresh pre-aggregated dashboard widgets
+            self.report("STEP 9: Refreshing dashboard materialized views...")
+            self.begin_stage('dashboard_views')
+            try:
+                self.refresh_dashboard_views()
+                self.report("  Dashboard views refreshed")
+            except Exception as e:
+                self.report(f"  Warning: Failed to refresh dashboard views: {e}", 'warning')
 
             # Update sync log
             with db.get_session() as session:
@@ -570,6 +729,8 @@ class SimpleSyncService:
             cache.delete_pattern('chromebook:*')
             cache.delete_pattern('search:*')
             cache.delete_pattern('asset:*')
+            cache.increment(CacheKeys.sync_generation())
+            self.publish_stage_durations('chromebooks')
 
             # Update sync status
             sync_status = {
@@ -580,10 +741,10 @@ class SimpleSyncService:
             }
             cache.set(CacheKeys.sync_status(), sync_status, ttl=86400)
 
-            print(f"\n✓ Sync complete:")
-            print(f"  Assets: {assets_processed} processed, {assets_created} created, {assets_updated} updated")
-            print(f"  Chromebooks: {chromebooks_processed} processed, {chromebooks_created} created, {chromebooks_updated} updated")
-            print(f"  Users: {users_processed} processed, {users_created} created, {users_updated} updated")
+            self.report(f"\n✓ Sync complete:", 'success')
+            self.report(f"  Assets: {assets_processed} processed, {assets_created} created, {assets_updated} updated")
+            self.report(f"  Chromebooks: {chromebooks_processed} processed, {chromebooks_created} created, {chromebooks_updated} updated")
+            self.report(f"  Users: {users_processed} processed, {users_created} created, {users_updated} updated")
 
             return {
                 'success': True,
@@ -831,6 +992,12 @@ class SimpleSyncService:
                 gc.collect()  # Force garbage collection after fee processing
                 print(f"  Fetched fees for {fees_fetched} users with outstanding balances")
 
+            # Refresh owner links and stored device counts now that emails are merged
+            owners_changed = self.resolve_chromebook_owners()
+            changed = self.refresh_user_device_counts()
+            print(f"  Resolved owners for {owners_changed} chromebooks, updated device counts for {changed} users")
+            cache.increment(CacheKeys.sync_generation())
+
             # STEP 5: Summary
             duration = int((datetime.now() - start_time).total_seconds())
 
@@ -1112,6 +1279,12 @@ class SimpleSyncService:
                     session.commit()
                     gc.collect()
 
+            # Refresh owner links and stored device counts now that emails are merged
+            owners_changed = self.resolve_chromebook_owners()
+            changed = self.refresh_user_device_counts()
+            print(f"  Resolved owners for {owners_changed} chromebooks, updated device counts for {changed} users")
+            cache.increment(CacheKeys.sync_generation())
+
             # Summary
             duration = int((datetime.now() - start_time).total_seconds())
 
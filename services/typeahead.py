@@ -0,0 +1,190 @@
+"""
+In-memory typeahead index for the dashboard search box
+Prefix completions over serials, asset tags, emails, names and student IDs
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from cache.redis_manager import cache, CacheKeys
+
+
+# Entry kinds (stored as one byte per entry)
+KIND_SERIAL = 0
+KIND_ASSET_TAG = 1
+KIND_EMAIL = 2
+KIND_NAME = 3
+KIND_STUDENT_ID = 4
+
+KIND_LABELS = ('serial', 'assetTag', 'email', 'name', 'studentId')
+
+TYPEAHEAD_SOURCE_QUERY = text("""
+    SELECT serial_number AS value, 0 AS kind FROM chromebooks WHERE serial_number IS NOT NULL
+    UNION
+    SELECT asset_tag, 1 FROM chromebooks WHERE asset_tag IS NOT NULL
+    UNION
+    SELECT serial_number, 0 FROM assets WHERE serial_number IS NOT NULL
+    UNION
+    SELECT asset_tag, 1 FROM assets WHERE asset_tag IS NOT NULL
+    UNION
+    SELECT email, 2 FROM users WHERE email IS NOT NULL
+    UNION
+    SELECT full_name, 3 FROM users WHERE full_name IS NOT NULL
+    UNION
+    SELECT student_id, 4 FROM users WHERE student_id IS NOT NULL
+""")
+
+
+class TypeaheadIndex:
+    """
+    Immutable sorted-array prefix index
+
+    Keys are kept in one sorted list of lowercased strings with parallel
+    compact arrays pointing at the display value and its kind, so a lookup
+    is a single bisect plus a short forward scan.
+    """
+
+    def __init__(self, rows=()):
+        """
+        Build the index
+
+        Args:
+            rows: Iterable of (value, kind) tuples
+        """
+        values: List[str] = []
+        kinds = array('B')
+        pairs = []
+
+        for value, kind in rows:
+            value = (value or '').strip()
+            if not value:
+                continue
+            value_id = len(values)
+            values.append(value)
+            kinds.append(kind)
+
+            lowered = value.lower()
+            pairs.append((lowered, value_id))
+            # Names also complete from each later word ("smi" -> "John Smith")
+            if kind == KIND_NAME:
+                words = lowered.split()
+                for i in range(1, len(words)):
+                    pairs.append((' '.join(words[i:]), value_id))
+
+        pairs.sort()
+        self.keys: List[str] = [key for key, _ in pairs]
+        self.value_ids = array('I', (value_id for _, value_id in pairs))
+        self.values = values
+        self.kinds = kinds
+        self.built_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Return up to `limit` completions for a prefix, shortest first
+
+        Args:
+            prefix: Typed text (case-insensitive)
+            limit: Maximum completions
+
+        Returns:
+            List of {'value', 'type'} dicts
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        # Scan a bounded window so very short prefixes stay O(limit)
+        start = bisect_left(self.keys, prefix)
+        window = limit * 4
+        seen = set()
+        candidates = []
+        for i in range(start, min(start + window, len(self.keys))):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            value_id = self.value_ids[i]
+            if value_id in seen:
+                continue
+            seen.add(value_id)
+            candidates.append((len(key), key, value_id))
+
+        candidates.sort()
+        return [
+            {'value': self.values[value_id], 'type': KIND_LABELS[self.kinds[value_id]]}
+            for _, _, value_id in candidates[:limit]
+        ]
+
+
+class TypeaheadManager:
+    """
+    Holds the live TypeaheadIndex and rebuilds it when a sync finishes
+
+    Syncs bump the Redis sync generation; the web process notices the new
+    generation, builds a fresh index in a background thread and swaps the
+    reference in one assignment, so readers never see a partial index.
+    """
+
+    def __init__(self, session_factory: Callable, check_interval: float = 30.0):
+        """
+        Args:
+            session_factory: Callable returning a SQLAlchemy session
+            check_interval: Seconds between Redis generation checks
+        """
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self.index = TypeaheadIndex()
+        self.generation: Optional[int] = None
+        self._loaded = False
+        self._last_check = 0.0
+        self._building = threading.Lock()
+
+    def rebuild(self, generation: Optional[int] = None) -> TypeaheadIndex:
+        """Build a new index from Postgres and swap it in"""
+        session = self.session_factory()
+        try:
+            rows = session.execute(TYPEAHEAD_SOURCE_QUERY).fetchall()
+        finally:
+            session.close()
+
+        index = TypeaheadIndex((row.value, row.kind) for row in rows)
+        self.index = index
+        self.generation = generation
+        self._loaded = True
+        print(f"✓ Typeahead index built: {len(index)} values (generation {generation})")
+        return index
+
+    def _rebuild_in_background(self, generation: Optional[int]):
+        if not self._building.acquire(blocking=False):
+            return  # A rebuild is already running
+
+        def worker():
+            try:
+                self.rebuild(generation)
+            except Exception as e:
+                print(f"Typeahead rebuild error: {e}")
+            finally:
+                self._building.release()
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def refresh_if_stale(self):
+        """Cheap check (at most once per check_interval) for a newer sync generation"""
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        generation = cache.get(CacheKeys.sync_generation())
+        if not self._loaded or generation != self.generation:
+            self._rebuild_in_background(generation)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Dict[str, str]]:
+        self.refresh_if_stale()
+        return self.index.suggest(prefix, limit)
@@ -18,8 +18,30 @@ function initializeDashboard() {
         document.getElementById('heroSection').classList.add('collapsed');
         document.getElementById('heroToggle').innerHTML = '<span id="heroToggleIcon">▼</span> Expand';
     }
-    fetchDashboardStats();
-    initializeDashboardWidgets();
+    fetchDashboardBootstrap();
+}
+
+// Home page in one request (materialized views); falls back to the per-widget endpoints
+async function fetchDashboardBootstrap() {
+    try {
+        const res = await fetch('/api/dashboard/bootstrap');
+        if (!res.ok) throw new Error(`Bootstrap failed (${res.status})`);
+        const data = await res.json();
+        renderDashboardStats(data.stats);
+        updateAueExpirationWidget(data.aueExpiration);
+        updateSecurityAlertsWidget(data.securityAlerts);
+    } catch (e) {
+        console.warn('Dashboard bootstrap unavailable, loading widgets individually:', e);
+        fetchDashboardStats();
+        initializeDashboardWidgets();
+    }
+}
+
+function renderDashboardStats(data) {
+    document.getElementById('statTotalDevices').textContent = data.total_devices.toLocaleString();
+    document.getElementById('statActiveDevices').textContent = data.active.toLocaleString();
+    document.getElementById('statDisabledDevices').textContent = data.disabled.toLocaleString();
+    document.getElementById('statDeprovisionedDevices').textContent = data.deprovisioned.toLocaleString();
 }
 
 async function fetchDashboardStats() {
@@ -27,10 +49,7 @@ async function fetchDashboardStats() {
         const res = await fetch('/api/dashboard/stats');
         const data = await res.json();
         if (res.ok) {
-            document.getElementById('statTotalDevices').textContent = data.total_devices.toLocaleString();
-            document.getElementById('statActiveDevices').textContent = data.active.toLocaleString();
-            document.getElementById('statDisabledDevices').textContent = data.disabled.toLocaleString();
-            document.getElementById('statDeprovisionedDevices').textContent = data.deprovisioned.toLocaleString();
+            renderDashboardStats(data);
         } else {
             document.getElementById('statTotalDevices').textContent = 'Error';
             document.getElementById('statActiveDevices').textContent = '—';
@@ -361,6 +380,24 @@ function normalizeDeviceFields(devices) {
     }));
 }
 
+// Typeahead: in-memory completions from /api/suggest (debounced, latest response wins)
+let suggestTimer=null, suggestSeq=0;
+function suggestSearch(q){
+    clearTimeout(suggestTimer);
+    q=q.trim();
+    if(q.length<2){document.getElementById('searchSuggestions').innerHTML='';return}
+    suggestTimer=setTimeout(async()=>{
+        const seq=++suggestSeq;
+        try{
+            const res=await fetch(`/api/suggest?q=${encodeURIComponent(q)}&limit=10`);
+            if(!res.ok||seq!==suggestSeq)return;
+            const data=await res.json();
+            document.getElementById('searchSuggestions').innerHTML=(data.suggestions||[])
+                .map(s=>`<option value="${escapeHtml(s.value)}">`).join('');
+        }catch(e){/* suggestions are best-effort */}
+    },120);
+}
+
 async function searchDevices(){
     const q=document.getElementById('searchInput').value.trim();
     if(!q){alert('Enter search term');return}
@@ -807,7 +844,18 @@ function clearAdvancedFilters() {
     showToast('Filters cleared', 'success');
 }
 
-async function advancedSearchDevices() {
+// Columns read by displayAdvancedSearchResults; sent as fields= so the search selects nothing else
+const ADVANCED_SEARCH_FIELDS = [
+    'device_id', 'serial_number', 'asset_tag', 'model', 'status',
+    'iiq_owner_name', 'userFullName', 'iiq_owner_email', 'annotated_user',
+    'iiq_location', 'annotated_location', 'iiq_room', 'org_unit_path',
+    'battery_health', 'boot_mode', 'auto_update_expiration', 'iiq_status', 'iiq_asset_id',
+    'mac_address', 'ip_address', 'wan_ip_address', 'os_version', 'last_used_date',
+    'recent_users', 'iiqOwnerStudentId', 'studentGrade'
+];
+
+// Query parameters for the advanced filter panel (shared by search and export)
+function buildAdvancedFilterParams() {
     // Build query parameters from filters
     const params = new URLSearchParams();
 
@@ -836,6 +884,19 @@ async function advancedSearchDevices() {
         params.append('battery_max', max);
     }
 
+    return params;
+}
+
+// Download every matching device (streamed by the server, not limited to one page)
+function exportAdvancedResults(format = 'csv') {
+    const params = buildAdvancedFilterParams();
+    params.append('format', format);
+    window.location.href = `/api/devices/export?${params.toString()}`;
+}
+
+async function advancedSearchDevices() {
+    const params = buildAdvancedFilterParams();
+
     // Check if at least one filter is set
     if (params.toString() === '') {
         showToast('Please select at least one filter', 'warning');
@@ -846,6 +907,8 @@ async function advancedSearchDevices() {
     const resultsContainer = document.getElementById('resultsContainer');
     resultsContainer.innerHTML = '<div style="text-align:center;padding:40px"><div class="loading-spinner"></div><div style="margin-top:15px;color:var(--text-secondary)">Searching devices...</div></div>';
 
+    params.append('fields', ADVANCED_SEARCH_FIELDS.join(','));
+
     try {
         const res = await fetch(`/api/devices/advanced-search?${params.toString()}`);
         const data = await res.json();
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Refresh the cached ALLOWED_GROUP membership set used by /auth/callback.
+Expands nested groups so login can check membership with one Redis lookup.
+Usage: python3 sync_allowed_group.py   (run hourly via run_group_sync.sh)
+"""
+import os
+import sys
+
+sys.path.insert(0, '/opt/chromebook-dashboard')
+
+from dotenv import load_dotenv
+load_dotenv('/opt/chromebook-dashboard/.env')
+
+from integrations.google import GoogleWorkspaceClient
+from cache.redis_manager import cache, CacheKeys
+
+# Keep the set alive across one missed run
+GROUP_CACHE_TTL = int(os.getenv('ALLOWED_GROUP_CACHE_TTL', '7200'))
+
+
+def main():
+    allowed_group = os.getenv('ALLOWED_GROUP', '')
+    if not allowed_group:
+        print("ALLOWED_GROUP not set - nothing to sync")
+        return 0
+
+    try:
+        google_client = GoogleWorkspaceClient(
+            credentials_file=os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE', '/opt/chromebook-dashboard/credentials.json'),
+            admin_email=os.getenv('GOOGLE_ADMIN_EMAIL', 'gsync@cr.k12.de.us')
+        )
+
+        members = google_client.list_group_members(allowed_group)
+        stored = cache.replace_set(
+            CacheKeys.allowed_group_members(allowed_group),
+            members,
+            ttl=GROUP_CACHE_TTL
+        )
+
+        print(f"✓ Cached {stored} members of {allowed_group} (TTL {GROUP_CACHE_TTL}s)")
+        return 0
+
+    except Exception as e:
+        # Leave the previous set in place; login falls back to the live check on a miss
+        print(f"✗ Group membership sync failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
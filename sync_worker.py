@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Background job worker: runs sync, export and report-precompute jobs from the
+Redis job queue, outside the web workers.
+
+Usage:
+    python sync_worker.py                      # run the worker loop
+    python sync_worker.py enqueue sync         # queue a job (e.g. from cron)
+    python sync_worker.py enqueue export --priority 9
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+# Add project root to path
+sys.path.insert(0, '/opt/chromebook-dashboard')
+
+# Load environment variables from .env file
+from dotenv import load_dotenv
+load_dotenv('/opt/chromebook-dashboard/.env')
+
+from services import job_queue
+from services.jobs import JOB_HANDLERS
+
+
+POLL_INTERVAL = 2.0
+HEARTBEAT_INTERVAL = 30.0
+
+stopping = threading.Event()
+
+
+def handle_signal(signum, frame):
+    print(f"Received signal {signum}, finishing current job before exit...")
+    stopping.set()
+
+
+def run_job(job, worker_id):
+    """Run one claimed job while a side thread keeps its heartbeat alive"""
+    handler = JOB_HANDLERS.get(job['type'])
+    if handler is None:
+        job['attempts'] = job['max_attempts']  # Unknown type: don't retry
+        job_queue.fail(job, f"No handler for job type '{job['type']}'")
+        return
+
+    done = threading.Event()
+
+    def beat():
+        while not done.wait(HEARTBEAT_INTERVAL):
+            try:
+                job_queue.heartbeat(job['id'])
+            except Exception as e:
+                print(f"  Heartbeat error for job {job['id']}: {e}")
+
+    heartbeat_thread = threading.Thread(target=beat, daemon=True)
+    heartbeat_thread.start()
+
+    started = time.time()
+    print(f"▶ {job['type']} job {job['id']} (attempt {job['attempts']}/{job['max_attempts']})")
+    try:
+        result = handler(job.get('payload') or {})
+        if job_queue.complete(job, result):
+            print(f"✓ {job['type']} job {job['id']} completed in {int(time.time() - started)}s")
+        else:
+            print(f"⚠ {job['type']} job {job['id']} finished after it was requeued (missed heartbeats); result dropped")
+    except Exception as e:
+        traceback.print_exc()
+        if job_queue.fail(job, str(e)):
+            print(f"✗ {job['type']} job {job['id']} failed: {e} (status: {job['status']})")
+        else:
+            print(f"⚠ {job['type']} job {job['id']} failed after it was requeued (missed heartbeats): {e}")
+    finally:
+        done.set()
+        heartbeat_thread.join()
+
+
+def work():
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"Sync worker {worker_id} started ({', '.join(JOB_HANDLERS)})")
+    print("=" * 80)
+
+    while not stopping.is_set():
+        try:
+            stalled = job_queue.requeue_stalled()
+            if stalled:
+                print(f"Requeued {len(stalled)} stalled job(s)")
+            job = job_queue.claim(worker_id)
+        except Exception as e:
+            print(f"Queue error: {e}")
+            stopping.wait(POLL_INTERVAL * 5)
+            continue
+
+        if job is None:
+            stopping.wait(POLL_INTERVAL)
+            continue
+        run_job(job, worker_id)
+
+    print("Sync worker stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chromebook dashboard background job worker")
+    subparsers = parser.add_subparsers(dest='command')
+    enqueue_parser = subparsers.add_parser('enqueue', help='Queue a job and exit')
+    enqueue_parser.add_argument('job_type', choices=sorted(JOB_HANDLERS))
+    enqueue_parser.add_argument('--priority', type=int, default=job_queue.PRIORITY_NORMAL,
+                                help='0 (highest) - 9 (lowest)')
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        job = job_queue.enqueue(args.job_type, priority=args.priority)
+        state = 'already queued' if job.get('deduplicated') else 'queued'
+        print(f"{args.job_type} job {job['id']} {state} ({job['status']})")
+        return
+
+    work()
+
+
+if __name__ == '__main__':
+    main()
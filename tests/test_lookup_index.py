@@ -0,0 +1,60 @@
+"""
+Pack / lookup round trips for the mmapped serial / asset tag / MAC index
+"""
+import pytest
+
+pytest.importorskip('sqlalchemy')
+pytest.importorskip('redis')
+
+from services import lookup_index
+from services.lookup_index import (
+    KIND_ASSET_TAG, KIND_MAC, KIND_SERIAL, LookupIndex, SERIAL_WIDTH, write_lookup_index
+)
+
+
+class FakeSession:
+    def __init__(self, chromebooks=(), assets=()):
+        self.chromebooks = list(chromebooks)
+        self.assets = list(assets)
+
+    def execute(self, query):
+        if query is lookup_index.LOOKUP_SOURCE_QUERY:
+            return self.chromebooks
+        return self.assets
+
+
+def build(tmp_path, **rows):
+    path = str(tmp_path / 'lookup_index.bin')
+    written = write_lookup_index(FakeSession(**rows), generation=7, path=path)
+    return LookupIndex(path), written
+
+
+def test_serial_at_field_width_round_trips(tmp_path):
+    serial = 'S' * SERIAL_WIDTH
+    index, _ = build(tmp_path, chromebooks=[(serial, 'dev-1', 'TAG1', 'aa:bb:cc:dd:ee:ff')])
+
+    for kind, key in ((KIND_SERIAL, serial), (KIND_ASSET_TAG, 'tag1'), (KIND_MAC, 'AABBCCDDEEFF')):
+        assert index.lookup(kind, key) == {'serial': serial, 'deviceId': 'dev-1'}
+    assert index.generation == 7
+
+
+def test_serial_between_old_and_new_width_is_not_truncated(tmp_path):
+    serial = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ12'  # 28 chars: used to be cut to 24
+    index, _ = build(tmp_path, chromebooks=[(serial, 'dev-1', 'TAG1', None)])
+
+    assert index.lookup(KIND_ASSET_TAG, 'TAG1')['serial'] == serial
+    assert index.resolve(serial)['serial'] == serial
+
+
+def test_serial_too_long_is_skipped_not_truncated(tmp_path):
+    serial = 'S' * (SERIAL_WIDTH + 1)
+    index, written = build(
+        tmp_path,
+        chromebooks=[(serial, 'dev-1', 'TAG1', 'aa:bb:cc:dd:ee:ff')],
+        assets=[('SHORT1', 'TAG2')],
+    )
+
+    assert written == 1
+    assert index.lookup(KIND_ASSET_TAG, 'TAG1') is None
+    assert index.lookup(KIND_MAC, 'aa:bb:cc:dd:ee:ff') is None
+    assert index.lookup(KIND_ASSET_TAG, 'TAG2') == {'serial': 'SHORT1', 'deviceId': None}